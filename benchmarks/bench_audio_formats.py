@@ -0,0 +1,83 @@
+"""
+Benchmark the TTS audio formats of the render path (TTS_RENDER_FORMAT):
+payload size against decode time.
+
+The input audio is first turned into what OpenAI's "pcm" response looks
+like (24 kHz 16-bit mono), then encoded into each format of
+reels.services.audio_formats. For each format it reports the file size,
+the base64 bytes sent to Runpod (gzip-compressed where the client would
+compress it, see runpod_client.INCOMPRESSIBLE_SUFFIXES), the encode time
+and the time to decode it to the 16 kHz mono samples SadTalker works on
+(render_features.decode_audio, median of --repeats). Needs ffmpeg.
+
+Usage:
+    python benchmarks/bench_audio_formats.py AUDIO [--formats mp3 opus flac16k] \
+        [--repeats 5]
+"""
+import argparse
+import base64
+import gzip
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def payload_bytes(path: Path) -> tuple[int, bool]:
+    """Base64 size of a media field and whether it was gzip-compressed."""
+    from reels.services.runpod_client import INCOMPRESSIBLE_SUFFIXES
+    
+    data = path.read_bytes()
+    compressed = path.suffix.lower() not in INCOMPRESSIBLE_SUFFIXES
+    if compressed:
+        data = gzip.compress(data)
+    return len(base64.b64encode(data)), compressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', help='Speech audio (e.g. a TTS mp3 of a 30-60 s script)')
+    parser.add_argument('--formats', nargs='+', default=None, help='Formats to compare (default: all)')
+    parser.add_argument('--repeats', type=int, default=5, help='Decodes per format')
+    args = parser.parse_args()
+    
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reel_platform.settings')
+    import django
+    django.setup()
+    from reels.services.audio_formats import AUDIO_FORMATS, PCM_SAMPLE_RATE, get_format, _run_ffmpeg, convert_audio
+    from reels.services.render_features import decode_audio, SAMPLE_RATE
+    
+    formats = [get_format(name) for name in args.formats or AUDIO_FORMATS]
+    with tempfile.TemporaryDirectory() as work_dir:
+        pcm_path = Path(work_dir) / 'speech.pcm'
+        _run_ffmpeg(['-i', args.audio, '-vn', '-f', 's16le', '-ac', '1', '-ar', str(PCM_SAMPLE_RATE), str(pcm_path)])
+        duration = pcm_path.stat().st_size / 2 / PCM_SAMPLE_RATE
+        print(f"audio: {duration:.2f}s; decoded to {SAMPLE_RATE} Hz mono, median of {args.repeats}")
+        print(f"{'format':>8} {'file KB':>9} {'payload KB':>11} {'gzip':>5} {'encode ms':>10} {'decode ms':>10}")
+        
+        for audio_format in formats:
+            output_path = Path(work_dir) / f"{audio_format['name']}{audio_format['suffix']}"
+            started = time.perf_counter()
+            convert_audio(pcm_path, output_path, audio_format, raw_pcm=True)
+            encode_ms = (time.perf_counter() - started) * 1000
+            
+            decode_times = []
+            for _ in range(args.repeats):
+                started = time.perf_counter()
+                decode_audio(str(output_path))
+                decode_times.append((time.perf_counter() - started) * 1000)
+            
+            payload, compressed = payload_bytes(output_path)
+            print(
+                f"{audio_format['name']:>8} {output_path.stat().st_size / 1024:>9.1f} {payload / 1024:>11.1f} "
+                f"{'yes' if compressed else 'no':>5} {encode_ms:>10.0f} {statistics.median(decode_times):>10.1f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
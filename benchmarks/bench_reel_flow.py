@@ -0,0 +1,164 @@
+"""
+Load-test the whole create -> approve -> video flow offline.
+
+Drives the REST API (Django test client, one thread per concurrent user)
+with the offline providers (REWRITE_PROVIDER=template, TTS_PROVIDER=
+synthetic, latency injected as configured) and runpod_emulator as the
+Runpod endpoint, on a throwaway database and media directory. No network,
+API key or GPU is needed; with the default wav audio not even ffmpeg.
+
+Each reel is created with rewriting (POST /api/reels/), then approved,
+which voices the script and renders the video synchronously
+(POST /api/reels/<id>/approve-script/). Reports throughput and latency
+percentiles per step.
+
+Usage:
+    python benchmarks/bench_reel_flow.py --reels 40 --concurrency 8 \
+        --workers 4 --execution lognormal:2,0.3 --latency-scale 1
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+WORDS = (
+    'our new product makes every morning easier and faster for busy people who want '
+    'great coffee without the wait so try it today and tell your friends about it'
+).split()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def make_script(rng: random.Random, sentences: int) -> str:
+    return ' '.join(
+        ' '.join(rng.choices(WORDS, k=rng.randint(6, 14))).capitalize() + rng.choice('.!?')
+        for _ in range(sentences)
+    )
+
+
+def face_jpeg() -> bytes:
+    from PIL import Image
+    
+    buffer = io.BytesIO()
+    Image.new('RGB', (512, 512), (200, 160, 140)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def run_reel(script: str, image: bytes, timings: dict, lock: threading.Lock) -> bool:
+    """Create and approve one reel. Returns whether it ended with a video."""
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import Client
+    
+    client = Client()
+    started = time.monotonic()
+    response = client.post('/api/reels/', {
+        'image': SimpleUploadedFile('face.jpg', image, 'image/jpeg'),
+        'script': script,
+        'tone': 'friendly',
+        'max_seconds': 30,
+    })
+    created = time.monotonic()
+    if response.status_code != 201 or response.json().get('status') != 'script_pending_approval':
+        return False
+    
+    response = client.post(f"/api/reels/{response.json()['id']}/approve-script/")
+    finished = time.monotonic()
+    with lock:
+        timings['create'].append(created - started)
+        timings['approve'].append(finished - created)
+        timings['total'].append(finished - started)
+    return response.status_code == 200 and response.json().get('status') == 'done'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reels', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--sentences', type=int, default=6, help='Sentences per original script')
+    parser.add_argument('--workers', type=int, default=2, help='Emulated Runpod workers')
+    parser.add_argument('--execution', default='lognormal:2,0.3', help='Emulated render time distribution')
+    parser.add_argument('--latency-scale', default='1.0', help='OFFLINE_LATENCY_SCALE (0 = no injected latency)')
+    parser.add_argument('--audio-format', default='wav', help='TTS_RENDER_FORMAT and TTS_DELIVERY_FORMAT')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    work_dir = Path(tempfile.mkdtemp(prefix='reel-flow-'))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reel_platform.settings')
+    os.environ.update({
+        'REWRITE_PROVIDER': 'template',
+        'TTS_PROVIDER': 'synthetic',
+        'OFFLINE_LATENCY_SCALE': args.latency_scale,
+        'TTS_RENDER_FORMAT': args.audio_format,
+        'TTS_DELIVERY_FORMAT': args.audio_format,
+        'TTS_CACHE_DIR': str(work_dir / 'tts_cache'),
+        'RUNPOD_MODE': 'sync',
+        'ASYNC_PROCESSING': 'false',
+        'ARTIFACT_STORE_URL': '',
+        'RUNPOD_ENDPOINT_URL': 'http://127.0.0.1:1/runsync',
+    })
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = str(work_dir / 'db.sqlite3')
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 60
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from reels.services import runpod_client
+    from runpod_emulator import EmulatorConfig, start_emulator
+    
+    settings.MEDIA_ROOT = work_dir / 'media'
+    settings.ALLOWED_HOSTS = ['testserver']
+    call_command('migrate', verbosity=0)
+    
+    server = start_emulator(EmulatorConfig(
+        max_workers=args.workers,
+        execution=args.execution,
+        seed=args.seed,
+    ))
+    client = runpod_client.RunpodClient(
+        endpoint_url=f'http://127.0.0.1:{server.server_address[1]}/runsync',
+        pool_size=args.concurrency,
+    )
+    runpod_client._router = runpod_client.RunpodRouter([client])
+    
+    rng = random.Random(args.seed)
+    scripts = [make_script(rng, args.sentences) for _ in range(args.reels)]
+    image = face_jpeg()
+    timings = {'create': [], 'approve': [], 'total': []}
+    lock = threading.Lock()
+    
+    print(f"reels={args.reels} concurrency={args.concurrency} workers={args.workers} "
+          f"execution={args.execution} latency_scale={args.latency_scale} audio={args.audio_format}")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        done = list(pool.map(lambda script: run_reel(script, image, timings, lock), scripts))
+    elapsed = time.monotonic() - started
+    
+    print(f"{'step':>8} {'p50 s':>7} {'p95 s':>7} {'max s':>7}")
+    for step, values in timings.items():
+        print(f"{step:>8} {percentile(values, 50):>7.2f} {percentile(values, 95):>7.2f} "
+              f"{max(values, default=float('nan')):>7.2f}")
+    print(f"{sum(done)} of {args.reels} reels done in {elapsed:.1f}s ({sum(done) / elapsed:.2f} reels/s); "
+          f"data in {work_dir}")
+    
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark micro-batching of render requests in the GPU worker: throughput
+against the latency the batching window adds.
+
+Jobs arrive as a Poisson stream at --rate per second and go through
+sadtalker_engine.RenderBatcher for each window setting. By default a batch
+is simulated with a cost of fixed + per_job * n seconds (--cost), the shape
+of a face-render pass whose per-step overhead is shared by the whole batch;
+with --sadtalker IMAGE AUDIO the real SadTalkerEngine.render_batch is used
+(needs SADTALKER_ROOT and a GPU).
+
+Usage:
+    python benchmarks/bench_render_batching.py --rate 2 --jobs 60 \
+        --max-batch 4 --windows 0 100 250 500 --cost 1.0,0.25
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from sadtalker_engine import RenderBatcher, RenderRequest
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def simulated_render_batch(fixed: float, per_job: float, batch_sizes: list[int]):
+    """Build a render_batch callable that sleeps for the modelled batch cost."""
+    def render_batch(requests: list[RenderRequest]) -> list:
+        batch_sizes.append(len(requests))
+        time.sleep(fixed + per_job * len(requests))
+        return [request.output_dir for request in requests]
+    
+    return render_batch
+
+
+def sadtalker_render_batch(batch_sizes: list[int]):
+    """SadTalkerEngine.render_batch, recording batch sizes."""
+    import runpod_handler
+    
+    engine = runpod_handler.get_engine()
+    if engine is None:
+        raise SystemExit('In-process SadTalker engine failed to load')
+    
+    def render_batch(requests: list[RenderRequest]) -> list:
+        batch_sizes.append(len(requests))
+        return engine.render_batch(requests)
+    
+    return render_batch
+
+
+def run(render_batch, window: float, max_batch: int, rate: float, jobs: int, image: str, audio: str) -> dict:
+    """Push jobs through a fresh RenderBatcher; returns latencies and wall time."""
+    batcher = RenderBatcher(render_batch, window, max_batch)
+    rng = random.Random(42)  # Same arrivals for every window
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    threads = []
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        def one(index: int) -> None:
+            nonlocal errors
+            started = time.perf_counter()
+            future = batcher.submit(RenderRequest(image, audio, str(Path(work_dir) / str(index))))
+            try:
+                future.result()
+            except Exception:
+                with lock:
+                    errors += 1
+                return
+            with lock:
+                latencies.append(time.perf_counter() - started)
+        
+        wall_start = time.perf_counter()
+        for index in range(jobs):
+            thread = threading.Thread(target=one, args=(index,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(rng.expovariate(rate))
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - wall_start
+    
+    return {'latencies': latencies, 'errors': errors, 'wall': wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=2.0, help='Job arrivals per second')
+    parser.add_argument('--jobs', type=int, default=60)
+    parser.add_argument('--max-batch', type=int, default=4)
+    parser.add_argument('--windows', nargs='+', type=int, default=[0, 100, 250, 500], help='Batching windows in ms')
+    parser.add_argument('--cost', default='1.0,0.25', help='Simulated batch cost: fixed,per_job seconds')
+    parser.add_argument('--sadtalker', nargs=2, metavar=('IMAGE', 'AUDIO'), help='Render with the real engine')
+    args = parser.parse_args()
+    
+    fixed, per_job = (float(v) for v in args.cost.split(','))
+    image, audio = args.sadtalker or ('image.png', 'audio.wav')
+    
+    print(f"{'window ms':>9} {'max':>4} {'jobs/s':>7} {'batch':>6} {'p50 s':>7} {'p95 s':>7} {'errors':>6}")
+    # max_batch 1 is the unbatched baseline
+    for window_ms, max_batch in [(0, 1)] + [(w, args.max_batch) for w in args.windows]:
+        batch_sizes: list[int] = []
+        if args.sadtalker:
+            render_batch = sadtalker_render_batch(batch_sizes)
+        else:
+            render_batch = simulated_render_batch(fixed, per_job, batch_sizes)
+        result = run(render_batch, window_ms / 1000, max_batch, args.rate, args.jobs, image, audio)
+        latencies = result['latencies']
+        print(
+            f"{window_ms:>9} {max_batch:>4} {len(latencies) / result['wall']:>7.2f} "
+            f"{statistics.mean(batch_sizes):>6.2f} {percentile(latencies, 50):>7.2f} "
+            f"{percentile(latencies, 95):>7.2f} {result['errors']:>6}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark peak memory of the Runpod video transfer path.
+
+Serves fake Runpod responses of growing size from a local HTTP server and
+measures the peak RSS of a fresh process downloading each one, once with the
+old buffered path (response.json() + b64decode) and once with the streaming
+path in reels.services.runpod_client.
+
+Usage:
+    python benchmarks/bench_runpod_streaming.py [size_mb ...]
+"""
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SIZES_MB = [8, 32, 128]
+INPUT_SIZE = 2 * 1024 * 1024
+CHUNK = 3 * 64 * 1024
+
+
+class FakeRunpodHandler(BaseHTTPRequestHandler):
+    """Answers every POST with a COMPLETED job carrying a video of ?mb= size."""
+    
+    video_bytes = 0
+    
+    def do_POST(self):
+        # Drain the request body
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining > 0:
+            remaining -= len(self.rfile.read(min(remaining, 1024 * 1024)))
+        
+        size = self.server.video_bytes
+        block = base64.b64encode(os.urandom(CHUNK))
+        full_blocks, tail = divmod(size, CHUNK)
+        prefix = b'{"id": "bench", "status": "COMPLETED", "output": {"video_base64": "'
+        suffix = b'", "error": null}}'
+        body_length = len(prefix) + full_blocks * len(block) + 4 * ((tail + 2) // 3) + len(suffix)
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(body_length))
+        self.end_headers()
+        self.wfile.write(prefix)
+        for _ in range(full_blocks):
+            self.wfile.write(block)
+        if tail:
+            self.wfile.write(base64.b64encode(os.urandom(tail)))
+        self.wfile.write(suffix)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(mode: str, endpoint: str, work_dir: str) -> None:
+    """Download one video in this (fresh) process and print peak RSS."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reel_platform.settings')
+    os.environ['RUNPOD_ENDPOINT_URL'] = endpoint
+    sys.path.insert(0, str(REPO_ROOT))
+    import django
+    django.setup()
+    import requests
+    from reels.services.runpod_client import generate_video_with_runpod
+    
+    image_path = os.path.join(work_dir, 'image.jpg')
+    audio_path = os.path.join(work_dir, 'audio.mp3')
+    video_path = os.path.join(work_dir, f'video_{mode}.mp4')
+    baseline = peak_rss_mb()
+    
+    if mode == 'buffered':
+        # The previous implementation, kept here for comparison
+        with open(image_path, 'rb') as f:
+            image_base64 = base64.b64encode(f.read()).decode('utf-8')
+        with open(audio_path, 'rb') as f:
+            audio_base64 = base64.b64encode(f.read()).decode('utf-8')
+        response = requests.post(
+            endpoint,
+            json={"input": {"image": image_base64, "audio": audio_base64}},
+            timeout=600
+        )
+        result = response.json()
+        with open(video_path, 'wb') as f:
+            f.write(base64.b64decode(result['output']['video_base64']))
+    else:
+        generate_video_with_runpod(image_path, audio_path, video_path)
+    
+    written = os.path.getsize(video_path)
+    os.remove(video_path)
+    print(json.dumps({'baseline_mb': baseline, 'peak_mb': peak_rss_mb(), 'written': written}))
+
+
+def main(sizes_mb: list[int]) -> None:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRunpodHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f'http://127.0.0.1:{server.server_address[1]}/runsync'
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in ('image.jpg', 'audio.mp3'):
+            with open(os.path.join(work_dir, name), 'wb') as f:
+                f.write(os.urandom(INPUT_SIZE))
+        
+        print(f"{'video MB':>9} {'mode':>10} {'baseline MB':>12} {'peak MB':>9} {'delta MB':>9}")
+        for size_mb in sizes_mb:
+            server.video_bytes = size_mb * 1024 * 1024
+            for mode in ('buffered', 'streaming'):
+                output = subprocess.run(
+                    [sys.executable, __file__, '--child', mode, endpoint, work_dir],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    cwd=str(REPO_ROOT)
+                )
+                stats = json.loads(output.stdout.strip().splitlines()[-1])
+                assert stats['written'] == server.video_bytes
+                delta = stats['peak_mb'] - stats['baseline_mb']
+                print(f"{size_mb:>9} {mode:>10} {stats['baseline_mb']:>12.1f} "
+                      f"{stats['peak_mb']:>9.1f} {delta:>9.1f}")
+    
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(*sys.argv[2:5])
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES_MB)
@@ -0,0 +1,178 @@
+"""
+Benchmark Django-side throughput and tail latency against a Runpod endpoint
+with different worker counts.
+
+Starts runpod_emulator in-process for each worker count and pushes a batch of
+video jobs through reels.services.runpod_client, either with blocking
+/runsync calls from a thread pool (RUNPOD_MODE=sync, like async_processor)
+or with /run plus the shared RunpodPoller (RUNPOD_MODE=async). Latency is
+measured from submission until the video is on disk.
+
+Usage:
+    python benchmarks/bench_runpod_throughput.py --workers 1 2 4 --jobs 40 \
+        --concurrency 16 --mode sync --execution lognormal:0.5,0.3 --cold-start 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+INPUT_SIZE = 256 * 1024
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def run_sync_batch(jobs: int, concurrency: int, work_dir: str) -> tuple[list[float], int]:
+    """Blocking /runsync calls from a thread pool. Returns (latencies, failures)."""
+    from reels.services.runpod_client import generate_video_with_runpod, RunpodClientError
+    
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    
+    def one(index: int) -> None:
+        nonlocal failures
+        started = time.monotonic()
+        try:
+            generate_video_with_runpod(
+                os.path.join(work_dir, 'image.jpg'),
+                os.path.join(work_dir, 'audio.mp3'),
+                os.path.join(work_dir, f'video_{index}.mp4')
+            )
+        except RunpodClientError:
+            with lock:
+                failures += 1
+            return
+        with lock:
+            latencies.append(time.monotonic() - started)
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(jobs)))
+    return latencies, failures
+
+
+def run_async_batch(jobs: int, concurrency: int, work_dir: str) -> tuple[list[float], int]:
+    """Submit to /run and let the shared poller finish each job."""
+    from reels.services.runpod_client import submit_video_with_runpod
+    from reels.services.runpod_poller import get_runpod_poller
+    
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    all_done = threading.Event()
+    remaining = jobs
+    
+    def on_done(started: float, result: dict) -> None:
+        nonlocal failures, remaining
+        with lock:
+            if result.get('status') == 'COMPLETED' and not result.get('error'):
+                latencies.append(time.monotonic() - started)
+            else:
+                failures += 1
+            remaining -= 1
+            if remaining == 0:
+                all_done.set()
+    
+    def one(index: int) -> None:
+        started = time.monotonic()
+        remote_id, endpoint = submit_video_with_runpod(
+            os.path.join(work_dir, 'image.jpg'),
+            os.path.join(work_dir, 'audio.mp3')
+        )
+        get_runpod_poller().track(
+            key=f'bench-{index}',
+            remote_job_id=remote_id,
+            sinks={'video_base64': os.path.join(work_dir, f'video_{index}.mp4')},
+            on_done=lambda result: on_done(started, result),
+            endpoint=endpoint
+        )
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(jobs)))
+    all_done.wait()
+    return latencies, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--jobs', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mode', choices=['sync', 'async'], default='sync')
+    parser.add_argument('--execution', default='lognormal:0.5,0.3')
+    parser.add_argument('--cold-start', type=float, default=1.0)
+    parser.add_argument('--queue-delay', type=float, default=0.05)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--video-kb', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    # Poll at the emulator's time scale rather than production's
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reel_platform.settings')
+    os.environ.setdefault('RUNPOD_POLL_INITIAL_INTERVAL', '0.1')
+    os.environ.setdefault('RUNPOD_POLL_MAX_INTERVAL', '1')
+    os.environ['RUNPOD_ENDPOINT_URL'] = 'http://127.0.0.1:1/runsync'
+    os.environ['ARTIFACT_STORE_URL'] = ''
+    import django
+    django.setup()
+    from reels.services import runpod_client
+    from runpod_emulator import EmulatorConfig, start_emulator
+    
+    batch = run_sync_batch if args.mode == 'sync' else run_async_batch
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in ('image.jpg', 'audio.mp3'):
+            with open(os.path.join(work_dir, name), 'wb') as f:
+                f.write(os.urandom(INPUT_SIZE))
+        
+        print(f"mode={args.mode} jobs={args.jobs} concurrency={args.concurrency} execution={args.execution} "
+              f"cold_start={args.cold_start}s")
+        print(f"{'workers':>7} {'jobs/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+              f"{'delay ms':>9} {'exec ms':>8} {'cold':>5} {'failed':>6}")
+        for workers in args.workers:
+            server = start_emulator(EmulatorConfig(
+                max_workers=workers,
+                cold_start=args.cold_start,
+                queue_delay=args.queue_delay,
+                execution=args.execution,
+                failure_rate=args.failure_rate,
+                video_kb=args.video_kb,
+                seed=args.seed,
+            ))
+            client = runpod_client.RunpodClient(
+                endpoint_url=f'http://127.0.0.1:{server.server_address[1]}/runsync',
+                pool_size=args.concurrency,
+            )
+            runpod_client._router = runpod_client.RunpodRouter([client])
+            
+            started = time.monotonic()
+            latencies, failures = batch(args.jobs, args.concurrency, work_dir)
+            elapsed = time.monotonic() - started
+            
+            emulated = [server.emulator.status_document(job) for job in server.emulator.jobs()]
+            delays = [doc['delayTime'] for doc in emulated if 'delayTime' in doc]
+            executions = [doc['executionTime'] for doc in emulated if 'executionTime' in doc]
+            health = server.emulator.health()
+            print(f"{workers:>7} {len(latencies) / elapsed:>7.2f} {percentile(latencies, 50):>7.2f} "
+                  f"{percentile(latencies, 95):>7.2f} {percentile(latencies, 99):>7.2f} "
+                  f"{sum(delays) / max(len(delays), 1):>9.0f} {sum(executions) / max(len(executions), 1):>8.0f} "
+                  f"{health['workers']['coldStarts']:>5} {failures:>6}")
+            
+            client.close()
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark per-job latency of the in-process SadTalker engine against the
+subprocess path (python inference.py per job) in runpod_handler.
+
+Each mode runs in a fresh Python process, like a freshly started worker, and
+renders the same image and audio several times. The first job includes
+model loading for the in-process engine; later jobs show the steady state.
+Needs a SadTalker checkout at SADTALKER_ROOT (run it on a GPU worker).
+
+Usage:
+    python benchmarks/bench_sadtalker_engine.py IMAGE AUDIO [--jobs N] [--modes inprocess subprocess]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+WORKER = """
+import json, sys, tempfile, time
+sys.path.insert(0, sys.argv[1])
+import runpod_handler
+if runpod_handler.SADTALKER_ENGINE == 'inprocess' and runpod_handler.get_engine() is None:
+    sys.exit('In-process engine failed to load')
+latencies = []
+for _ in range(int(sys.argv[4])):
+    job_start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as output_dir:
+        runpod_handler.generate_video(sys.argv[2], sys.argv[3], output_dir)
+    latencies.append(time.perf_counter() - job_start)
+print(json.dumps({'latencies': latencies}))
+"""
+
+
+def run_mode(mode: str, image: str, audio: str, jobs: int) -> dict:
+    """Render jobs times in a fresh worker process using the given engine mode."""
+    env = {**os.environ, 'SADTALKER_ENGINE': mode, 'SADTALKER_PRELOAD': 'false'}
+    result = subprocess.run(
+        [sys.executable, '-c', WORKER, str(REPO_ROOT), image, audio, str(jobs)],
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"{mode} run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image', help='Source face image')
+    parser.add_argument('audio', help='Driving audio')
+    parser.add_argument('--jobs', type=int, default=5, help='Renders per mode (default 5)')
+    parser.add_argument('--modes', nargs='+', default=['subprocess', 'inprocess'], choices=['subprocess', 'inprocess'])
+    args = parser.parse_args()
+    
+    image = str(Path(args.image).resolve())
+    audio = str(Path(args.audio).resolve())
+    
+    print(f"{'mode':<12}{'first job':>12}{'steady p50':>12}{'steady mean':>13}{'total':>10}")
+    for mode in args.modes:
+        latencies = run_mode(mode, image, audio, args.jobs)['latencies']
+        steady = latencies[1:] or latencies
+        print(
+            f"{mode:<12}{latencies[0]:>11.2f}s{statistics.median(steady):>11.2f}s"
+            f"{statistics.mean(steady):>12.2f}s{sum(latencies):>9.1f}s"
+        )
+
+
+if __name__ == '__main__':
+    main()
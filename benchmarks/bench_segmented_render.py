@@ -0,0 +1,88 @@
+"""
+Benchmark segment-parallel rendering against a single serial render.
+
+Runs reels.services.segmented_render with a CPU fake renderer: for each
+segment it sleeps startup + duration * realtime_factor seconds (a stand-in
+for SadTalker on a GPU worker) and writes a 25 fps video of the segment's
+length with ffmpeg. No GPU or Runpod endpoint is needed, only ffmpeg.
+
+Reports wall time per segment count and checks that the joined video is as
+long as the audio (seamless boundaries keep the frame count exact).
+
+Usage:
+    python benchmarks/bench_segmented_render.py AUDIO [--segments 1 2 4] \
+        [--realtime-factor 1.5] [--startup 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def media_duration(path: str) -> float:
+    from reels.services.segmented_render import _run_ffmpeg, _DURATION_RE
+    
+    match = _DURATION_RE.search(_run_ffmpeg(['-i', path, '-f', 'null', '-']))
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def fake_renderer(realtime_factor: float, startup: float):
+    """Build a render_segment callable that imitates SadTalker's cost on CPU."""
+    from reels.services.segmented_render import _run_ffmpeg, VIDEO_FPS
+    
+    def render_segment(image_path: str, audio_path: str, video_path: str) -> None:
+        duration = media_duration(audio_path)
+        time.sleep(startup + duration * realtime_factor)
+        _run_ffmpeg([
+            '-y',
+            '-f', 'lavfi', '-i', f'color=c=gray:s=256x256:r={VIDEO_FPS}:d={duration:.3f}',
+            '-i', audio_path,
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-shortest',
+            video_path
+        ])
+    
+    return render_segment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', help='Driving audio (e.g. a TTS mp3 of a 30-60 s script)')
+    parser.add_argument('--segments', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--realtime-factor', type=float, default=1.5, help='Render seconds per audio second')
+    parser.add_argument('--startup', type=float, default=2.0, help='Fixed seconds per render (queue, model warm-up)')
+    args = parser.parse_args()
+    
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reel_platform.settings')
+    import django
+    django.setup()
+    from reels.services.segmented_render import render_segmented
+    
+    audio_duration = media_duration(args.audio)
+    render_segment = fake_renderer(args.realtime_factor, args.startup)
+    print(f"audio: {audio_duration:.2f}s, realtime factor {args.realtime_factor}, startup {args.startup}s")
+    print(f"{'segments':>9} {'used':>5} {'wall s':>8} {'video s':>8} {'drift ms':>9}")
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        for segments in args.segments:
+            output_path = str(Path(work_dir) / f'video-{segments}.mp4')
+            started = time.perf_counter()
+            if segments > 1:
+                used = render_segmented('unused.png', args.audio, output_path, render_segment, segments=segments)
+            else:
+                render_segment('unused.png', args.audio, output_path)
+                used = 1
+            wall = time.perf_counter() - started
+            video_duration = media_duration(output_path)
+            drift = (video_duration - audio_duration) * 1000
+            print(f"{segments:>9} {used:>5} {wall:>8.2f} {video_duration:>8.2f} {drift:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -108,9 +108,53 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # OpenAI API Key
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+# One OpenAI client per process; its connection pool is shared by all threads
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '120'))  # Seconds per request
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+OPENAI_MAX_KEEPALIVE = int(os.getenv('OPENAI_MAX_KEEPALIVE', '10'))  # Idle connections kept open
+OPENAI_KEEPALIVE_SECONDS = float(os.getenv('OPENAI_KEEPALIVE_SECONDS', '60'))
+
+# Script rewrite and TTS backends (see reels/services/providers.py): "openai",
+# or the offline stand-ins "template" / "synthetic" for load tests
+REWRITE_PROVIDER = os.getenv('REWRITE_PROVIDER', 'openai')
+TTS_PROVIDER = os.getenv('TTS_PROVIDER', 'openai')
+# Offline providers sleep this multiple of the API's typical latency (0 = none)
+OFFLINE_LATENCY_SCALE = float(os.getenv('OFFLINE_LATENCY_SCALE', '1.0'))
+OFFLINE_LATENCY_JITTER = float(os.getenv('OFFLINE_LATENCY_JITTER', '0.25'))  # Lognormal sigma
 
 # SadTalker configuration
 SADTALKER_ROOT = os.getenv('SADTALKER_ROOT', '/workspace/SadTalker')
+# Render preset for jobs that do not pick one: draft, standard or high
+DEFAULT_RENDER_PRESET = os.getenv('DEFAULT_RENDER_PRESET', 'standard')
+# Two-pass rendering: publish a quick PREVIEW_RENDER_PRESET render first,
+# then replace it with the full-quality one
+TWO_PASS_RENDERING = os.getenv('TWO_PASS_RENDERING', 'false').lower() == 'true'
+PREVIEW_RENDER_PRESET = os.getenv('PREVIEW_RENDER_PRESET', 'draft')
+# Output formats (reels/services/output_formats.py) for jobs that do not pick
+# any, comma-separated, e.g. "reel,feed"; encoded by the worker after rendering
+DEFAULT_OUTPUT_FORMATS = [
+    name.strip() for name in os.getenv('DEFAULT_OUTPUT_FORMATS', '').split(',') if name.strip()
+]
+
+# Segment-parallel rendering (sync Runpod mode): split audio at pauses into up
+# to RENDER_SEGMENTS pieces rendered concurrently; 1 disables it
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+RENDER_SEGMENTS = int(os.getenv('RENDER_SEGMENTS', '1'))
+RENDER_SEGMENT_WORKERS = int(os.getenv('RENDER_SEGMENT_WORKERS', '0'))  # 0 = one per segment
+RENDER_SEGMENT_MIN_SECONDS = float(os.getenv('RENDER_SEGMENT_MIN_SECONDS', '8'))
+RENDER_SILENCE_DB = float(os.getenv('RENDER_SILENCE_DB', '-35'))
+RENDER_SILENCE_MIN_SECONDS = float(os.getenv('RENDER_SILENCE_MIN_SECONDS', '0.2'))
+
+# Decode/resize the image and compute audio features here instead of on the
+# GPU worker (needs numpy and ffmpeg; falls back to raw inputs without them)
+RENDER_PREPROCESS = os.getenv('RENDER_PREPROCESS', 'false').lower() == 'true'
+RENDER_IMAGE_MAX_SIDE = int(os.getenv('RENDER_IMAGE_MAX_SIDE', '1920'))
+
+# Per-job logs of render subprocesses (JOB_LOG_DIR/<job id>.log), rotated at
+# JOB_LOG_MAX_BYTES keeping JOB_LOG_BACKUPS old files
+JOB_LOG_DIR = os.getenv('JOB_LOG_DIR') or str(BASE_DIR / 'logs' / 'jobs')
+JOB_LOG_MAX_BYTES = int(os.getenv('JOB_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+JOB_LOG_BACKUPS = int(os.getenv('JOB_LOG_BACKUPS', '2'))
 
 # Backend base URL (for constructing video URLs)
 BACKEND_BASE_URL = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')
@@ -118,7 +162,85 @@ BACKEND_BASE_URL = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')
 # Runpod Serverless configuration
 USE_RUNPOD = os.getenv('USE_RUNPOD', 'false').lower() == 'true'
 RUNPOD_ENDPOINT_URL = os.getenv('RUNPOD_ENDPOINT_URL', '')
+# Several endpoints to balance across, "url|weight,url|weight" (overrides RUNPOD_ENDPOINT_URL)
+RUNPOD_ENDPOINTS = os.getenv('RUNPOD_ENDPOINTS', '')
+RUNPOD_EJECT_AFTER_FAILURES = int(os.getenv('RUNPOD_EJECT_AFTER_FAILURES', '3'))  # Consecutive failures
+RUNPOD_EJECT_SECONDS = float(os.getenv('RUNPOD_EJECT_SECONDS', '30'))  # Cooling period of an ejected endpoint
 RUNPOD_API_KEY = os.getenv('RUNPOD_API_KEY', '')
+RUNPOD_TIMEOUT = int(os.getenv('RUNPOD_TIMEOUT', '600'))  # Seconds per request
+RUNPOD_POOL_SIZE = int(os.getenv('RUNPOD_POOL_SIZE', '10'))  # Keep-alive connections per host
+RUNPOD_COMPRESSION = os.getenv('RUNPOD_COMPRESSION', 'gzip')  # gzip, zstd (needs zstandard) or none
+
+# Content-addressed artifact store for Runpod media ('' = inline base64 payloads)
+# file:///path/to/dir or http(s)://host/prefix (see manage.py serve_artifact_store)
+ARTIFACT_STORE_URL = os.getenv('ARTIFACT_STORE_URL', '')
+ARTIFACT_STORE_WORKER_URL = os.getenv('ARTIFACT_STORE_WORKER_URL', '')  # Store URL as seen by the worker
+
+# sync: hold a /runsync request per video; async: submit to /run and poll /status
+RUNPOD_MODE = os.getenv('RUNPOD_MODE', 'sync').lower()
+RUNPOD_POLL_INITIAL_INTERVAL = float(os.getenv('RUNPOD_POLL_INITIAL_INTERVAL', '2'))  # Seconds
+RUNPOD_POLL_MAX_INTERVAL = float(os.getenv('RUNPOD_POLL_MAX_INTERVAL', '30'))  # Seconds
+RUNPOD_POLL_BACKOFF = float(os.getenv('RUNPOD_POLL_BACKOFF', '1.5'))  # Interval multiplier per poll
+# Public base URL of this server; in async mode Runpod POSTs results to a signed
+# /api/runpod/webhook/ URL under it instead of being polled
+RUNPOD_WEBHOOK_BASE_URL = os.getenv('RUNPOD_WEBHOOK_BASE_URL', '')
+
+# Warm workers ahead of approvals while scripts are awaiting approval
+RUNPOD_PREWARM = os.getenv('RUNPOD_PREWARM', 'false').lower() == 'true'
+RUNPOD_PREWARM_APPROVAL_RATE = float(os.getenv('RUNPOD_PREWARM_APPROVAL_RATE', '0.8'))  # Share of scripts approved
+RUNPOD_PREWARM_MAX_AGE = int(os.getenv('RUNPOD_PREWARM_MAX_AGE', '900'))  # Seconds before a pending script is ignored
+RUNPOD_PREWARM_MAX_WORKERS = int(os.getenv('RUNPOD_PREWARM_MAX_WORKERS', '3'))
+RUNPOD_PREWARM_KEEPALIVE = int(os.getenv('RUNPOD_PREWARM_KEEPALIVE', '60'))  # Re-ping interval, below the idle timeout
+RUNPOD_PREWARM_INTERVAL = int(os.getenv('RUNPOD_PREWARM_INTERVAL', '15'))  # Seconds between demand checks
+
+# Retries and circuit breakers for Runpod and OpenAI (see reels.services.resilience)
+RESILIENCE_DEFAULTS = {
+    'max_attempts': int(os.getenv('RETRY_MAX_ATTEMPTS', '3')),  # Per call, including the first
+    'base_delay': float(os.getenv('RETRY_BASE_DELAY', '1')),  # Seconds, doubled per retry (jittered)
+    'max_delay': float(os.getenv('RETRY_MAX_DELAY', '30')),
+    'budget_ratio': float(os.getenv('RETRY_BUDGET_RATIO', '0.2')),  # Max retries per first attempt
+    'failure_threshold': int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),  # Consecutive failures to open
+    'reset_timeout': float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30')),  # Seconds open before a probe
+}
+# Per-dependency overrides: runpod, openai_chat, openai_tts
+RESILIENCE = {
+    'runpod': {'max_attempts': int(os.getenv('RUNPOD_RETRY_MAX_ATTEMPTS', '2'))},
+}
+RESILIENCE_MAX_REQUEUES = int(os.getenv('RESILIENCE_MAX_REQUEUES', '20'))  # Before a job is failed
+RESILIENCE_REQUEUE_MIN_DELAY = float(os.getenv('RESILIENCE_REQUEUE_MIN_DELAY', '5'))  # Seconds
+
+# OpenAI rate limits per model and minute, shared by all processes on this host.
+# Callers queue for capacity instead of hitting 429s. TTS tokens are input characters.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+OPENAI_RATE_LIMITS = {
+    'gpt-4o-mini': {
+        'requests': int(os.getenv('OPENAI_CHAT_RPM', '500')),
+        'tokens': int(os.getenv('OPENAI_CHAT_TPM', '200000')),
+    },
+    'tts-1': {
+        'requests': int(os.getenv('OPENAI_TTS_RPM', '50')),
+        'tokens': int(os.getenv('OPENAI_TTS_TPM', '0')),  # 0 = no limit
+    },
+}
+RATE_LIMIT_BURST_SECONDS = float(os.getenv('RATE_LIMIT_BURST_SECONDS', '10'))  # Bucket size in seconds of rate
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '300'))  # Longest queue wait before failing
+RATE_LIMIT_DIR = os.getenv('RATE_LIMIT_DIR') or str(BASE_DIR / 'ratelimit')  # Shared bucket state
+
+# Content-addressed TTS audio cache; hits are hard-linked into the job
+# directory, so keep it on the same filesystem as MEDIA_ROOT
+TTS_CACHE_ENABLED = os.getenv('TTS_CACHE_ENABLED', 'true').lower() == 'true'
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR') or str(BASE_DIR / 'tts_cache')
+TTS_CACHE_MAX_MB = int(os.getenv('TTS_CACHE_MAX_MB', '1024'))
+TTS_CACHE_MAX_AGE_DAYS = float(os.getenv('TTS_CACHE_MAX_AGE_DAYS', '30'))  # Since last use
+# Scripts longer than TTS_CHUNK_MIN_CHARS are voiced as sentence chunks (about
+# TTS_CHUNK_SENTENCES sentences, at most TTS_CHUNK_MAX_CHARS) on TTS_CHUNK_WORKERS threads
+TTS_CHUNK_MIN_CHARS = int(os.getenv('TTS_CHUNK_MIN_CHARS', '600'))
+TTS_CHUNK_MAX_CHARS = int(os.getenv('TTS_CHUNK_MAX_CHARS', '1000'))
+TTS_CHUNK_SENTENCES = int(os.getenv('TTS_CHUNK_SENTENCES', '3'))
+TTS_CHUNK_WORKERS = int(os.getenv('TTS_CHUNK_WORKERS', '4'))
+# TTS audio sent to the GPU worker, and the reel's audio_url (see services/audio_formats.py)
+TTS_RENDER_FORMAT = os.getenv('TTS_RENDER_FORMAT', 'mp3')
+TTS_DELIVERY_FORMAT = os.getenv('TTS_DELIVERY_FORMAT', 'mp3')
 
 # Async processing (returns immediately, processes in background)
 ASYNC_PROCESSING = os.getenv('ASYNC_PROCESSING', 'false').lower() == 'true'
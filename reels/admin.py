@@ -1,11 +1,27 @@
 from django.contrib import admin
-from .models import ReelJob
+from .models import ReelJob, ReelArtifact, RenderMetric
+
+
+class ReelArtifactInline(admin.TabularInline):
+    model = ReelArtifact
+    extra = 0
+    readonly_fields = ['name', 'file', 'width', 'height', 'video_bitrate', 'size_bytes', 'created_at']
+
+
+class RenderMetricInline(admin.TabularInline):
+    model = RenderMetric
+    extra = 0
+    can_delete = False
+    readonly_fields = [
+        'stage', 'wall_seconds', 'user_cpu_seconds', 'system_cpu_seconds', 'max_rss_kb',
+        'exit_status', 'created_at'
+    ]
 
 
 @admin.register(ReelJob)
 class ReelJobAdmin(admin.ModelAdmin):
-    list_display = ['id', 'status', 'created_at', 'tone']
-    list_filter = ['status', 'tone', 'created_at']
+    list_display = ['id', 'status', 'created_at', 'tone', 'render_preset']
+    list_filter = ['status', 'tone', 'render_preset', 'created_at']
     search_fields = ['id', 'original_script']
-    readonly_fields = ['id', 'created_at', 'updated_at']
-
+    readonly_fields = ['id', 'created_at', 'updated_at', 'runpod_job_id', 'runpod_endpoint', 'preview_pending']
+    inlines = [ReelArtifactInline, RenderMetricInline]
@@ -0,0 +1,97 @@
+"""
+Serve a directory as an HTTP artifact store (HEAD/GET/PUT /<sha256>).
+A local stand-in for object storage when testing the Runpod worker.
+"""
+import shutil
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from reels.services.artifact_store import LocalArtifactStore, ArtifactStoreError, CHUNK_SIZE
+
+
+class ArtifactRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front-end for a LocalArtifactStore (set as server.store)."""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def _blob_path(self):
+        try:
+            return self.server.store.path_for(self.path.strip('/').rsplit('/', 1)[-1])
+        except ArtifactStoreError:
+            self._reply(400)
+            return None
+    
+    def _reply(self, code: int, length: int = 0) -> None:
+        self.send_response(code)
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+    
+    def do_HEAD(self):
+        path = self._blob_path()
+        if path is not None:
+            if path.exists():
+                self._reply(200, path.stat().st_size)
+            else:
+                self._reply(404)
+    
+    def do_GET(self):
+        path = self._blob_path()
+        if path is None:
+            return
+        if not path.exists():
+            self._reply(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(path.stat().st_size))
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+    
+    def do_PUT(self):
+        path = self._blob_path()
+        if path is None:
+            return
+        remaining = int(self.headers.get('Content-Length', 0))
+        
+        def chunks():
+            nonlocal remaining
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        
+        try:
+            self.server.store.put_stream(chunks(), path.name)
+        except ArtifactStoreError:
+            self._reply(422)
+            return
+        self._reply(201)
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class Command(BaseCommand):
+    help = 'Serve a directory as a content-addressed HTTP artifact store'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--root', default=str(settings.MEDIA_ROOT / 'artifacts'),
+                            help='Directory holding the blobs')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8100)
+    
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer((options['host'], options['port']), ArtifactRequestHandler)
+        server.store = LocalArtifactStore(options['root'])
+        server.verbose = options['verbosity'] > 1
+        self.stdout.write(f"Artifact store serving {options['root']} on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reels", "0002_reeljob_script_approved_alter_reeljob_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reeljob",
+            name="runpod_job_id",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reels", "0003_reeljob_runpod_job_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reeljob",
+            name="runpod_endpoint",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reels", "0004_reeljob_runpod_endpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reeljob",
+            name="render_preset",
+            field=models.CharField(default="standard", max_length=20),
+        ),
+    ]
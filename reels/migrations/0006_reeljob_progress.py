@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reels", "0005_reeljob_render_preset"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reeljob",
+            name="progress_percent",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reeljob",
+            name="progress_stage",
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
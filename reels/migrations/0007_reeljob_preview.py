@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reels", "0006_reeljob_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reeljob",
+            name="preview_pending",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="reeljob",
+            name="preview_video_file",
+            field=models.FileField(blank=True, null=True, upload_to="reels/video/"),
+        ),
+        migrations.AlterField(
+            model_name="reeljob",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "pending"),
+                    ("script_pending_approval", "script_pending_approval"),
+                    ("script_approved", "script_approved"),
+                    ("processing", "processing"),
+                    ("done", "done"),
+                    ("error", "error"),
+                    ("rejected", "rejected"),
+                ],
+                default="pending",
+                max_length=25,
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reels", "0008_reelartifact"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RenderMetric",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stage", models.CharField(max_length=50)),
+                ("wall_seconds", models.FloatField()),
+                ("user_cpu_seconds", models.FloatField(blank=True, null=True)),
+                ("system_cpu_seconds", models.FloatField(blank=True, null=True)),
+                ("max_rss_kb", models.PositiveBigIntegerField(blank=True, null=True)),
+                ("exit_status", models.IntegerField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "reel_job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="metrics",
+                        to="reels.reeljob",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created_at"],
+            },
+        ),
+    ]
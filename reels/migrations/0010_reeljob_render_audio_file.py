@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reels", "0009_rendermetric"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reeljob",
+            name="render_audio_file",
+            field=models.FileField(blank=True, null=True, upload_to="reels/audio/"),
+        ),
+    ]
@@ -11,8 +11,9 @@ class ReelJob(models.Model):
         ('processing', 'processing'),  # Generating audio/video
         ('done', 'done'),
         ('error', 'error'),
+        ('rejected', 'rejected'),  # Rejected by a reviewer (e.g. after the preview)
     ]
-
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -20,11 +21,15 @@ class ReelJob(models.Model):
     original_script = models.TextField()
     final_script = models.TextField(blank=True, null=True)  # Approved script (after user approval)
     tone = models.CharField(max_length=50, default='neutral')
+    render_preset = models.CharField(max_length=20, default='standard')  # See services/render_presets.py
+    output_formats = models.JSONField(default=list, blank=True)  # Extra video variants, see services/output_formats.py
     script_approved = models.BooleanField(default=False)  # Whether user approved the script
     
     image = models.ImageField(upload_to='reels/images/')
     audio_file = models.FileField(upload_to='reels/audio/', null=True, blank=True)
+    render_audio_file = models.FileField(upload_to='reels/audio/', null=True, blank=True)  # TTS_RENDER_FORMAT copy, if it differs
     video_file = models.FileField(upload_to='reels/video/', null=True, blank=True)
+    preview_video_file = models.FileField(upload_to='reels/video/', null=True, blank=True)  # Quick draft render (two-pass mode)
     
     status = models.CharField(
         max_length=25,  # Increased to accommodate 'script_pending_approval' (23 chars)
@@ -32,10 +37,55 @@ class ReelJob(models.Model):
         default='pending'
     )
     error_message = models.TextField(null=True, blank=True)
-
+    progress_percent = models.PositiveSmallIntegerField(default=0)  # Video render progress (0-100)
+    progress_stage = models.CharField(max_length=50, null=True, blank=True)  # e.g. queued, face_render, done
+    runpod_job_id = models.CharField(max_length=100, null=True, blank=True)  # Remote job id (async Runpod mode)
+    runpod_endpoint = models.CharField(max_length=255, null=True, blank=True)  # Endpoint the job was routed to
+    preview_pending = models.BooleanField(default=False)  # runpod_job_id is the preview pass (two-pass mode)
+    
     class Meta:
         ordering = ['-created_at']
-
+    
     def __str__(self):
         return f"ReelJob {self.id} - {self.status}"
 
+
+class ReelArtifact(models.Model):
+    """An encoded variant (aspect ratio, size, bitrate) of a reel's video."""
+    
+    reel_job = models.ForeignKey(ReelJob, on_delete=models.CASCADE, related_name='artifacts')
+    name = models.CharField(max_length=20)  # Output format name, e.g. reel, feed, landscape
+    file = models.FileField(upload_to='reels/video/')
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    video_bitrate = models.CharField(max_length=10)
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['reel_job', 'name'], name='unique_reel_artifact_name'),
+        ]
+    
+    def __str__(self):
+        return f"ReelArtifact {self.reel_job_id} - {self.name}"
+
+
+class RenderMetric(models.Model):
+    """Resource usage of one stage of a reel's render (see services/process_runner.py)."""
+    
+    reel_job = models.ForeignKey(ReelJob, on_delete=models.CASCADE, related_name='metrics')
+    stage = models.CharField(max_length=50)  # e.g. sadtalker, render, encode_outputs, preview_render
+    wall_seconds = models.FloatField()
+    user_cpu_seconds = models.FloatField(null=True, blank=True)
+    system_cpu_seconds = models.FloatField(null=True, blank=True)
+    max_rss_kb = models.PositiveBigIntegerField(null=True, blank=True)  # Peak resident set size
+    exit_status = models.IntegerField(null=True, blank=True)  # None for in-process stages
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"RenderMetric {self.reel_job_id} - {self.stage}"
@@ -1,6 +1,23 @@
 from rest_framework import serializers
 from django.conf import settings
-from .models import ReelJob
+from .models import ReelJob, ReelArtifact
+from .services.render_presets import RENDER_PRESETS
+from .services.output_formats import OUTPUT_FORMATS
+
+
+class ReelArtifactSerializer(serializers.ModelSerializer):
+    """Serializer for an output format of a reel."""
+    
+    url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReelArtifact
+        fields = ['name', 'width', 'height', 'video_bitrate', 'size_bytes', 'url']
+    
+    def get_url(self, obj):
+        if obj.file:
+            return f"{settings.BACKEND_BASE_URL}{obj.file.url}"
+        return None
 
 
 class ReelJobSerializer(serializers.ModelSerializer):
@@ -10,17 +27,21 @@ class ReelJobSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     audio_url = serializers.SerializerMethodField()
     video_url = serializers.SerializerMethodField()
+    preview_video_url = serializers.SerializerMethodField()
+    artifacts = ReelArtifactSerializer(many=True, read_only=True)
     
     class Meta:
         model = ReelJob
         fields = [
-            'id', 'status', 'tone', 'original_script', 'final_script',
-            'image_url', 'audio_url', 'video_url',
-            'created_at', 'updated_at', 'error_message'
+            'id', 'status', 'tone', 'render_preset', 'output_formats', 'original_script',
+            'final_script', 'image_url', 'audio_url', 'video_url', 'preview_video_url',
+            'artifacts', 'progress_percent', 'progress_stage', 'created_at', 'updated_at',
+            'error_message'
         ]
         read_only_fields = [
-            'id', 'status', 'final_script', 'image_url', 'audio_url',
-            'video_url', 'created_at', 'updated_at', 'error_message'
+            'id', 'status', 'render_preset', 'output_formats', 'final_script', 'image_url',
+            'audio_url', 'video_url', 'preview_video_url', 'artifacts', 'progress_percent',
+            'progress_stage', 'created_at', 'updated_at', 'error_message'
         ]
     
     def get_image_url(self, obj):
@@ -37,6 +58,11 @@ class ReelJobSerializer(serializers.ModelSerializer):
         if obj.video_file:
             return f"{settings.BACKEND_BASE_URL}{obj.video_file.url}"
         return None
+    
+    def get_preview_video_url(self, obj):
+        if obj.preview_video_file:
+            return f"{settings.BACKEND_BASE_URL}{obj.preview_video_file.url}"
+        return None
 
 
 class ReelJobListSerializer(serializers.ModelSerializer):
@@ -67,6 +93,14 @@ class ReelJobCreateSerializer(serializers.Serializer):
         default='neutral',
         required=False
     )
+    render_preset = serializers.ChoiceField(
+        choices=list(RENDER_PRESETS),
+        required=False
+    )
+    output_formats = serializers.ListField(
+        child=serializers.ChoiceField(choices=list(OUTPUT_FORMATS)),
+        required=False
+    )
     use_rewrite = serializers.BooleanField(default=True, required=False)
     max_seconds = serializers.IntegerField(
         min_value=1,
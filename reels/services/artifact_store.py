@@ -0,0 +1,226 @@
+"""
+Content-addressed artifact store shared by Django and the Runpod worker.
+Blobs are keyed by their SHA-256, so a file is uploaded once and every later
+job that uses it (e.g. the same avatar image) only sends the hash.
+
+Backends are selected by ARTIFACT_STORE_URL:
+- file:///path or a plain path: a directory (local dev, tests, shared volume)
+- http(s)://host/prefix: HEAD/GET/PUT {url}/{sha256} (see serve_artifact_store)
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ArtifactStoreError(Exception):
+    """Exception for artifact store errors."""
+    pass
+
+
+def validate_digest(digest: str) -> str:
+    """Return digest if it is a lowercase hex SHA-256, else raise."""
+    if not isinstance(digest, str) or not _DIGEST_RE.match(digest):
+        raise ArtifactStoreError(f"Invalid artifact digest: {digest!r}")
+    return digest
+
+
+_digest_cache: dict[tuple[str, int, int], str] = {}
+_digest_cache_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    """
+    SHA-256 of a file, read in chunks.
+    Results are memoized by (path, size, mtime) so unchanged files such as a
+    reused avatar image are not re-hashed for every job.
+    """
+    stat = os.stat(path)
+    key = (str(Path(path).absolute()), stat.st_size, stat.st_mtime_ns)
+    with _digest_cache_lock:
+        cached = _digest_cache.get(key)
+    if cached:
+        return cached
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    
+    with _digest_cache_lock:
+        _digest_cache[key] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """Interface for content-addressed blob storage."""
+    
+    url = ''
+    
+    def has(self, digest: str) -> bool:
+        raise NotImplementedError
+    
+    def put_file(self, path: str, digest: str) -> None:
+        """Store the file under digest (callers pass its SHA-256)."""
+        raise NotImplementedError
+    
+    def get_to_file(self, digest: str, output_path: str) -> str:
+        """Write the blob to output_path and return the path."""
+        raise NotImplementedError
+    
+    def upload(self, path: str) -> dict:
+        """
+        Make sure a file is in the store, uploading it only if missing.
+        
+        Returns:
+            A reference {"sha256": ..., "size": ...} to put in a payload
+        """
+        digest = file_sha256(path)
+        if not self.has(digest):
+            self.put_file(path, digest)
+        return {"sha256": digest, "size": os.path.getsize(path)}
+
+
+class LocalArtifactStore(ArtifactStore):
+    """Blobs stored as files under root/<first two hex chars>/<digest>."""
+    
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.url = self.root.absolute().as_uri()
+    
+    def path_for(self, digest: str) -> Path:
+        validate_digest(digest)
+        return self.root / digest[:2] / digest
+    
+    def has(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+    
+    def put_file(self, path: str, digest: str) -> None:
+        target = self.path_for(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Copy to a temp name first so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=target.parent, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as dst, open(path, 'rb') as src:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(temp_path, target)
+        except Exception:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+    
+    def put_stream(self, chunks, digest: str) -> None:
+        """Store a stream of chunks, verifying it hashes to digest."""
+        target = self.path_for(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=target.parent, prefix='.upload-')
+        hasher = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as dst:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    dst.write(chunk)
+            if hasher.hexdigest() != digest:
+                raise ArtifactStoreError("Uploaded content does not match its digest")
+            os.replace(temp_path, target)
+        except Exception:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+    
+    def get_to_file(self, digest: str, output_path: str) -> str:
+        source = self.path_for(digest)
+        if not source.exists():
+            raise ArtifactStoreError(f"Artifact not found: {digest}")
+        output = Path(output_path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, output)
+        return str(output.absolute())
+
+
+class HTTPArtifactStore(ArtifactStore):
+    """Blobs behind an HTTP service exposing HEAD/GET/PUT {url}/{digest}."""
+    
+    def __init__(self, url: str, pool_size: int = 10, timeout: int = 300):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+    
+    def _blob_url(self, digest: str) -> str:
+        return f'{self.url}/{validate_digest(digest)}'
+    
+    def has(self, digest: str) -> bool:
+        try:
+            response = self._session.head(self._blob_url(digest), timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise ArtifactStoreError(f"Artifact store unreachable: {str(e)}")
+        if response.status_code == 404:
+            return False
+        if not response.ok:
+            raise ArtifactStoreError(f"Artifact store HEAD failed: {response.status_code}")
+        return True
+    
+    def put_file(self, path: str, digest: str) -> None:
+        try:
+            with open(path, 'rb') as f:
+                response = self._session.put(self._blob_url(digest), data=f, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise ArtifactStoreError(f"Artifact upload failed: {str(e)}")
+    
+    def get_to_file(self, digest: str, output_path: str) -> str:
+        output = Path(output_path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        partial = output.with_name(output.name + '.part')
+        try:
+            with self._session.get(self._blob_url(digest), timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                with open(partial, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+            os.replace(partial, output)
+        except requests.exceptions.RequestException as e:
+            partial.unlink(missing_ok=True)
+            raise ArtifactStoreError(f"Artifact download failed: {str(e)}")
+        return str(output.absolute())
+
+
+def open_artifact_store(url: str) -> ArtifactStore | None:
+    """Build a store from a URL; an empty URL means no store (inline base64)."""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme in ('http', 'https'):
+        return HTTPArtifactStore(url)
+    if parsed.scheme == 'file':
+        return LocalArtifactStore(parsed.path)
+    if parsed.scheme == '' or len(parsed.scheme) == 1:  # plain or Windows path
+        return LocalArtifactStore(url)
+    raise ArtifactStoreError(f"Unsupported artifact store URL: {url}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore | None:
+    """Return the process-wide store configured by ARTIFACT_STORE_URL, if any."""
+    global _store
+    if _store is None and settings.ARTIFACT_STORE_URL:
+        with _store_lock:
+            if _store is None:
+                _store = open_artifact_store(settings.ARTIFACT_STORE_URL)
+    return _store
@@ -0,0 +1,99 @@
+"""
+Audio formats of the TTS-to-render path.
+
+TTS audio is used twice: as the render input shipped to the GPU worker
+(TTS_RENDER_FORMAT), where SadTalker decodes it to 16 kHz mono PCM anyway,
+and as the reel's audio_url (TTS_DELIVERY_FORMAT). The render format is
+the one requested from the TTS API; the delivery file is transcoded from
+the same synthesis when the formats differ.
+
+- mp3, aac: what listeners expect, but lossy and slow-ish to decode
+- opus: Ogg Opus, the smallest payload
+- flac, wav: lossless 24 kHz, the TTS output as-is (long scripts are
+  voiced in chunks, see tts_chunks: wav chunks are joined here, flac
+  chunks need ffmpeg)
+- flac16k, wav16k: lossless 16 kHz mono, exactly what SadTalker consumes;
+  requested as raw PCM and resampled here (needs ffmpeg)
+
+benchmarks/bench_audio_formats.py compares payload size and decode time.
+"""
+import subprocess
+from pathlib import Path
+from django.conf import settings
+
+
+class AudioFormatError(Exception):
+    """Raised for an unknown format or a failed conversion."""
+    pass
+
+
+# OpenAI's "pcm" response: raw 24 kHz signed 16-bit little-endian mono
+PCM_SAMPLE_RATE = 24000
+
+AUDIO_FORMATS = {
+    'mp3': {'api_format': 'mp3', 'suffix': '.mp3', 'codec': ['-c:a', 'libmp3lame', '-q:a', '2']},
+    'aac': {'api_format': 'aac', 'suffix': '.aac', 'codec': ['-c:a', 'aac', '-b:a', '128k']},
+    'opus': {'api_format': 'opus', 'suffix': '.ogg', 'codec': ['-c:a', 'libopus', '-b:a', '48k']},
+    'flac': {'api_format': 'flac', 'suffix': '.flac', 'codec': ['-c:a', 'flac']},
+    'wav': {'api_format': 'wav', 'suffix': '.wav', 'codec': ['-c:a', 'pcm_s16le']},
+    'flac16k': {'api_format': 'pcm', 'suffix': '.flac', 'codec': ['-c:a', 'flac'], 'sample_rate': 16000},
+    'wav16k': {'api_format': 'pcm', 'suffix': '.wav', 'codec': ['-c:a', 'pcm_s16le'], 'sample_rate': 16000},
+}
+
+
+def get_format(name: str) -> dict:
+    """
+    Raises:
+        AudioFormatError: If the format does not exist
+    """
+    if name not in AUDIO_FORMATS:
+        raise AudioFormatError(f"Unknown audio format '{name}' (choose from {', '.join(AUDIO_FORMATS)})")
+    return {'name': name, **AUDIO_FORMATS[name]}
+
+
+def _run_ffmpeg(args: list[str]) -> None:
+    cmd = [settings.FFMPEG_BINARY, '-hide_banner', '-nostdin', '-y', *args]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+    except FileNotFoundError:
+        raise AudioFormatError(f"ffmpeg not found: {settings.FFMPEG_BINARY}")
+    except subprocess.TimeoutExpired:
+        raise AudioFormatError("Audio conversion timed out")
+    if result.returncode != 0:
+        raise AudioFormatError(f"Audio conversion failed: {result.stderr[-1000:]}")
+
+
+def convert_audio(source_path: Path, output_path: Path, audio_format: dict, raw_pcm: bool = False) -> None:
+    """
+    Convert TTS audio into audio_format (transcode, or resample for the 16 kHz
+    formats). output_path is replaced, never written in place.
+    
+    Args:
+        source_path: Audio to convert
+        output_path: Where to write the result
+        audio_format: Target format from get_format
+        raw_pcm: Source is the headerless "pcm" TTS response
+    
+    Raises:
+        AudioFormatError: If ffmpeg is missing or fails
+    """
+    source_args = ['-f', 's16le', '-ar', str(PCM_SAMPLE_RATE), '-ac', '1'] if raw_pcm else []
+    rate_args = ['-ar', str(audio_format['sample_rate'])] if audio_format.get('sample_rate') else []
+    temp_path = output_path.with_name(f'.{output_path.name}.part{output_path.suffix}')
+    try:
+        _run_ffmpeg([
+            *source_args, '-i', str(source_path),
+            '-vn', '-ac', '1', *rate_args,
+            *audio_format['codec'],
+            str(temp_path)
+        ])
+        temp_path.replace(output_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def render_audio_path(reel_job) -> Path:
+    """Audio to render a reel from: its render-format audio if it has one, else its audio_file."""
+    if reel_job.render_audio_file and Path(reel_job.render_audio_file.path).exists():
+        return Path(reel_job.render_audio_file.path)
+    return Path(reel_job.audio_file.path)
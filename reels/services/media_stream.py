@@ -0,0 +1,412 @@
+"""
+Streaming helpers for moving media through base64 JSON bodies.
+Request bodies are produced incrementally from files on disk and base64 fields
+in responses are decoded straight to disk, so no full copy of a video is ever
+held in memory.
+"""
+import base64
+import binascii
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+# Multiple of 3 so every raw chunk encodes to base64 without padding
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+# Size of chunks read from HTTP responses
+DECODE_CHUNK_SIZE = 64 * 1024
+
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_WHITESPACE = b' \t\r\n'
+
+
+class MediaStreamError(Exception):
+    """Exception for malformed streamed media payloads."""
+    pass
+
+
+def available_encodings() -> list[str]:
+    """Content codings supported in this process, most preferred first."""
+    return ['zstd', 'gzip'] if zstandard else ['gzip']
+
+
+def get_compressor(encoding: str):
+    """Return a streaming compressor (compress()/flush()) for a content coding."""
+    if encoding == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if encoding == 'zstd' and zstandard:
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    raise MediaStreamError(f"Unsupported content encoding: {encoding}")
+
+
+def get_decompressor(encoding: str):
+    """Return a streaming decompressor (decompress()) for a content coding."""
+    if encoding == 'gzip':
+        return zlib.decompressobj(31)
+    if encoding == 'zstd' and zstandard:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise MediaStreamError(f"Unsupported content encoding: {encoding}")
+
+
+def iter_compressed(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress a stream of chunks with the given content coding."""
+    compressor = get_compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    tail = compressor.flush()
+    if tail:
+        yield tail
+
+
+def decompress_file(path: str, encoding: str, chunk_size: int = DECODE_CHUNK_SIZE) -> None:
+    """Decompress a file in place without loading it into memory."""
+    source = Path(path)
+    partial = source.with_name(source.name + '.part')
+    decompressor = get_decompressor(encoding)
+    try:
+        with open(source, 'rb') as src, open(partial, 'wb') as dst:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                dst.write(decompressor.decompress(chunk))
+            dst.write(decompressor.flush())
+    except Exception as e:
+        partial.unlink(missing_ok=True)
+        raise MediaStreamError(f"Failed to decompress {source.name}: {str(e)}") from e
+    os.replace(partial, source)
+
+
+class Base64File:
+    """
+    A file whose contents are emitted as a base64 JSON string by iter_json_body.
+    If encoding is set the contents are compressed before being base64-encoded.
+    """
+    
+    def __init__(self, path: str, encoding: str | None = None, chunk_size: int = ENCODE_CHUNK_SIZE):
+        self.path = str(path)
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+    
+    def encoded_length(self) -> int | None:
+        """Length of the base64 text for this file, or None if compressed."""
+        if self.encoding:
+            return None
+        size = os.path.getsize(self.path)
+        return 4 * ((size + 2) // 3)
+    
+    def iter_encoded(self) -> Iterator[bytes]:
+        """Yield the file contents as base64 text, one chunk at a time."""
+        if self.encoding:
+            carry = b''
+            for data in iter_compressed(self._iter_raw(), self.encoding):
+                data = carry + data
+                usable = len(data) - len(data) % 3
+                carry = data[usable:]
+                if usable:
+                    yield base64.b64encode(data[:usable])
+            if carry:
+                yield base64.b64encode(carry)
+        else:
+            for chunk in self._iter_raw():
+                yield base64.b64encode(chunk)
+    
+    def _iter_raw(self) -> Iterator[bytes]:
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def iter_json_body(obj) -> Iterator[bytes]:
+    """
+    Serialize obj as JSON, streaming any Base64File values from disk.
+    
+    Args:
+        obj: A JSON-compatible structure that may contain Base64File values
+    
+    Yields:
+        Chunks of UTF-8 encoded JSON
+    """
+    if isinstance(obj, Base64File):
+        yield b'"'
+        yield from obj.iter_encoded()
+        yield b'"'
+    elif isinstance(obj, dict):
+        yield b'{'
+        for index, (key, value) in enumerate(obj.items()):
+            if index:
+                yield b', '
+            yield json.dumps(str(key)).encode('utf-8')
+            yield b': '
+            yield from iter_json_body(value)
+        yield b'}'
+    elif isinstance(obj, (list, tuple)):
+        yield b'['
+        for index, value in enumerate(obj):
+            if index:
+                yield b', '
+            yield from iter_json_body(value)
+        yield b']'
+    else:
+        yield json.dumps(obj).encode('utf-8')
+
+
+def json_body_length(obj) -> int | None:
+    """Exact byte length of iter_json_body(obj), or None if it can't be known."""
+    if isinstance(obj, Base64File):
+        length = obj.encoded_length()
+        return None if length is None else length + 2
+    if isinstance(obj, dict):
+        parts = [json_body_length(value) for value in obj.values()]
+        if None in parts:
+            return None
+        length = 2 + max(len(obj) - 1, 0) * 2 + sum(parts)
+        for key in obj:
+            length += len(json.dumps(str(key)).encode('utf-8')) + 2
+        return length
+    if isinstance(obj, (list, tuple)):
+        parts = [json_body_length(value) for value in obj]
+        if None in parts:
+            return None
+        return 2 + max(len(obj) - 1, 0) * 2 + sum(parts)
+    return len(json.dumps(obj).encode('utf-8'))
+
+
+class JSONBodyStream:
+    """
+    Re-iterable request body with a known length.
+    requests sends it with a Content-Length header instead of chunked encoding.
+    """
+    
+    def __init__(self, obj):
+        length = json_body_length(obj)
+        if length is None:
+            raise MediaStreamError("Body length is unknown; stream iter_json_body() instead")
+        self._obj = obj
+        self._length = length
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __iter__(self) -> Iterator[bytes]:
+        return iter_json_body(self._obj)
+
+
+class Base64StreamDecoder:
+    """Incrementally decode base64 text into a binary file object."""
+    
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._pending = b''
+        self.bytes_written = 0
+    
+    def write(self, data: bytes) -> None:
+        data = self._pending + data
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if usable:
+            self._emit(data[:usable])
+    
+    def close(self) -> None:
+        if self._pending:
+            # Tolerate producers that strip trailing padding
+            padded = self._pending + b'=' * (-len(self._pending) % 4)
+            self._pending = b''
+            self._emit(padded)
+    
+    def _emit(self, data: bytes) -> None:
+        try:
+            decoded = base64.b64decode(data)
+        except binascii.Error as e:
+            raise MediaStreamError(f"Invalid base64 data: {str(e)}") from e
+        self._fileobj.write(decoded)
+        self.bytes_written += len(decoded)
+
+
+class _FieldSink:
+    """
+    Destination file for one streamed base64 field. It is decoded next to
+    the target and only swapped in by commit(), once the whole document
+    has parsed.
+    """
+    
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._partial_path = path.with_name(path.name + '.part')
+        self._file = open(self._partial_path, 'wb')
+        self._decoder = Base64StreamDecoder(self._file)
+    
+    @property
+    def bytes_written(self) -> int:
+        return self._decoder.bytes_written
+    
+    def write(self, data: bytes) -> None:
+        if data:
+            self._decoder.write(data)
+    
+    def finish(self) -> None:
+        """Flush the decoder and close the partial file."""
+        try:
+            self._decoder.close()
+        finally:
+            self._file.close()
+    
+    def commit(self) -> None:
+        os.replace(self._partial_path, self.path)
+    
+    def abort(self) -> None:
+        self._file.close()
+        self._partial_path.unlink(missing_ok=True)
+
+
+def stream_base64_fields(chunks: Iterable[bytes], sinks: dict[str, str]) -> tuple[dict, dict[str, str]]:
+    """
+    Parse a JSON document from chunks, decoding selected base64 fields to disk.
+    
+    Any string value whose key is in sinks is decoded as it arrives and
+    replaced by an empty string in the returned document. The mapped paths
+    are only replaced once the whole document has parsed; an empty value
+    (e.g. "video_base64": "" on errors) leaves its path untouched and is not
+    reported as written. Everything else is buffered and parsed normally,
+    so it must be small.
+    
+    Args:
+        chunks: Iterable of raw JSON bytes (e.g. response.iter_content())
+        sinks: Mapping of field name -> output file path
+    
+    Returns:
+        Tuple of (parsed document, mapping of field name -> written file path)
+    
+    Raises:
+        MediaStreamError: If the document or a base64 field is malformed
+    """
+    skeleton = bytearray()
+    finished: dict[str, _FieldSink] = {}
+    state = 'out'  # out | string | sink
+    escape_pending = False
+    string_start = 0
+    last_string = None
+    last_significant = None
+    pending_key = None
+    sink = None
+    
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            i = 0
+            n = len(chunk)
+            while i < n:
+                if state == 'sink':
+                    if escape_pending:
+                        escape_pending = False
+                        if chunk[i:i + 1] == b'/':
+                            sink.write(b'/')
+                        i += 1
+                        continue
+                    match = _STRING_SPECIAL.search(chunk, i)
+                    end = match.start() if match else n
+                    sink.write(chunk[i:end])
+                    if not match:
+                        i = n
+                    elif chunk[end:end + 1] == b'"':
+                        sink.finish()
+                        if sink.bytes_written:
+                            finished[pending_key] = sink
+                        else:
+                            sink.abort()
+                        sink = None
+                        skeleton += b'"'
+                        state = 'out'
+                        last_significant = b'"'
+                        i = end + 1
+                    else:
+                        # Only "\/" can legitimately appear inside base64 text;
+                        # other escapes are whitespace and are dropped
+                        if end + 1 < n:
+                            if chunk[end + 1:end + 2] == b'/':
+                                sink.write(b'/')
+                            i = end + 2
+                        else:
+                            escape_pending = True
+                            i = n
+                elif state == 'string':
+                    if escape_pending:
+                        escape_pending = False
+                        skeleton += chunk[i:i + 1]
+                        i += 1
+                        continue
+                    match = _STRING_SPECIAL.search(chunk, i)
+                    end = match.start() if match else n
+                    skeleton += chunk[i:end]
+                    if not match:
+                        i = n
+                    elif chunk[end:end + 1] == b'"':
+                        skeleton += b'"'
+                        last_string = json.loads(bytes(skeleton[string_start:]))
+                        state = 'out'
+                        last_significant = b'"'
+                        i = end + 1
+                    else:
+                        skeleton += b'\\'
+                        if end + 1 < n:
+                            skeleton += chunk[end + 1:end + 2]
+                            i = end + 2
+                        else:
+                            escape_pending = True
+                            i = n
+                else:
+                    byte = chunk[i:i + 1]
+                    if byte == b'"':
+                        if last_significant == b':' and pending_key in sinks:
+                            sink = _FieldSink(Path(sinks[pending_key]))
+                            skeleton += b'"'
+                            state = 'sink'
+                        else:
+                            string_start = len(skeleton)
+                            skeleton += b'"'
+                            state = 'string'
+                    else:
+                        skeleton += byte
+                        if byte not in _WHITESPACE:
+                            if byte == b':':
+                                pending_key = last_string
+                            last_significant = byte
+                    i += 1
+        
+        if state != 'out':
+            raise MediaStreamError("Unexpected end of JSON document")
+        
+        try:
+            document = json.loads(bytes(skeleton))
+        except ValueError as e:
+            raise MediaStreamError(f"Invalid JSON document: {str(e)}") from e
+        
+        written: dict[str, str] = {}
+        for key, finished_sink in list(finished.items()):
+            finished_sink.commit()
+            written[key] = str(finished_sink.path.absolute())
+            del finished[key]
+    
+    except Exception:
+        if sink is not None:
+            sink.abort()
+        for finished_sink in finished.values():
+            finished_sink.abort()
+        raise
+    
+    return document, written
@@ -0,0 +1,144 @@
+"""
+Offline stand-ins for the OpenAI rewrite and TTS providers.
+
+Both are deterministic: the same input gives the same script or audio, so
+the TTS cache and every later stage behave as with the real API. They
+sleep as long as the API roughly takes (OFFLINE_LATENCY_SCALE times the
+models below, with lognormal OFFLINE_LATENCY_JITTER), so load tests see
+realistic concurrency. Select them with REWRITE_PROVIDER=template and
+TTS_PROVIDER=synthetic.
+
+- TemplateRewriter wraps the script's sentences in a tone's opening and
+  closing line and trims it to max_seconds at 2.5 words per second
+- SyntheticTTS "speaks" one harmonic tone per word with pauses after
+  words, clauses and sentences, at 24 kHz mono like OpenAI's output, so
+  silence detection and audio features see speech-like structure.
+  pcm and wav need nothing else; other formats are encoded with ffmpeg.
+"""
+import hashlib
+import io
+import random
+import time
+import wave
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from .providers import RewriteProvider, TTSProvider, write_audio
+from .audio_formats import PCM_SAMPLE_RATE, get_format, convert_audio
+from .tts_chunks import split_sentences
+
+# Latency model: (seconds per request, seconds per unit of output)
+REWRITE_LATENCY = (0.8, 0.02)  # Per word of the rewritten script
+TTS_LATENCY = (0.4, 0.003)  # Per character of input
+
+WORDS_PER_SECOND = 2.5
+
+TONE_TEMPLATES = {
+    'neutral': ('', ''),
+    'friendly': ('Hey there!', 'Thanks for watching!'),
+    'formal': ('Good day.', 'Thank you for your attention.'),
+    'energetic': ('Get ready!', "Let's go!"),
+    'dramatic': ('Imagine this.', 'Nothing will be the same.'),
+}
+
+# Synthetic speech timing in seconds
+WORD_SECONDS = 0.1
+CHAR_SECONDS = 0.04
+FADE_SECONDS = 0.01
+WORD_PAUSE = 0.08
+CLAUSE_PAUSE = 0.2
+SENTENCE_PAUSE = 0.45
+
+
+def simulate_latency(latency: tuple[float, float], units: int) -> None:
+    """Sleep like an API call producing units of output would take."""
+    scale = settings.OFFLINE_LATENCY_SCALE
+    if scale <= 0:
+        return
+    base, per_unit = latency
+    time.sleep(scale * (base + per_unit * units) * random.lognormvariate(0, settings.OFFLINE_LATENCY_JITTER))
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode('utf-8')).digest()[:4], 'big')
+
+
+class TemplateRewriter(RewriteProvider):
+    name = 'template'
+    
+    def rewrite(self, original_script: str, tone: str, max_seconds: int | None) -> str:
+        opening, closing = TONE_TEMPLATES.get(tone, TONE_TEMPLATES['neutral'])
+        sentences = split_sentences(original_script)
+        if tone == 'energetic':
+            sentences = [sentence[:-1] + '!' if sentence.endswith('.') else sentence for sentence in sentences]
+        
+        if max_seconds:
+            budget = int(max_seconds * WORDS_PER_SECOND) - len(f'{opening} {closing}'.split())
+            kept, words = [], 0
+            for sentence in sentences:
+                words += len(sentence.split())
+                if kept and words > budget:
+                    break
+                kept.append(sentence)
+            if kept and len(kept[0].split()) > budget:
+                kept = [' '.join(kept[0].split()[:max(1, budget)])]
+            sentences = kept
+        
+        script = ' '.join(part for part in (opening, *sentences, closing) if part)
+        simulate_latency(REWRITE_LATENCY, len(script.split()))
+        return script
+
+
+class SyntheticTTS(TTSProvider):
+    name = 'synthetic'
+    model = 'synthetic-1'
+    
+    def synthesize(self, text: str, voice: str, response_format: str, audio_path: Path) -> None:
+        simulate_latency(TTS_LATENCY, len(text))
+        pcm = speech_samples(text, voice).tobytes()
+        if response_format == 'pcm':
+            write_audio(audio_path, [pcm])
+        elif response_format == 'wav':
+            write_audio(audio_path, [wav_bytes(pcm)])
+        else:
+            wav_path = audio_path.with_name(f'.{audio_path.name}.wav')
+            try:
+                write_audio(wav_path, [wav_bytes(pcm)])
+                convert_audio(wav_path, audio_path, get_format(response_format))
+            finally:
+                wav_path.unlink(missing_ok=True)
+
+
+def speech_samples(text: str, voice: str) -> np.ndarray:
+    """Tone-per-word "speech" as 16-bit little-endian mono samples at PCM_SAMPLE_RATE."""
+    base_pitch = 100 + _stable_hash(voice) % 120
+    pieces = []
+    for word in text.split():
+        stripped = word.rstrip('"\'”’)]')
+        pitch = base_pitch * (1 + _stable_hash(stripped.lower()) % 25 / 100)
+        duration = WORD_SECONDS + CHAR_SECONDS * len(stripped.strip('.,;:!?…'))
+        t = np.arange(int(duration * PCM_SAMPLE_RATE)) / PCM_SAMPLE_RATE
+        tone = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in (1, 2, 3))
+        envelope = np.clip(np.minimum(t, duration - t) / FADE_SECONDS, 0, 1)
+        pieces.append(0.25 * tone * envelope)
+        
+        if stripped.endswith(('.', '!', '?', '…')):
+            pause = SENTENCE_PAUSE
+        elif stripped.endswith((',', ';', ':')):
+            pause = CLAUSE_PAUSE
+        else:
+            pause = WORD_PAUSE
+        pieces.append(np.zeros(int(pause * PCM_SAMPLE_RATE)))
+    
+    audio = np.concatenate(pieces) if pieces else np.zeros(PCM_SAMPLE_RATE // 10)
+    return (audio * 32767).astype('<i2')
+
+
+def wav_bytes(pcm: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(PCM_SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
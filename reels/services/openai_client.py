@@ -0,0 +1,50 @@
+"""
+Process-wide OpenAI client.
+
+All rewrite and TTS calls share one OpenAI client and with it one HTTP
+connection pool, instead of building a client (and opening new TLS
+connections) per call. The client is thread-safe: request threads and TTS
+chunk threads draw from the same pool of at most OPENAI_MAX_CONNECTIONS
+connections, OPENAI_MAX_KEEPALIVE of which are kept alive for
+OPENAI_KEEPALIVE_SECONDS between calls.
+
+Retries are handled by the resilience layer, not the SDK.
+"""
+import threading
+import httpx
+from django.conf import settings
+from openai import OpenAI, DefaultHttpxClient
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client() -> OpenAI:
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE,
+                        keepalive_expiry=settings.OPENAI_KEEPALIVE_SECONDS,
+                    ),
+                )
+                _client = OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    max_retries=0,
+                    timeout=settings.OPENAI_TIMEOUT,
+                    http_client=http_client,
+                )
+    return _client
+
+
+def close_openai_client() -> None:
+    """Close the shared client's connections; the next call creates a new one."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
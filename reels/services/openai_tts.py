@@ -1,10 +1,33 @@
 """
-OpenAI Text-to-Speech service.
+Text-to-Speech service.
+
+Speech is synthesized by the TTS_PROVIDER (see providers): OpenAITTS below,
+or an offline stand-in.
+
+Generated audio is cached by content (see tts_cache): a script that has
+been voiced before is linked from the cache without calling the API.
+
+Long scripts are split at sentence boundaries (see tts_chunks); the chunks
+are voiced concurrently, each through the cache, and joined in order.
+
+The API is asked for TTS_RENDER_FORMAT, the audio sent to the GPU worker
+(ReelJob.render_audio_file); audio_file, the user-facing audio, is in
+TTS_DELIVERY_FORMAT, transcoded from the same synthesis if the formats
+differ (see audio_formats).
 """
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from django.conf import settings
-from openai import OpenAI
+from .openai_client import get_openai_client
+from .resilience import get_dependency, CircuitOpenError
+from .rate_limiter import acquire_openai_capacity, settle_openai_tokens
+from . import tts_cache
+from .tts_chunks import split_script, join_audio
+from .audio_formats import get_format, convert_audio
+from .providers import TTSProvider, get_tts_provider, write_audio
 from ..models import ReelJob
 
 
@@ -15,8 +38,9 @@ class OpenAITTSError(Exception):
 
 def generate_tts_audio(script: str, reel_job: ReelJob) -> str:
     """
-    Generate speech audio for the given script using OpenAI TTS API.
-    Save it under the reel's folder, update the ReelJob.audio_file, and return the absolute path.
+    Generate speech audio for the given script with the TTS_PROVIDER.
+    Save it under the reel's folder, update ReelJob.audio_file (and
+    render_audio_file), and return the absolute path of audio_file.
     
     Args:
         script: The script text to convert to speech
@@ -27,38 +51,119 @@ def generate_tts_audio(script: str, reel_job: ReelJob) -> str:
     
     Raises:
         OpenAITTSError: If the TTS generation fails
+        CircuitOpenError: If OpenAI TTS has been failing and calls are paused
     """
-    api_key = settings.OPENAI_API_KEY
-    if not api_key:
-        raise OpenAITTSError("OPENAI_API_KEY not configured in settings")
-    
-    client = OpenAI(api_key=api_key)
-    
     # Create job-specific directory
     job_dir = settings.MEDIA_ROOT / 'reels' / str(reel_job.id)
     job_dir.mkdir(parents=True, exist_ok=True)
     
-    audio_path = job_dir / 'audio.mp3'
+    voice = "alloy"  # Options: alloy, echo, fable, onyx, nova, shimmer
     
     try:
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="alloy",  # Options: alloy, echo, fable, onyx, nova, shimmer
-            input=script,
-        )
+        provider = get_tts_provider()
+        render_format = get_format(settings.TTS_RENDER_FORMAT)
+        delivery_format = get_format(settings.TTS_DELIVERY_FORMAT)
+        same_format = render_format['name'] == delivery_format['name']
+        audio_path = job_dir / f"audio{delivery_format['suffix']}"
+        render_path = audio_path if same_format else job_dir / f"render_audio{render_format['suffix']}"
+        render_key = tts_cache.cache_key(script, provider.model, voice, render_format['name'])
+        delivery_key = tts_cache.cache_key(script, provider.model, voice, delivery_format['name'])
         
-        # Save the audio file
-        with open(audio_path, 'wb') as f:
-            for chunk in response.iter_bytes():
-                f.write(chunk)
+        have_render = tts_cache.fetch(render_key, render_format['name'], render_path)
+        have_delivery = same_format or tts_cache.fetch(delivery_key, delivery_format['name'], audio_path)
+        if not (have_render and have_delivery):
+            with tempfile.TemporaryDirectory(prefix='.tts-', dir=job_dir) as work_dir:
+                source, raw_pcm = render_path, False
+                if not have_render:
+                    api_format = render_format['api_format']
+                    source, raw_pcm = Path(work_dir) / f'speech.{api_format}', api_format == 'pcm'
+                    _synthesize_script(script, provider, voice, api_format, source)
+                    if render_format.get('sample_rate'):
+                        convert_audio(source, render_path, render_format, raw_pcm)
+                    else:
+                        os.replace(source, render_path)
+                        source, raw_pcm = render_path, False
+                    tts_cache.store(render_key, render_format['name'], render_path)
+                if not have_delivery:
+                    # From the full-rate synthesis when there is one
+                    convert_audio(source, audio_path, delivery_format, raw_pcm)
+                    tts_cache.store(delivery_key, delivery_format['name'], audio_path)
+            tts_cache.evict_if_due()
         
         # Update the ReelJob model
-        relative_audio_path = f'reels/{reel_job.id}/audio.mp3'
-        reel_job.audio_file.name = relative_audio_path
+        reel_job.audio_file.name = f'reels/{reel_job.id}/{audio_path.name}'
+        reel_job.render_audio_file.name = None if same_format else f'reels/{reel_job.id}/{render_path.name}'
         reel_job.save()
         
         return str(audio_path.absolute())
     
+    except (CircuitOpenError, OpenAITTSError):
+        raise
     except Exception as e:
         raise OpenAITTSError(f"Failed to generate TTS audio: {str(e)}") from e
 
+
+def _synthesize_script(script: str, provider: TTSProvider, voice: str, response_format: str, audio_path: Path) -> None:
+    """Voice a script in response_format, in sentence chunks if it is long."""
+    chunks = split_script(script)
+    if len(chunks) > 1:
+        _synthesize_chunks(chunks, provider, voice, response_format, audio_path)
+    else:
+        provider.synthesize(script, voice, response_format, audio_path)
+
+
+def _synthesize_chunks(
+    chunks: list[str],
+    provider: TTSProvider,
+    voice: str,
+    response_format: str,
+    audio_path: Path
+) -> None:
+    """
+    Voice script chunks on up to TTS_CHUNK_WORKERS threads and join them in
+    order into audio_path. Chunks found in the cache are not synthesized.
+    """
+    with tempfile.TemporaryDirectory(prefix='.tts-', dir=audio_path.parent) as work_dir:
+        chunk_paths = [Path(work_dir) / f'{index:04d}.{response_format}' for index in range(len(chunks))]
+        workers = max(1, min(settings.TTS_CHUNK_WORKERS, len(chunks)))
+        synthesize = partial(_synthesize_cached, provider=provider, voice=voice, response_format=response_format)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts') as pool:
+            # list() re-raises the first failure in chunk order
+            list(pool.map(synthesize, chunks, chunk_paths))
+        join_audio(chunk_paths, audio_path, raw_pcm=response_format == 'pcm')
+
+
+def _synthesize_cached(text: str, audio_path: Path, provider: TTSProvider, voice: str, response_format: str) -> None:
+    cache_key = tts_cache.cache_key(text, provider.model, voice, response_format)
+    if not tts_cache.fetch(cache_key, response_format, audio_path):
+        provider.synthesize(text, voice, response_format, audio_path)
+        tts_cache.store(cache_key, response_format, audio_path)
+
+
+class OpenAITTS(TTSProvider):
+    """OpenAI speech API."""
+    name = 'openai'
+    model = 'tts-1'
+    
+    def synthesize(self, text: str, voice: str, response_format: str, audio_path: Path) -> None:
+        api_key = settings.OPENAI_API_KEY
+        if not api_key:
+            raise OpenAITTSError("OPENAI_API_KEY not configured in settings")
+        
+        client = get_openai_client()
+        
+        def attempt():
+            acquire_openai_capacity(self.model, len(text))  # TTS is metered in characters
+            try:
+                return client.audio.speech.create(
+                    model=self.model,
+                    voice=voice,
+                    input=text,
+                    response_format=response_format,
+                )
+            except Exception:
+                settle_openai_tokens(self.model, len(text), 0)  # A failed call uses no characters
+                raise
+        
+        response = get_dependency('openai_tts').call(attempt)
+        write_audio(audio_path, response.iter_bytes())
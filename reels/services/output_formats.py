@@ -0,0 +1,147 @@
+"""
+Named output formats (aspect ratio / size / bitrate variants) of a reel.
+
+A ReelJob declares the formats it needs in output_formats. They are sent to
+runpod_handler as the "outputs" input; after rendering, the handler decodes
+the SadTalker video once and encodes every variant from one ffmpeg filter
+graph. Each variant comes back as "<name>_video_base64" (or "_ref") and is
+recorded as a ReelArtifact of the job. Segmented renders are only whole
+once joined in Django, so their variants are encoded here the same way
+(encode_outputs).
+
+- fit "crop" fills the frame and cuts the overflow (portrait photos)
+- fit "pad" fits the whole video and letterboxes it (square face crops)
+"""
+from pathlib import Path
+from django.conf import settings
+from ..models import ReelArtifact
+from .process_runner import run_logged, open_job_log, close_job_log, record_metrics, ProcessRunError
+
+
+class OutputFormatError(Exception):
+    """Raised for an unknown output format."""
+    pass
+
+
+OUTPUT_FORMATS = {
+    'reel': {'width': 1080, 'height': 1920, 'video_bitrate': '4M', 'fit': 'crop'},
+    'reel_720': {'width': 720, 'height': 1280, 'video_bitrate': '2M', 'fit': 'crop'},
+    'feed': {'width': 1080, 'height': 1080, 'video_bitrate': '3M', 'fit': 'crop'},
+    'landscape': {'width': 1920, 'height': 1080, 'video_bitrate': '4M', 'fit': 'pad'},
+}
+
+# x264 preset of variants encoded in Django (the worker's OUTPUT_X264_PRESET default)
+X264_PRESET = 'veryfast'
+
+
+def resolve_outputs(names: list[str] | None) -> list[dict]:
+    """
+    Resolve format names to the "outputs" payload sent to runpod_handler.
+    
+    Args:
+        names: Format names, None for DEFAULT_OUTPUT_FORMATS
+    
+    Returns:
+        [{"name": ..., "width": ..., "height": ..., "video_bitrate": ..., "fit": ...}]
+    
+    Raises:
+        OutputFormatError: If a format does not exist
+    """
+    names = settings.DEFAULT_OUTPUT_FORMATS if names is None else names
+    unknown = [name for name in names if name not in OUTPUT_FORMATS]
+    if unknown:
+        raise OutputFormatError(
+            f"Unknown output format '{unknown[0]}' (choose from {', '.join(OUTPUT_FORMATS)})"
+        )
+    return [{'name': name, **OUTPUT_FORMATS[name]} for name in dict.fromkeys(names)]
+
+
+def output_sinks(outputs: list[dict], video_path: str) -> dict[str, str]:
+    """Output field -> file path for each variant, next to the main video as video_<name>.mp4."""
+    return {
+        f"{output['name']}_video_base64": str(Path(video_path).with_name(f"video_{output['name']}.mp4"))
+        for output in outputs
+    }
+
+
+def encode_outputs(reel_job, video_path: str, outputs: list[dict]) -> dict[str, str]:
+    """
+    Encode the variants of a finished video locally, with the filter graph
+    runpod_handler uses: the video is decoded once and split into one
+    scale/crop (or pad) chain per output; the audio is copied. Files are
+    written as output_sinks names them; ffmpeg's output goes to the job log
+    and its usage to RenderMetric.
+    
+    Returns:
+        "<name>_video_path" -> encoded file path, as in a render result
+    
+    Raises:
+        OutputFormatError: If ffmpeg is missing or fails
+    """
+    graph = [f"[0:v]split={len(outputs)}" + ''.join(f'[s{i}]' for i in range(len(outputs)))]
+    encodes = []
+    paths = {}
+    for i, (output, path) in enumerate(zip(outputs, output_sinks(outputs, video_path).values())):
+        width, height = output['width'], output['height']
+        if output['fit'] == 'pad':
+            chain = (
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"
+            )
+        else:
+            chain = f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}"
+        graph.append(f"[s{i}]{chain},setsar=1[v{i}]")
+        
+        bitrate = output['video_bitrate']
+        paths[f"{output['name']}_video_path"] = path
+        encodes += [
+            '-map', f'[v{i}]', '-map', '0:a?',
+            '-c:v', 'libx264', '-preset', X264_PRESET, '-pix_fmt', 'yuv420p',
+            '-b:v', bitrate, '-maxrate', bitrate, '-bufsize', bitrate,
+            '-c:a', 'copy',
+            '-movflags', '+faststart',
+            path
+        ]
+    
+    cmd = [
+        settings.FFMPEG_BINARY, '-y', '-hide_banner', '-nostdin',
+        '-i', str(video_path),
+        '-filter_complex', ';'.join(graph),
+        *encodes
+    ]
+    job_log = open_job_log(reel_job.id)
+    try:
+        result = run_logged(cmd, 'encode_outputs', job_log, timeout=600)
+    except ProcessRunError as e:
+        raise OutputFormatError(str(e))
+    finally:
+        close_job_log(job_log)
+    record_metrics(reel_job, [result.metrics.as_dict()])
+    if result.timed_out:
+        raise OutputFormatError("Encoding outputs timed out")
+    if result.returncode != 0:
+        raise OutputFormatError(f"Encoding outputs failed: {result.output_tail}")
+    return paths
+
+
+def record_artifacts(reel_job, outputs: list[dict], output: dict) -> None:
+    """
+    Store the variants a finished render returned as ReelArtifacts.
+    Formats the worker did not return are skipped.
+    """
+    media_root = Path(settings.MEDIA_ROOT)
+    for spec in outputs:
+        path = output.get(f"{spec['name']}_video_path")
+        if not path or not Path(path).exists():
+            continue
+        ReelArtifact.objects.update_or_create(
+            reel_job=reel_job,
+            name=spec['name'],
+            defaults={
+                'file': Path(path).relative_to(media_root).as_posix(),
+                'width': spec['width'],
+                'height': spec['height'],
+                'video_bitrate': spec['video_bitrate'],
+                'size_bytes': Path(path).stat().st_size,
+            }
+        )
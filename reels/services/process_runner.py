@@ -0,0 +1,230 @@
+"""
+Subprocess execution with live logging and resource accounting.
+
+run_logged streams a process's combined stdout/stderr line by line into a
+rotating per-job log file (JOB_LOG_DIR/<job id>.log, JOB_LOG_MAX_BYTES with
+JOB_LOG_BACKUPS old files) while it runs, instead of buffering it in memory
+until exit. When the process ends its resource usage is read with wait4:
+wall time, user/system CPU time and peak RSS, which are stored per stage as
+RenderMetric rows (record_metrics) to size workers and spot regressions.
+
+runpod_handler reports the same figures for the stages it runs on the GPU
+worker ("metrics" in its output).
+"""
+import codecs
+import logging
+import logging.handlers
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable
+from django.conf import settings
+from ..models import RenderMetric
+
+logger = logging.getLogger(__name__)
+
+# Output lines kept for error messages
+TAIL_LINES = 20
+
+
+class ProcessRunError(Exception):
+    """Custom exception for subprocesses that could not be run."""
+    pass
+
+
+@dataclass
+class ProcessMetrics:
+    """Resource usage of one stage; CPU and RSS are None where wait4 is unavailable."""
+    stage: str
+    wall_seconds: float
+    user_cpu_seconds: float | None = None
+    system_cpu_seconds: float | None = None
+    max_rss_kb: int | None = None
+    exit_status: int | None = None
+    
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class ProcessResult:
+    returncode: int
+    timed_out: bool
+    metrics: ProcessMetrics
+    output_tail: str
+
+
+def job_log_path(job_id) -> Path:
+    return Path(settings.JOB_LOG_DIR) / f'{job_id}.log'
+
+
+def open_job_log(job_id) -> logging.Logger:
+    """
+    Logger writing to the rotating log file of a job. Not registered with
+    logging.getLogger, so it goes away with the job; close it with
+    close_job_log.
+    """
+    path = job_log_path(job_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=settings.JOB_LOG_MAX_BYTES,
+        backupCount=settings.JOB_LOG_BACKUPS,
+        encoding='utf-8'
+    )
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    job_log = logging.Logger(f'reels.job.{job_id}')
+    job_log.addHandler(handler)
+    job_log.propagate = False
+    return job_log
+
+
+def close_job_log(job_log: logging.Logger) -> None:
+    for handler in list(job_log.handlers):
+        job_log.removeHandler(handler)
+        handler.close()
+
+
+class LineSplitter:
+    """
+    Splits raw output into lines for the log. Progress bars redraw
+    themselves with carriage returns; only their last state before a
+    newline is kept.
+    """
+    
+    def __init__(self, on_line: Callable[[str], None]):
+        self.on_line = on_line
+        self._buffer = ''
+    
+    def feed(self, text: str) -> None:
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self._emit(line)
+    
+    def close(self) -> None:
+        if self._buffer:
+            self._emit(self._buffer)
+            self._buffer = ''
+    
+    def _emit(self, line: str) -> None:
+        line = line.rstrip('\r').rsplit('\r', 1)[-1].rstrip()
+        if line:
+            self.on_line(line)
+
+
+def wait_with_rusage(process: subprocess.Popen) -> tuple[int, dict]:
+    """
+    Reap a process with os.wait4 so its own resource usage is returned
+    along with its exit status (negative signal number if killed).
+    Falls back to Popen.wait without usage figures where wait4 is missing.
+    """
+    if not hasattr(os, 'wait4'):
+        return process.wait(), {}
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    max_rss_kb = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return process.returncode, {
+        'user_cpu_seconds': round(usage.ru_utime, 3),
+        'system_cpu_seconds': round(usage.ru_stime, 3),
+        'max_rss_kb': max_rss_kb,
+    }
+
+
+def run_logged(
+    cmd: list[str],
+    stage: str,
+    job_log: logging.Logger,
+    cwd: str | None = None,
+    timeout: float | None = None
+) -> ProcessResult:
+    """
+    Run a command, streaming its output to job_log as it is produced.
+    
+    Args:
+        cmd: Command and arguments
+        stage: Stage name for the log and the metrics
+        job_log: Logger from open_job_log
+        cwd: Working directory
+        timeout: Seconds before the process is killed
+    
+    Returns:
+        ProcessResult with the exit status, resource usage and last lines
+    
+    Raises:
+        ProcessRunError: If the command could not be started
+    """
+    tail = deque(maxlen=TAIL_LINES)
+    
+    def on_line(line: str) -> None:
+        tail.append(line)
+        job_log.info('[%s] %s', stage, line)
+    
+    job_log.info('[%s] $ %s', stage, ' '.join(cmd))
+    started = time.monotonic()
+    try:
+        process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except OSError as e:
+        raise ProcessRunError(f"Could not start {cmd[0]}: {str(e)}")
+    
+    timed_out = threading.Event()
+    
+    def kill():
+        timed_out.set()
+        process.kill()
+    
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer:
+        timer.start()
+    try:
+        lines = LineSplitter(on_line)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while chunk := os.read(process.stdout.fileno(), 65536):
+            lines.feed(decoder.decode(chunk))
+        lines.feed(decoder.decode(b'', final=True))
+        lines.close()
+        returncode, usage = wait_with_rusage(process)
+    finally:
+        if timer:
+            timer.cancel()
+        process.stdout.close()
+    
+    metrics = ProcessMetrics(
+        stage=stage,
+        wall_seconds=round(time.monotonic() - started, 3),
+        exit_status=returncode,
+        **usage
+    )
+    job_log.info(
+        '[%s] exit %s after %.1fs (cpu %ss user, %ss system, peak rss %s kB)',
+        stage, returncode, metrics.wall_seconds,
+        metrics.user_cpu_seconds, metrics.system_cpu_seconds, metrics.max_rss_kb
+    )
+    return ProcessResult(returncode, timed_out.is_set(), metrics, '\n'.join(tail))
+
+
+def record_metrics(reel_job, metrics: list[dict], prefix: str = '') -> None:
+    """
+    Store stage metrics (ProcessMetrics.as_dict() or the handler's "metrics"
+    output) as RenderMetric rows. Malformed entries are logged and skipped,
+    so accounting never fails a render.
+    """
+    for entry in metrics or []:
+        try:
+            RenderMetric.objects.create(
+                reel_job=reel_job,
+                stage=f"{prefix}{entry['stage']}"[:50],
+                wall_seconds=float(entry['wall_seconds']),
+                user_cpu_seconds=entry.get('user_cpu_seconds'),
+                system_cpu_seconds=entry.get('system_cpu_seconds'),
+                max_rss_kb=entry.get('max_rss_kb'),
+                exit_status=entry.get('exit_status')
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Skipping render metrics of reel %s: %s", reel_job.id, e)
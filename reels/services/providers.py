@@ -0,0 +1,110 @@
+"""
+Pluggable backends for script rewriting and text-to-speech.
+
+script_rewrite_service and openai_tts call whichever provider
+REWRITE_PROVIDER and TTS_PROVIDER name:
+
+- "openai": the OpenAI API (default)
+- "template" / "synthetic": deterministic offline stand-ins with injected
+  latency (see offline_providers), so the whole create -> approve -> video
+  flow can be load-tested without network or API spend (together with
+  runpod_emulator.py for the video step)
+
+A provider is created once per process and shared by all threads.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Iterable
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+REWRITE_PROVIDERS = {
+    'openai': 'reels.services.script_rewrite_service.OpenAIRewriter',
+    'template': 'reels.services.offline_providers.TemplateRewriter',
+}
+
+TTS_PROVIDERS = {
+    'openai': 'reels.services.openai_tts.OpenAITTS',
+    'synthetic': 'reels.services.offline_providers.SyntheticTTS',
+}
+
+
+class ProviderError(Exception):
+    """Raised for an unknown provider name."""
+    pass
+
+
+class RewriteProvider:
+    """Rewrites a script in a tone."""
+    name = ''
+    
+    def rewrite(self, original_script: str, tone: str, max_seconds: int | None) -> str:
+        raise NotImplementedError
+
+
+class TTSProvider:
+    """
+    Voices text into an audio file. model names the voice engine in the
+    TTS cache key, so audio of different providers is never mixed up.
+    """
+    name = ''
+    model = ''
+    
+    def synthesize(self, text: str, voice: str, response_format: str, audio_path: Path) -> None:
+        """
+        Write text spoken by voice to audio_path in response_format (an
+        OpenAI speech response format: mp3, opus, aac, flac, wav or pcm).
+        """
+        raise NotImplementedError
+
+
+def write_audio(audio_path: Path, blocks: Iterable[bytes]) -> None:
+    """
+    Write audio next to audio_path and move it into place: the old file may
+    be a hard link shared with the TTS cache and must not be truncated.
+    """
+    temp_path = audio_path.with_name(f'.{audio_path.name}.part')
+    try:
+        with open(temp_path, 'wb') as f:
+            for block in blocks:
+                f.write(block)
+        os.replace(temp_path, audio_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def _get_provider(kind: str, registry: dict, name: str):
+    provider = _providers.get((kind, name))
+    if provider is None:
+        if name not in registry:
+            raise ProviderError(f"Unknown {kind} provider '{name}' (choose from {', '.join(registry)})")
+        with _providers_lock:
+            provider = _providers.get((kind, name))
+            if provider is None:
+                provider = _providers[(kind, name)] = import_string(registry[name])()
+    return provider
+
+
+def get_rewrite_provider() -> RewriteProvider:
+    """
+    Return the process-wide REWRITE_PROVIDER.
+    
+    Raises:
+        ProviderError: If the provider does not exist
+    """
+    return _get_provider('rewrite', REWRITE_PROVIDERS, settings.REWRITE_PROVIDER)
+
+
+def get_tts_provider() -> TTSProvider:
+    """
+    Return the process-wide TTS_PROVIDER.
+    
+    Raises:
+        ProviderError: If the provider does not exist
+    """
+    return _get_provider('TTS', TTS_PROVIDERS, settings.TTS_PROVIDER)
@@ -0,0 +1,187 @@
+"""
+Token-bucket rate limiter shared by every process on the host.
+Bucket state lives in a small JSON file guarded by an exclusive file lock,
+so gunicorn workers and background threads draw from the same budget.
+
+Callers reserve capacity up front: the cost is debited immediately (the
+bucket may go negative) and the caller sleeps until its share is refilled.
+Each caller therefore takes the next free slot in arrival order, which
+queues bursts instead of letting them hit the provider and fail with 429.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the wait for capacity would exceed the allowed maximum."""
+    pass
+
+
+@dataclass
+class Bucket:
+    """Refills at rate units per second up to capacity."""
+    rate: float
+    capacity: float
+
+
+@contextmanager
+def _locked_file(path: Path):
+    """Open path for read/write under an exclusive cross-process lock."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield f
+        finally:
+            f.flush()  # Writes must land before the lock is released
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileRateLimiter:
+    """
+    A set of named token buckets persisted in one state file.
+    
+    Args:
+        path: State file shared by all processes using these buckets
+        buckets: Bucket name -> Bucket
+        max_wait: Longest a caller may be asked to wait, in seconds
+    """
+    
+    def __init__(self, path: Path, buckets: dict[str, Bucket], max_wait: float = 300.0):
+        self.path = Path(path)
+        self.buckets = buckets
+        self.max_wait = max_wait
+    
+    def _update(self, costs: dict[str, float], check_wait: bool) -> float:
+        with _locked_file(self.path) as f:
+            f.seek(0)
+            raw = f.read()
+            try:
+                state = json.loads(raw) if raw else {}
+            except ValueError:
+                state = {}  # Corrupt state only costs one burst
+            
+            now = time.time()
+            levels = {}
+            wait = 0.0
+            for name, cost in costs.items():
+                bucket = self.buckets.get(name)
+                if bucket is None or not cost:
+                    continue
+                level, updated = state.get(name, (bucket.capacity, now))
+                level = min(bucket.capacity, level + max(0.0, now - updated) * bucket.rate)
+                levels[name] = level - cost
+                if levels[name] < 0:
+                    wait = max(wait, -levels[name] / bucket.rate)
+            
+            if check_wait and wait > self.max_wait:
+                raise RateLimitExceeded(
+                    f"Rate limit queue is {wait:.0f}s long (max {self.max_wait:.0f}s)"
+                )
+            
+            for name, level in levels.items():
+                state[name] = (level, now)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state).encode('utf-8'))
+        return wait
+    
+    def acquire(self, costs: dict[str, float]) -> float:
+        """
+        Reserve capacity and block until it is available.
+        
+        Args:
+            costs: Bucket name -> units to take (unknown buckets are ignored)
+        
+        Returns:
+            Seconds spent waiting
+        
+        Raises:
+            RateLimitExceeded: If the wait would exceed max_wait (nothing is taken)
+        """
+        wait = self._update(costs, check_wait=True)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    def adjust(self, costs: dict[str, float]) -> None:
+        """
+        Correct an earlier reservation without waiting, e.g. once actual
+        token usage is known. Negative costs give capacity back.
+        """
+        self._update(costs, check_wait=False)
+
+
+def _model_buckets() -> dict[str, Bucket]:
+    """Request and token buckets per model from OPENAI_RATE_LIMITS (per minute)."""
+    burst = settings.RATE_LIMIT_BURST_SECONDS
+    buckets = {}
+    for model, limits in settings.OPENAI_RATE_LIMITS.items():
+        for kind in ('requests', 'tokens'):
+            per_minute = limits.get(kind)
+            if per_minute:
+                rate = per_minute / 60
+                buckets[f'{model}:{kind}'] = Bucket(rate=rate, capacity=max(1.0, rate * burst))
+    return buckets
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_openai_rate_limiter() -> FileRateLimiter:
+    """Return the process-wide limiter for OpenAI traffic."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = FileRateLimiter(
+                    Path(settings.RATE_LIMIT_DIR) / 'openai.json',
+                    _model_buckets(),
+                    max_wait=settings.RATE_LIMIT_MAX_WAIT,
+                )
+    return _limiter
+
+
+def acquire_openai_capacity(model: str, tokens: float = 0) -> float:
+    """
+    Wait for one request (and tokens, if the model has a token budget)
+    to fit the model's rate limits.
+    
+    Returns:
+        Seconds spent waiting
+    
+    Raises:
+        RateLimitExceeded: If the queue is longer than RATE_LIMIT_MAX_WAIT
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return 0.0
+    return get_openai_rate_limiter().acquire({f'{model}:requests': 1, f'{model}:tokens': tokens})
+
+
+def settle_openai_tokens(model: str, reserved: float, used: float) -> None:
+    """
+    Give back (or take more of) a token reservation once usage is known;
+    an attempt that failed settles to 0.
+    """
+    if settings.RATE_LIMIT_ENABLED and used is not None and used != reserved:
+        get_openai_rate_limiter().adjust({f'{model}:tokens': used - reserved})
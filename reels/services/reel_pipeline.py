@@ -3,7 +3,7 @@ Orchestration service for the full reel generation pipeline.
 """
 from typing import Literal
 from ..models import ReelJob
-from .openai_rewrite import rewrite_script, Tone
+from .script_rewrite_service import rewrite_script, Tone
 from .openai_tts import generate_tts_audio
 from .sadtalker_runner import run_sadtalker_for_reel
 
@@ -20,7 +20,7 @@ def process_reel_job(
     
     Args:
         reel_job: The ReelJob instance to process
-        use_rewrite: Whether to rewrite the script using OpenAI
+        use_rewrite: Whether to rewrite the script (REWRITE_PROVIDER)
         tone: The tone to use for rewriting (if use_rewrite is True)
         max_seconds: Optional target length in seconds for rewriting
     
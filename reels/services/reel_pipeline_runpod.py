@@ -3,7 +3,7 @@ Orchestration service using Runpod Serverless for video generation.
 Django handles API and database, Runpod handles GPU processing.
 """
 from ..models import ReelJob
-from .runpod_client import process_reel_with_runpod, save_base64_to_file, RunpodClientError
+from .runpod_client import process_reel_with_runpod, RunpodClientError
 from django.conf import settings
 from pathlib import Path
 
@@ -40,10 +40,15 @@ def process_reel_job_with_runpod(
         if not image_path.exists():
             raise Exception(f"Image file not found: {image_path}")
         
-        # Call Runpod Serverless
+        # Create job-specific directory
+        job_dir = settings.MEDIA_ROOT / 'reels' / str(reel_job.id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Call Runpod Serverless (audio and video are decoded into job_dir)
         result = process_reel_with_runpod(
             image_path=str(image_path),
             script=reel_job.original_script,
+            output_dir=str(job_dir),
             tone=tone,
             use_rewrite=use_rewrite,
             max_seconds=max_seconds
@@ -58,20 +63,12 @@ def process_reel_job_with_runpod(
         reel_job.tone = tone
         reel_job.save()
         
-        # Create job-specific directory
-        job_dir = settings.MEDIA_ROOT / 'reels' / str(reel_job.id)
-        job_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Save audio file
-        if result.get('audio_base64'):
-            audio_path = job_dir / 'audio.mp3'
-            save_base64_to_file(result['audio_base64'], str(audio_path))
+        # Record saved audio file
+        if result.get('audio_path'):
             reel_job.audio_file.name = f'reels/{reel_job.id}/audio.mp3'
         
-        # Save video file
-        if result.get('video_base64'):
-            video_path = job_dir / 'video.mp4'
-            save_base64_to_file(result['video_base64'], str(video_path))
+        # Record saved video file
+        if result.get('video_path'):
             reel_job.video_file.name = f'reels/{reel_job.id}/video.mp4'
         
         # Mark as done
@@ -0,0 +1,218 @@
+"""
+CPU-side preprocessing of render inputs.
+
+SadTalker spends the first part of every job on CPU work: decoding the TTS
+audio, resampling it to 16 kHz and computing its mel spectrogram, and
+decoding the (often full-resolution phone) source image. On Runpod that is
+billed at GPU rates. With RENDER_PREPROCESS enabled it is done here instead:
+
+- the audio is decoded and resampled with ffmpeg and its mel spectrogram is
+  computed with numpy, using SadTalker's audio settings (src/utils/audio.py),
+  and sent as a small features.npz ("features" handler input)
+- the image is EXIF-rotated, converted to RGB and scaled down to
+  RENDER_IMAGE_MAX_SIDE before it is sent
+
+The audio file is still sent: the worker muxes it into the final video.
+"""
+import logging
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from PIL import Image, ImageOps
+
+try:
+    import numpy as np
+except ImportError:  # Without numpy the worker computes the features itself
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the layout of features.npz changes (checked by the handler)
+FEATURES_VERSION = 1
+
+# SadTalker's audio settings (src/utils/hparams.py)
+SAMPLE_RATE = 16000
+VIDEO_FPS = 25
+N_FFT = 800
+HOP_SIZE = 200
+WIN_SIZE = 800
+NUM_MELS = 80
+FMIN = 55
+FMAX = 7600
+PREEMPHASIS = 0.97
+MIN_LEVEL_DB = -100
+REF_LEVEL_DB = 20
+MAX_ABS_VALUE = 4.0
+
+
+class RenderFeaturesError(Exception):
+    """Custom exception for render input preprocessing errors."""
+    pass
+
+
+def decode_audio(audio_path: str) -> 'np.ndarray':
+    """Decode audio to 16 kHz mono float32 samples with ffmpeg."""
+    cmd = [
+        settings.FFMPEG_BINARY, '-hide_banner', '-nostdin',
+        '-i', str(audio_path),
+        '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE),
+        '-'
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=120)
+    except FileNotFoundError:
+        raise RenderFeaturesError(f"ffmpeg not found: {settings.FFMPEG_BINARY}")
+    except subprocess.TimeoutExpired:
+        raise RenderFeaturesError("Decoding audio timed out")
+    if result.returncode != 0:
+        raise RenderFeaturesError(f"Failed to decode audio: {result.stderr.decode(errors='replace')[-1000:]}")
+    return np.frombuffer(result.stdout, dtype='<f4').astype(np.float32)
+
+
+def _hz_to_mel(hz):
+    """Slaney mel scale (librosa's default)."""
+    hz = np.asanyarray(hz, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    return np.where(
+        hz >= min_log_hz,
+        min_log_mel + np.log(np.maximum(hz, min_log_hz) / min_log_hz) / logstep,
+        hz / f_sp
+    )
+
+
+def _mel_to_hz(mels):
+    mels = np.asanyarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    return np.where(
+        mels >= min_log_mel,
+        min_log_hz * np.exp(logstep * (mels - min_log_mel)),
+        mels * f_sp
+    )
+
+
+@lru_cache(maxsize=1)
+def _mel_basis():
+    """Slaney-normalized mel filter bank, as librosa.filters.mel builds it."""
+    fft_freqs = np.fft.rfftfreq(N_FFT, 1.0 / SAMPLE_RATE)
+    mel_freqs = _mel_to_hz(np.linspace(_hz_to_mel(FMIN), _hz_to_mel(FMAX), NUM_MELS + 2))
+    widths = np.diff(mel_freqs)
+    ramps = np.subtract.outer(mel_freqs, fft_freqs)
+    lower = -ramps[:-2] / widths[:-1, None]
+    upper = ramps[2:] / widths[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_freqs[2:] - mel_freqs[:-2]))[:, None]
+    return weights.astype(np.float32)
+
+
+def melspectrogram(wav: 'np.ndarray') -> 'np.ndarray':
+    """
+    SadTalker's audio.melspectrogram (librosa 0.9 STFT with zero padding,
+    pre-emphasis, dB scaling and symmetric normalization) in plain numpy.
+    
+    Returns:
+        (80, frames) float32 array
+    """
+    emphasized = np.append(wav[0], wav[1:] - PREEMPHASIS * wav[:-1])
+    padded = np.pad(emphasized, N_FFT // 2)
+    window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(WIN_SIZE) / WIN_SIZE)  # Periodic Hann
+    frames = np.lib.stride_tricks.sliding_window_view(padded, N_FFT)[::HOP_SIZE]
+    spectrum = np.abs(np.fft.rfft(frames * window, axis=1)).T
+    
+    mel = _mel_basis() @ spectrum
+    min_level = np.exp(MIN_LEVEL_DB / 20 * np.log(10))
+    db = 20 * np.log10(np.maximum(min_level, mel)) - REF_LEVEL_DB
+    normalized = (2 * MAX_ABS_VALUE) * ((db - MIN_LEVEL_DB) / -MIN_LEVEL_DB) - MAX_ABS_VALUE
+    return np.clip(normalized, -MAX_ABS_VALUE, MAX_ABS_VALUE).astype(np.float32)
+
+
+def compute_audio_features(audio_path: str, output_path: str) -> str:
+    """
+    Write the audio features SadTalker's get_data would compute to an .npz.
+    
+    The audio is cut to a whole number of 25 fps video frames first, like
+    SadTalker's parse_audio_length / crop_pad_audio.
+    
+    Args:
+        audio_path: TTS audio
+        output_path: Where to write the features
+    
+    Returns:
+        output_path
+    
+    Raises:
+        RenderFeaturesError: If numpy is missing or the audio cannot be decoded
+    """
+    if np is None:
+        raise RenderFeaturesError("numpy is not installed")
+    wav = decode_audio(audio_path)
+    samples_per_frame = SAMPLE_RATE / VIDEO_FPS
+    samples = int(int(len(wav) / samples_per_frame) * samples_per_frame)
+    if samples == 0:
+        raise RenderFeaturesError("Audio is shorter than one video frame")
+    wav = wav[:samples]
+    
+    with open(output_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            version=np.int32(FEATURES_VERSION),
+            samples=np.int64(samples),
+            mel=melspectrogram(wav).astype(np.float16)
+        )
+    return output_path
+
+
+def prepare_source_image(image_path: str, output_path: str, max_side: int | None = None) -> str:
+    """
+    Decode the source image, apply its EXIF rotation and scale it so its
+    longest side is at most max_side (default RENDER_IMAGE_MAX_SIDE).
+    
+    Raises:
+        RenderFeaturesError: If the image cannot be read
+    """
+    max_side = max_side or settings.RENDER_IMAGE_MAX_SIDE
+    try:
+        with Image.open(image_path) as image:
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            image.save(output_path, 'JPEG', quality=95)
+    except OSError as e:
+        raise RenderFeaturesError(f"Failed to prepare image: {str(e)}")
+    return output_path
+
+
+def prepare_image_input(image_path: str, work_dir: Path) -> str:
+    """
+    Source image to send to the worker: downscaled into work_dir when
+    RENDER_PREPROCESS is enabled. Failures are logged and the original
+    image used, since the worker can always decode it itself.
+    """
+    if not settings.RENDER_PREPROCESS:
+        return image_path
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        return prepare_source_image(image_path, str(work_dir / 'source.jpg'))
+    except RenderFeaturesError as e:
+        logger.warning("Image preprocessing skipped: %s", e)
+        return image_path
+
+
+def prepare_audio_input(audio_path: str, work_dir: Path) -> str | None:
+    """
+    Features file to send along with the audio when RENDER_PREPROCESS is
+    enabled, None otherwise or if they could not be computed (logged).
+    """
+    if not settings.RENDER_PREPROCESS:
+        return None
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        return compute_audio_features(audio_path, str(work_dir / f'{Path(audio_path).stem}.features.npz'))
+    except RenderFeaturesError as e:
+        logger.warning("Audio preprocessing skipped: %s", e)
+        return None
@@ -0,0 +1,76 @@
+"""
+Named SadTalker render presets.
+
+A preset fixes the settings that decide GPU time and quality:
+- preprocess: "crop" renders only the cropped face; "full" pastes the
+  animated face back into the whole source image (slower)
+- size: face-render resolution, 256 or 512 (512 is roughly 3-4x the work)
+- enhancer: "gfpgan" restores every frame's face, usually the single most
+  expensive step; None skips it
+- still: keep the head pose still, which also lets "full" paste back cheaply
+
+Approximate GPU time relative to "standard" for the same audio:
+- draft: ~0.25x - cropped 256px face, no enhancement, still pose; for
+  internal review, not for publishing
+- standard: 1x - full image, 256px, GFPGAN (the original hard-coded flags)
+- high: ~3x - full image, 512px, GFPGAN
+"""
+from django.conf import settings
+
+
+class RenderPresetError(Exception):
+    """Raised for an unknown render preset."""
+    pass
+
+
+RENDER_PRESETS = {
+    'draft': {
+        'preprocess': 'crop',
+        'size': 256,
+        'enhancer': None,
+        'still': True,
+    },
+    'standard': {
+        'preprocess': 'full',
+        'size': 256,
+        'enhancer': 'gfpgan',
+        'still': False,
+    },
+    'high': {
+        'preprocess': 'full',
+        'size': 512,
+        'enhancer': 'gfpgan',
+        'still': False,
+    },
+}
+
+
+def render_options(preset: str | None = None) -> dict:
+    """
+    Resolve a preset name to the "render" payload sent to runpod_handler.
+    
+    Args:
+        preset: Preset name, None for DEFAULT_RENDER_PRESET
+    
+    Returns:
+        {"preset": name, "preprocess": ..., "size": ..., "enhancer": ..., "still": ...}
+    
+    Raises:
+        RenderPresetError: If the preset does not exist
+    """
+    preset = preset or settings.DEFAULT_RENDER_PRESET
+    if preset not in RENDER_PRESETS:
+        raise RenderPresetError(
+            f"Unknown render preset '{preset}' (choose from {', '.join(RENDER_PRESETS)})"
+        )
+    return {'preset': preset, **RENDER_PRESETS[preset]}
+
+
+def sadtalker_cli_args(options: dict) -> list[str]:
+    """SadTalker inference.py flags for resolved render options."""
+    args = ['--preprocess', options['preprocess'], '--size', str(options['size'])]
+    if options.get('enhancer'):
+        args += ['--enhancer', options['enhancer']]
+    if options.get('still'):
+        args.append('--still')
+    return args
@@ -0,0 +1,309 @@
+"""
+Retries and circuit breakers for external dependencies (Runpod, OpenAI).
+
+Every dependency gets its own Dependency guard with:
+- a retry policy: attempts with exponential backoff and full jitter, only for
+  errors its classifier marks as transient
+- a retry budget: retries may add at most RETRY_BUDGET_RATIO extra load on
+  top of first attempts (plus a small floor), so a brownout is not amplified
+- a circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive failures
+  calls fail fast with CircuitOpenError for CIRCUIT_RESET_TIMEOUT seconds,
+  then a single probe decides whether to close it again
+
+Whether to retry and whether the dependency failed are separate questions:
+a 500 after a job was accepted must not be retried, but it still counts
+towards opening the breaker (see is_dependency_failure).
+
+Callers catch CircuitOpenError to re-queue work instead of failing it.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+    
+    def __init__(self, dependency: str, retry_after: float):
+        self.dependency = dependency
+        self.retry_after = retry_after
+        super().__init__(f"{dependency} is unavailable (circuit open), retry in {retry_after:.0f}s")
+
+
+@dataclass
+class RetryPolicy:
+    """How often and how patiently to retry one call."""
+    max_attempts: int = 3
+    base_delay: float = 1.0  # Seconds before the first retry (before jitter)
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+    
+    def delay(self, retry_number: int) -> float:
+        """Full-jitter backoff for the nth retry (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (retry_number - 1))
+        return random.uniform(0, ceiling)
+
+
+class RetryBudget:
+    """
+    Caps retries at ratio * first attempts over a sliding window, plus
+    min_retries so a quiet dependency can still retry.
+    """
+    
+    def __init__(self, ratio: float = 0.2, min_retries: int = 5, window: float = 60.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+        self._lock = threading.Lock()
+    
+    def _trim(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+    
+    def record_request(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            self._requests.append(now)
+    
+    def try_spend(self) -> bool:
+        """Take one retry from the budget if any is left."""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+    
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        with self._lock:
+            if self.state == OPEN and self.retry_after() == 0:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == CLOSED
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+    
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this opened the circuit."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                opened = self.state != OPEN
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+                return opened
+            return False
+
+
+class Dependency:
+    """Retry policy, retry budget and circuit breaker for one dependency."""
+    
+    def __init__(
+        self,
+        name: str,
+        policy: RetryPolicy,
+        breaker: CircuitBreaker,
+        budget: RetryBudget,
+        is_transient: Callable[[Exception], bool],
+        is_failure: Callable[[Exception], bool]
+    ):
+        self.name = name
+        self.policy = policy
+        self.breaker = breaker
+        self.budget = budget
+        self.is_transient = is_transient
+        self.is_failure = is_failure
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.short_circuited = 0
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Call fn, retrying transient errors under the policy and budget.
+        Transient errors and other dependency failures count towards
+        opening the breaker.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open (fn is not called)
+            Exception: The last error from fn once retries are exhausted,
+                or at once if it is not transient
+        """
+        self._count('calls')
+        self.budget.record_request()
+        
+        attempt = 1
+        while True:
+            if not self.breaker.allow():
+                self._count('short_circuited')
+                raise CircuitOpenError(self.name, self.breaker.retry_after())
+            
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                transient = self.is_transient(e)
+                if not (transient or self.is_failure(e)):
+                    # The dependency answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                self._count('failures')
+                if self.breaker.record_failure():
+                    logger.warning(
+                        "%s circuit opened after %d consecutive failures",
+                        self.name, self.breaker.consecutive_failures
+                    )
+                if not transient or attempt >= self.policy.max_attempts:
+                    raise
+                if not self.budget.try_spend():
+                    self._count('budget_exhausted')
+                    raise
+                delay = self.policy.delay(attempt)
+                logger.warning(
+                    "%s call failed (attempt %d/%d), retrying in %.1fs: %s",
+                    self.name, attempt, self.policy.max_attempts, delay, e
+                )
+                self._count('retries')
+                time.sleep(delay)
+                attempt += 1
+                continue
+            
+            self.breaker.record_success()
+            return result
+    
+    def snapshot(self) -> dict:
+        return {
+            'state': self.breaker.state,
+            'retry_after': round(self.breaker.retry_after(), 1) if self.breaker.state == OPEN else 0,
+            'consecutive_failures': self.breaker.consecutive_failures,
+            'calls': self.calls,
+            'failures': self.failures,
+            'retries': self.retries,
+            'budget_exhausted': self.budget_exhausted,
+            'short_circuited': self.short_circuited,
+        }
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Default classifier: errors that flag themselves with a truthy
+    "transient" attribute, plus the OpenAI SDK's connection, timeout,
+    rate-limit and server errors.
+    """
+    if getattr(error, 'transient', False):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, (
+        openai.APIConnectionError,  # Includes APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
+    ))
+
+
+def is_dependency_failure(error: Exception) -> bool:
+    """
+    Default failure classifier: errors that say whether the dependency
+    failed with a "dependency_failed" attribute (e.g. a 500 that must not
+    be retried), otherwise the transient ones.
+    """
+    failed = getattr(error, 'dependency_failed', None)
+    if failed is not None:
+        return bool(failed)
+    return is_transient_error(error)
+
+
+_dependencies: dict[str, Dependency] = {}
+_dependencies_lock = threading.Lock()
+
+
+def get_dependency(
+    name: str,
+    is_transient: Callable[[Exception], bool] = is_transient_error,
+    is_failure: Callable[[Exception], bool] = is_dependency_failure
+) -> Dependency:
+    """
+    Return the process-wide guard for a dependency, created on first use.
+    Settings come from RESILIENCE_DEFAULTS overridden by RESILIENCE[name].
+    """
+    dependency = _dependencies.get(name)
+    if dependency is None:
+        with _dependencies_lock:
+            dependency = _dependencies.get(name)
+            if dependency is None:
+                config = {**settings.RESILIENCE_DEFAULTS, **settings.RESILIENCE.get(name, {})}
+                dependency = _dependencies[name] = Dependency(
+                    name=name,
+                    policy=RetryPolicy(
+                        max_attempts=config['max_attempts'],
+                        base_delay=config['base_delay'],
+                        max_delay=config['max_delay'],
+                    ),
+                    breaker=CircuitBreaker(
+                        failure_threshold=config['failure_threshold'],
+                        reset_timeout=config['reset_timeout'],
+                    ),
+                    budget=RetryBudget(ratio=config['budget_ratio']),
+                    is_transient=is_transient,
+                    is_failure=is_failure,
+                )
+    return dependency
+
+
+def dependency_snapshot() -> dict:
+    """Breaker state and retry counters of every dependency used so far."""
+    with _dependencies_lock:
+        dependencies = dict(_dependencies)
+    return {name: dependency.snapshot() for name, dependency in sorted(dependencies.items())}
@@ -1,22 +1,729 @@
 """
 Service to call Runpod Serverless API for video generation.
+Media is streamed: request bodies are encoded from disk chunk by chunk and
+base64 media in responses is decoded straight to disk.
+
+All calls go through one long-lived RunpodClient per endpoint so that the
+threads started by async_processor share a pool of keep-alive connections.
+With several endpoints (RUNPOD_ENDPOINTS) a RunpodRouter picks one per job
+from observed queue delay, error rate and in-flight count.
 """
+import logging
+import random
+import tempfile
+import threading
+import time
+from typing import Callable
 import requests
-import base64
-import os
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.request import ACCEPT_ENCODING
 from django.conf import settings
 from pathlib import Path
-import tempfile
+from .artifact_store import ArtifactStore, ArtifactStoreError, get_artifact_store
+from .output_formats import output_sinks
+from .resilience import get_dependency
+from .media_stream import (
+    Base64File,
+    Base64StreamDecoder,
+    JSONBodyStream,
+    MediaStreamError,
+    DECODE_CHUNK_SIZE,
+    available_encodings,
+    decompress_file,
+    iter_compressed,
+    iter_json_body,
+    json_body_length,
+    stream_base64_fields,
+)
+
+logger = logging.getLogger(__name__)
+
+# Media that is already compressed gains nothing from another codec
+INCOMPRESSIBLE_SUFFIXES = {
+    '.jpg', '.jpeg', '.png', '.webp', '.gif',
+    '.mp3', '.mp4', '.m4a', '.aac', '.opus', '.ogg', '.flac', '.webm',
+    '.npz',
+}
+
+# Job statuses that are not final yet
+PENDING_STATUSES = {'IN_QUEUE', 'IN_PROGRESS'}
+
+# Media fields a handler may return (dropped when they arrive on /stream)
+MEDIA_OUTPUT_FIELDS = ('video_base64', 'audio_base64')
 
 
 class RunpodClientError(Exception):
-    """Exception for Runpod client errors."""
-    pass
+    """
+    Exception for Runpod client errors.
+    transient is True when the request was not accepted (no connection, 429,
+    502, 503) and can safely be retried without running the job twice.
+    dependency_failed is True when Runpod itself failed (5xx, timeouts,
+    connection errors, garbled responses), retried or not, so the circuit
+    breaker counts it; it defaults to transient.
+    """
+    
+    def __init__(self, message: str, transient: bool = False, dependency_failed: bool | None = None):
+        super().__init__(message)
+        self.transient = transient
+        self.dependency_failed = transient if dependency_failed is None else dependency_failed
+
+
+# HTTP statuses worth retrying: throttled, or the gateway could not hand the
+# request on. A 500 or 504 may come after the job ran, so those are final
+TRANSIENT_HTTP_STATUSES = {429, 502, 503}
+
+
+def _not_connected(error: requests.exceptions.RequestException) -> bool:
+    """Whether a request failed before a connection was made (refused, DNS, connect timeout)."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, ConnectTimeoutError)
+
+
+def endpoint_base_url(endpoint_url: str) -> str:
+    """Strip a trailing /runsync or /run from an endpoint URL."""
+    url = endpoint_url.rstrip('/')
+    for suffix in ('/runsync', '/run'):
+        if url.endswith(suffix):
+            return url[:-len(suffix)]
+    return url
+
+
+def parse_endpoints(spec: str) -> list[tuple[str, float]]:
+    """
+    Parse RUNPOD_ENDPOINTS: comma-separated endpoint URLs, each optionally
+    followed by |weight (default 1), e.g. "https://a/runsync|3,https://b/runsync".
+    """
+    endpoints = []
+    for entry in spec.split(','):
+        url, _, weight = entry.strip().partition('|')
+        if not url:
+            continue
+        try:
+            endpoints.append((url, float(weight) if weight else 1.0))
+        except ValueError:
+            raise RunpodClientError(f"Invalid weight in RUNPOD_ENDPOINTS entry: {entry.strip()}")
+    return endpoints
+
+
+class EndpointHealth:
+    """
+    Load and health signals for one endpoint, as seen from this process.
+    
+    - delay: EWMA of Runpod's reported delayTime (queue wait + cold start)
+    - error_rate: EWMA of failed requests and FAILED jobs
+    - in_flight: /runsync calls in progress plus submitted, unfinished jobs
+    - Consecutive transport failures eject the endpoint for a cooling period
+    """
+    
+    ALPHA = 0.3
+    
+    def __init__(self, eject_after: int = 3, eject_seconds: float = 30.0, pending_ttl: float = 600.0):
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.pending_ttl = pending_ttl
+        self.delay = 0.0
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self._active = 0
+        self._pending: dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def in_flight(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            for job_id, started in list(self._pending.items()):
+                if now - started > self.pending_ttl:
+                    del self._pending[job_id]
+            return self._active + len(self._pending)
+    
+    def is_ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+    
+    def begin(self) -> None:
+        with self._lock:
+            self._active += 1
+    
+    def end(self) -> None:
+        with self._lock:
+            self._active -= 1
+    
+    def job_submitted(self, job_id: str) -> None:
+        with self._lock:
+            self._pending[job_id] = time.monotonic()
+    
+    def record_status(self, document: dict) -> None:
+        """Learn from a status document (response, poll or webhook)."""
+        status = document.get('status')
+        with self._lock:
+            self.consecutive_failures = 0
+            if status in PENDING_STATUSES or not document.get('id'):
+                return  # Not final, or not about one job (e.g. /stream)
+            self._pending.pop(document.get('id'), None)
+            failed = 1.0 if status == 'FAILED' else 0.0
+            self.error_rate += self.ALPHA * (failed - self.error_rate)
+            if isinstance(document.get('delayTime'), (int, float)):
+                self.delay += self.ALPHA * (document['delayTime'] / 1000 - self.delay)
+    
+    def record_failure(self) -> None:
+        """A request to the endpoint failed (unreachable, timeout, HTTP error)."""
+        with self._lock:
+            self.error_rate += self.ALPHA * (1.0 - self.error_rate)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.eject_after:
+                # Stays at the threshold, so one failed probe after the
+                # cooling period ejects the endpoint again
+                self.ejected_until = time.monotonic() + self.eject_seconds
+
+
+def _parse_codings(header: str | None) -> set[str]:
+    """Parse an Accept-Encoding style header into a set of coding names."""
+    codings = set()
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if name and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            codings.add(name.lower())
+    return codings
+
+
+def audio_format(audio_path: str) -> str:
+    """The handler's "audio_format" input for an audio file: its extension."""
+    return Path(audio_path).suffix.lstrip('.').lower() or 'mp3'
+
+
+def final_output(items: list) -> dict:
+    """
+    The result in the aggregated output of a generator handler: the last
+    yielded item that is not a progress event.
+    """
+    for item in reversed(items):
+        if isinstance(item, dict) and 'progress' not in item:
+            return item
+    return {}
+
+
+class RunpodClient:
+    """
+    Thread-safe client for a Runpod Serverless endpoint.
+    
+    Connections are kept alive in a bounded pool shared by all threads.
+    Compression is negotiated rather than assumed:
+    - Request bodies are compressed only once the endpoint has advertised the
+      coding in an Accept-Encoding response header (RFC 7694).
+    - Responses are requested with Accept-Encoding and decoded transparently.
+    - Media fields inside the payload are compressed with a codec that
+      runpod_handler advertised in its last output ("accept_encoding"), and
+      the handler may compress its returned media with a codec we offered.
+    
+    With an artifact store, media travels as SHA-256 references instead of
+    inline base64: inputs are uploaded once (skipped if already stored) and
+    returned "<name>_ref" outputs are downloaded into the requested sinks.
+    """
+    
+    def __init__(
+        self,
+        endpoint_url: str,
+        api_key: str = '',
+        pool_size: int = 10,
+        compression: str = 'gzip',
+        timeout: int = 600,
+        artifact_store: ArtifactStore | None = None,
+        artifact_store_worker_url: str = '',
+        weight: float = 1.0,
+        health: EndpointHealth | None = None
+    ):
+        if not endpoint_url:
+            raise RunpodClientError("RUNPOD_ENDPOINT_URL not configured in settings")
+        
+        self.endpoint_url = endpoint_url
+        self.base_url = endpoint_base_url(endpoint_url)
+        self.timeout = timeout
+        self.weight = weight
+        self.health = health or EndpointHealth(pending_ttl=timeout)
+        self.compression = compression if compression in available_encodings() else None
+        self.artifact_store = artifact_store
+        # The store as the worker reaches it (may differ from our own URL)
+        self.artifact_store_worker_url = artifact_store_worker_url or (artifact_store.url if artifact_store else '')
+        
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._session.headers.update({
+            "Content-Type": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
+        })
+        if api_key:
+            self._session.headers["Authorization"] = f"Bearer {api_key}"
+        
+        self._lock = threading.Lock()
+        self._request_codings: set[str] = set()
+        self._payload_codings: set[str] = set()
+    
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
+    
+    def run_sync(
+        self,
+        input_data: dict,
+        sinks: dict[str, str],
+        on_progress: Callable[[dict], None] | None = None
+    ) -> dict:
+        """
+        Run a job synchronously and stream the response.
+        If the job outlives Runpod's sync window it is polled to completion.
+        
+        Args:
+            input_data: Job input; Base64File values are streamed from disk
+            sinks: Mapping of output field name -> file path to decode it into
+            on_progress: Called with the handler's progress events while the
+                job is polled after the sync window
+        
+        Returns:
+            The "output" dictionary of the Runpod response. Streamed fields are
+            replaced by "<field>_path" keys holding the written file path.
+        """
+        self.health.begin()
+        try:
+            result = self._request('POST', f'{self.base_url}/runsync', self._payload(input_data), sinks)
+            
+            if result.get('status') in PENDING_STATUSES and result.get('id'):
+                try:
+                    result = self.wait(result['id'], sinks, on_progress)
+                except RunpodClientError as e:
+                    e.transient = False  # The job is accepted: a retry would render it again
+                    raise
+        finally:
+            self.health.end()
+        
+        # Check for errors in response
+        if result.get('error'):
+            raise RunpodClientError(result['error'])
+        
+        return result.get('output') or {}
+    
+    def submit(self, input_data: dict, webhook: str | None = None) -> str:
+        """
+        Queue a job on the /run endpoint without waiting for it.
+        
+        Args:
+            input_data: Job input; Base64File values are streamed from disk
+            webhook: Optional URL Runpod POSTs the final status document to
+        
+        Returns:
+            The remote Runpod job id
+        """
+        payload = self._payload(input_data)
+        if webhook:
+            payload["webhook"] = webhook
+        result = self._request('POST', f'{self.base_url}/run', payload, {})
+        
+        if result.get('error'):
+            raise RunpodClientError(result['error'])
+        if not result.get('id'):
+            raise RunpodClientError("Runpod did not return a job id")
+        
+        self.health.job_submitted(result['id'])
+        return result['id']
+    
+    def warmup(self, ttl: float | None = None) -> str:
+        """
+        Queue a no-op warm-up job so a worker starts (or stays) warm with its
+        models loaded ahead of real jobs. Not counted as in flight.
+        
+        Args:
+            ttl: Seconds after which Runpod drops the ping if still queued
+        
+        Returns:
+            The remote Runpod job id
+        """
+        payload = {"input": {"warmup": True}}
+        if ttl:
+            payload["policy"] = {"ttl": int(max(ttl, 10) * 1000)}  # Runpod minimum is 10s
+        result = self._request('POST', f'{self.base_url}/run', payload, {})
+        
+        if result.get('error'):
+            raise RunpodClientError(result['error'])
+        return result.get('id', '')
+    
+    def status(self, job_id: str, sinks: dict[str, str]) -> dict:
+        """
+        Fetch the status of a queued job.
+        Output of a completed job is processed like run_sync; failed jobs are
+        returned as-is (with "status" and "error") rather than raised.
+        
+        Args:
+            job_id: Remote Runpod job id
+            sinks: Mapping of output field name -> file path to decode it into
+        
+        Returns:
+            The full status document ("id", "status", "output", "delayTime", ...)
+        """
+        return self._request('GET', f'{self.base_url}/status/{job_id}', None, sinks)
+    
+    def stream(self, job_id: str) -> dict:
+        """
+        Fetch the items a generator handler yielded since the last call.
+        Only progress is kept: a result that arrives here is dropped and
+        read again from /status.
+        
+        Returns:
+            {"status": job status, "progress": latest progress event or None}
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sinks = {field: str(Path(temp_dir) / field) for field in MEDIA_OUTPUT_FIELDS}
+            result = self._request('GET', f'{self.base_url}/stream/{job_id}', None, sinks)
+        
+        progress = None
+        for item in result.get('stream') or []:
+            output = item.get('output') if isinstance(item, dict) else None
+            if isinstance(output, dict) and isinstance(output.get('progress'), dict):
+                progress = output['progress']
+        return {"status": result.get('status'), "progress": progress}
+    
+    def wait(
+        self,
+        job_id: str,
+        sinks: dict[str, str],
+        on_progress: Callable[[dict], None] | None = None
+    ) -> dict:
+        """
+        Poll a job with exponential backoff until it reaches a final status.
+        With on_progress, the cheap /stream endpoint is polled while the job
+        is pending and /status only once it has finished. Transient poll
+        failures are retried at the next interval.
+        """
+        interval = settings.RUNPOD_POLL_INITIAL_INTERVAL
+        deadline = time.monotonic() + self.timeout
+        
+        while True:
+            try:
+                pending = False
+                if on_progress:
+                    streamed = self.stream(job_id)
+                    if streamed['progress']:
+                        on_progress(streamed['progress'])
+                    pending = streamed['status'] in PENDING_STATUSES
+                if not pending:
+                    result = self.status(job_id, sinks)
+                    pending = result.get('status') in PENDING_STATUSES
+                    if not pending:
+                        return result
+            except RunpodClientError as e:
+                if not e.transient:
+                    raise
+                logger.warning("Polling Runpod job %s failed, retrying: %s", job_id, e)
+            if time.monotonic() + interval > deadline:
+                raise RunpodClientError(
+                    f"Runpod job {job_id} did not finish within {self.timeout}s",
+                    dependency_failed=True
+                )
+            time.sleep(interval)
+            interval = min(interval * settings.RUNPOD_POLL_BACKOFF, settings.RUNPOD_POLL_MAX_INTERVAL)
+    
+    def cancel(self, job_id: str) -> dict:
+        """Cancel a queued or running job."""
+        return self._request('POST', f'{self.base_url}/cancel/{job_id}', None, {})
+    
+    def _payload(self, input_data: dict) -> dict:
+        input_data = dict(input_data)
+        for key, value in list(input_data.items()):
+            if isinstance(value, Base64File) and value.encoding:
+                input_data[f'{key}_encoding'] = value.encoding
+        if self.compression:
+            input_data["accept_encoding"] = [self.compression]
+        if self.artifact_store_worker_url:
+            input_data["artifact_store"] = self.artifact_store_worker_url
+        return {"input": input_data}
+    
+    def _request(self, method: str, url: str, payload: dict | None, sinks: dict[str, str]) -> dict:
+        """
+        Send one request and stream-parse its JSON response.
+        
+        Returns:
+            The parsed response document with any "output" media written to
+            disk and replaced by "<field>_path" keys.
+        """
+        try:
+            body_coding = self.compression if self.compression in self._request_codings else None
+            response = self._send(method, url, payload, body_coding)
+            if response.status_code == 415 and body_coding:
+                # Endpoint stopped accepting the coding; fall back to identity
+                response.close()
+                with self._lock:
+                    self._request_codings.discard(body_coding)
+                response = self._send(method, url, payload, None)
+            
+            with response:
+                response.raise_for_status()
+                self._learn_request_codings(response.headers.get('Accept-Encoding'))
+                return self.ingest(response.iter_content(chunk_size=DECODE_CHUNK_SIZE), sinks)
+        
+        except RunpodClientError:
+            raise
+        except requests.exceptions.RequestException as e:
+            self.health.record_failure()
+            # Only failures before the request was sent are transient: after
+            # a read timeout or a dropped response the job may be running
+            transient = _not_connected(e) or (
+                isinstance(e, requests.exceptions.HTTPError)
+                and e.response is not None
+                and e.response.status_code in TRANSIENT_HTTP_STATUSES
+            )
+            # Only a 4xx means Runpod answered and rejected the request
+            answered = (
+                isinstance(e, requests.exceptions.HTTPError)
+                and e.response is not None
+                and e.response.status_code < 500
+                and e.response.status_code != 429
+            )
+            raise RunpodClientError(
+                f"Runpod API call failed: {str(e)}",
+                transient=transient,
+                dependency_failed=not answered
+            )
+        except Exception as e:
+            raise RunpodClientError(f"Unexpected error: {str(e)}")
+    
+    def ingest(self, chunks, sinks: dict[str, str]) -> dict:
+        """
+        Stream-parse a Runpod status document, from an API response or a
+        webhook delivery.
+        
+        Args:
+            chunks: Iterable of raw JSON body chunks
+            sinks: Mapping of output field name -> file path to decode it into
+        
+        Returns:
+            The parsed document with any "output" media written to disk and
+            replaced by "<field>_path" keys.
+        """
+        try:
+            result, written = stream_base64_fields(chunks, sinks)
+            self.health.record_status(result)
+            
+            output = result.get('output')
+            if isinstance(output, list):
+                # Generator handler: progress events, then the result
+                result['output'] = output = final_output(output)
+            if isinstance(output, dict):
+                self._learn_payload_codings(output.get('accept_encoding'))
+                for field, path in written.items():
+                    name = field.removesuffix('_base64')
+                    encoding = output.pop(f'{name}_encoding', None)
+                    if encoding:
+                        decompress_file(path, encoding)
+                    output.pop(field, None)
+                    output[f'{name}_path'] = path
+                self._fetch_refs(output, sinks)
+            
+            return result
+        
+        except RunpodClientError:
+            raise
+        except ArtifactStoreError as e:
+            raise RunpodClientError(f"Failed to fetch Runpod output: {str(e)}")
+        except MediaStreamError as e:
+            raise RunpodClientError(f"Invalid Runpod response: {str(e)}", dependency_failed=True)
+    
+    def media_field(self, name: str, path: str) -> dict:
+        """
+        Input entries for one media file: a store reference when an artifact
+        store is configured, otherwise the file itself (inline base64).
+        """
+        if self.artifact_store:
+            try:
+                return {f'{name}_ref': self.artifact_store.upload(path)}
+            except ArtifactStoreError as e:
+                raise RunpodClientError(f"Failed to upload {name}: {str(e)}")
+        return {name: self.media(path)}
+    
+    def media(self, path: str) -> Base64File:
+        """Wrap a media file for the payload, compressing it when worthwhile."""
+        if (
+            self.compression in self._payload_codings
+            and Path(path).suffix.lower() not in INCOMPRESSIBLE_SUFFIXES
+        ):
+            return Base64File(path, encoding=self.compression)
+        return Base64File(path)
+    
+    def _fetch_refs(self, output: dict, sinks: dict[str, str]) -> None:
+        """Download "<name>_ref" outputs from the artifact store into sinks."""
+        for field, path in sinks.items():
+            name = field.removesuffix('_base64')
+            ref = output.pop(f'{name}_ref', None)
+            if not isinstance(ref, dict):
+                continue
+            if self.artifact_store is None:
+                raise RunpodClientError(f"Runpod returned {name}_ref but no artifact store is configured")
+            self.artifact_store.get_to_file(ref.get('sha256'), path)
+            output[f'{name}_path'] = path
+    
+    def _send(self, method: str, url: str, payload: dict | None, body_coding: str | None) -> requests.Response:
+        headers = {}
+        if payload is None:
+            body = None
+        elif body_coding:
+            headers["Content-Encoding"] = body_coding
+            body = iter_compressed(iter_json_body(payload), body_coding)
+        elif json_body_length(payload) is not None:
+            body = JSONBodyStream(payload)
+        else:
+            # Compressed media fields: length unknown, send chunked
+            body = iter_json_body(payload)
+        return self._session.request(
+            method,
+            url,
+            data=body,
+            headers=headers,
+            timeout=self.timeout,
+            stream=True
+        )
+    
+    def _learn_request_codings(self, header: str | None) -> None:
+        if header is None:
+            return
+        with self._lock:
+            self._request_codings = _parse_codings(header) & set(available_encodings())
+    
+    def _learn_payload_codings(self, codings) -> None:
+        if not isinstance(codings, list):
+            return
+        with self._lock:
+            self._payload_codings = {str(c) for c in codings} & set(available_encodings())
+
+
+class RunpodRouter:
+    """
+    Spreads jobs over several weighted endpoints.
+    
+    Each job goes to the endpoint with the lowest expected wait,
+    (1 + in_flight) * (delay + DELAY_FLOOR) * (1 + ERROR_PENALTY * error_rate) / weight,
+    skipping endpoints ejected after repeated failures. If every endpoint
+    is ejected the one that comes back first is used.
+    """
+    
+    # Seconds added to the observed delay so idle endpoints split by weight
+    DELAY_FLOOR = 1.0
+    ERROR_PENALTY = 4.0
+    
+    def __init__(self, clients: list[RunpodClient], client_factory=None):
+        if not clients:
+            raise RunpodClientError("No Runpod endpoints configured")
+        self.clients = clients
+        self._by_base_url = {client.base_url: client for client in clients}
+        self._client_factory = client_factory
+        self._lock = threading.Lock()
+    
+    def cost(self, client: RunpodClient) -> float:
+        health = client.health
+        return (
+            (1 + health.in_flight())
+            * (health.delay + self.DELAY_FLOOR)
+            * (1 + self.ERROR_PENALTY * health.error_rate)
+            / max(client.weight, 1e-6)
+        )
+    
+    def choose(self) -> RunpodClient:
+        """Pick the endpoint for a new job."""
+        available = [client for client in self.clients if not client.health.is_ejected()]
+        if not available:
+            return min(self.clients, key=lambda client: client.health.ejected_until)
+        random.shuffle(available)  # Break ties between equally loaded endpoints
+        return min(available, key=self.cost)
+    
+    def client_for(self, base_url: str | None) -> RunpodClient:
+        """
+        The client of a specific endpoint, e.g. to poll a job submitted there.
+        Endpoints no longer in the configuration get a client on demand so
+        their in-flight jobs can still be finished.
+        """
+        if not base_url:
+            return self.choose()
+        base_url = endpoint_base_url(base_url)
+        with self._lock:
+            client = self._by_base_url.get(base_url)
+            if client is None:
+                if self._client_factory is None:
+                    raise RunpodClientError(f"Unknown Runpod endpoint: {base_url}")
+                client = self._by_base_url[base_url] = self._client_factory(base_url, 1.0)
+            return client
+    
+    def snapshot(self) -> list[dict]:
+        """Current routing state of every endpoint (for logs and health checks)."""
+        return [
+            {
+                'endpoint': client.base_url,
+                'weight': client.weight,
+                'delay': round(client.health.delay, 3),
+                'error_rate': round(client.health.error_rate, 3),
+                'in_flight': client.health.in_flight(),
+                'ejected': client.health.is_ejected(),
+            }
+            for client in self.clients
+        ]
+
+
+def _build_client(endpoint_url: str, weight: float) -> RunpodClient:
+    return RunpodClient(
+        endpoint_url=endpoint_url,
+        api_key=settings.RUNPOD_API_KEY,
+        pool_size=settings.RUNPOD_POOL_SIZE,
+        compression=settings.RUNPOD_COMPRESSION,
+        timeout=settings.RUNPOD_TIMEOUT,
+        artifact_store=get_artifact_store(),
+        artifact_store_worker_url=settings.ARTIFACT_STORE_WORKER_URL,
+        weight=weight,
+        health=EndpointHealth(
+            eject_after=settings.RUNPOD_EJECT_AFTER_FAILURES,
+            eject_seconds=settings.RUNPOD_EJECT_SECONDS,
+            pending_ttl=settings.RUNPOD_TIMEOUT,
+        ),
+    )
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_runpod_router() -> RunpodRouter:
+    """
+    Return the process-wide RunpodRouter, creating it on first use from
+    RUNPOD_ENDPOINTS (or the single RUNPOD_ENDPOINT_URL).
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                endpoints = parse_endpoints(settings.RUNPOD_ENDPOINTS)
+                if not endpoints:
+                    endpoints = [(settings.RUNPOD_ENDPOINT_URL, 1.0)]
+                _router = RunpodRouter(
+                    [_build_client(url, weight) for url, weight in endpoints],
+                    client_factory=_build_client
+                )
+    return _router
+
+
+def get_runpod_client(endpoint: str | None = None) -> RunpodClient:
+    """
+    Return the client for an endpoint.
+    
+    Args:
+        endpoint: Base URL a job was submitted to (ReelJob.runpod_endpoint);
+            None picks the best endpoint for a new job
+    """
+    return get_runpod_router().client_for(endpoint)
 
 
 def process_reel_with_runpod(
     image_path: str,
     script: str,
+    output_dir: str,
     tone: str = "neutral",
     use_rewrite: bool = True,
     max_seconds: int = None
@@ -27,6 +734,7 @@ def process_reel_with_runpod(
     Args:
         image_path: Path to the image file
         script: Script text
+        output_dir: Directory to write the returned audio.mp3 and video.mp4 into
         tone: Tone for rewriting
         use_rewrite: Whether to rewrite script
         max_seconds: Optional max seconds
@@ -34,66 +742,45 @@ def process_reel_with_runpod(
     Returns:
         Dictionary with:
         - final_script: Rewritten script
-        - audio_base64: Base64 encoded audio
-        - video_base64: Base64 encoded video
+        - audio_path: Path of the saved audio file (if returned)
+        - video_path: Path of the saved video file (if returned)
         - error: Error message if any
-    """
-    runpod_endpoint = settings.RUNPOD_ENDPOINT_URL
-    runpod_api_key = settings.RUNPOD_API_KEY
     
-    if not runpod_endpoint:
-        raise RunpodClientError("RUNPOD_ENDPOINT_URL not configured in settings")
-    
-    # Read and encode image
-    with open(image_path, 'rb') as f:
-        image_base64 = base64.b64encode(f.read()).decode('utf-8')
-    
-    # Prepare payload
-    payload = {
-        "input": {
-            "image": image_base64,
+    Raises:
+        RunpodClientError: If the job failed (transient errors are retried)
+        CircuitOpenError: If Runpod has been failing and calls are paused
+    """
+    def attempt():
+        client = get_runpod_client()
+        
+        # Prepare payload (image is streamed from disk or sent as a store reference)
+        input_data = {
+            **client.media_field("image", image_path),
             "script": script,
             "tone": tone,
             "use_rewrite": use_rewrite,
             "max_seconds": max_seconds
         }
-    }
-    
-    # Headers
-    headers = {
-        "Content-Type": "application/json"
-    }
-    
-    if runpod_api_key:
-        headers["Authorization"] = f"Bearer {runpod_api_key}"
-    
-    try:
-        # Call Runpod Serverless
-        response = requests.post(
-            runpod_endpoint,
-            json=payload,
-            headers=headers,
-            timeout=600  # 10 minutes timeout
-        )
-        
-        response.raise_for_status()
-        result = response.json()
         
-        # Check for errors in response
-        if result.get('error'):
-            raise RunpodClientError(result['error'])
+        sinks = {
+            "audio_base64": str(Path(output_dir) / 'audio.mp3'),
+            "video_base64": str(Path(output_dir) / 'video.mp4'),
+        }
         
-        return result.get('output', {})
+        return client.run_sync(input_data, sinks)
     
-    except requests.exceptions.RequestException as e:
-        raise RunpodClientError(f"Runpod API call failed: {str(e)}")
-    except Exception as e:
-        raise RunpodClientError(f"Unexpected error: {str(e)}")
+    # Retries go through the router again, so they can land on another endpoint
+    return get_dependency('runpod').call(attempt)
 
 
 def generate_video_with_runpod(
     image_path: str,
-    audio_path: str
+    audio_path: str,
+    video_output_path: str,
+    render: dict | None = None,
+    on_progress: Callable[[dict], None] | None = None,
+    features_path: str | None = None,
+    outputs: list[dict] | None = None
 ) -> dict:
     """
     Call Runpod Serverless to generate video ONLY.
@@ -106,74 +793,100 @@ def generate_video_with_runpod(
     Args:
         image_path: Path to the image file
         audio_path: Path to the audio file (already generated in Django)
+        video_output_path: Where to write the returned video
+        render: Resolved render preset (see render_presets.render_options);
+            None leaves the worker's defaults
+        on_progress: Called with the handler's progress events while the
+            job is polled after Runpod's sync window
+        features_path: Precomputed audio features (see render_features),
+            so the worker skips decoding and analysing the audio
+        outputs: Extra formats to encode (see output_formats.resolve_outputs),
+            saved next to video_output_path as video_<name>.mp4
     
     Returns:
         Dictionary with:
-        - video_base64: Base64 encoded video
+        - video_path: Path of the saved video file (if returned)
+        - <name>_video_path: Path of each saved output format
         - error: Error message if any
-    """
-    runpod_endpoint = settings.RUNPOD_ENDPOINT_URL
-    runpod_api_key = settings.RUNPOD_API_KEY
     
-    if not runpod_endpoint:
-        raise RunpodClientError("RUNPOD_ENDPOINT_URL not configured in settings")
-    
-    # Read and encode image
-    with open(image_path, 'rb') as f:
-        image_base64 = base64.b64encode(f.read()).decode('utf-8')
-    
-    # Read and encode audio
-    with open(audio_path, 'rb') as f:
-        audio_base64 = base64.b64encode(f.read()).decode('utf-8')
-    
-    # Prepare payload (only video generation - SadTalker needs image + audio)
-    payload = {
-        "input": {
-            "image": image_base64,
-            "audio": audio_base64  # Audio already generated in Django
+    Raises:
+        RunpodClientError: If the job failed (transient errors are retried)
+        CircuitOpenError: If Runpod has been failing and calls are paused
+    """
+    def attempt():
+        client = get_runpod_client()
+        
+        # Prepare payload (only video generation - SadTalker needs image + audio)
+        # Both files are base64-encoded from disk while the body is being sent,
+        # or uploaded to the artifact store once and referenced by hash
+        input_data = {
+            **client.media_field("image", image_path),
+            **client.media_field("audio", audio_path),  # Audio already generated in Django
+            "audio_format": audio_format(audio_path)
         }
-    }
+        if features_path:
+            input_data.update(client.media_field("features", features_path))
+        if render:
+            input_data["render"] = render
+        if outputs:
+            input_data["outputs"] = outputs
+        
+        sinks = {"video_base64": video_output_path, **output_sinks(outputs or [], video_output_path)}
+        return client.run_sync(input_data, sinks, on_progress)
     
-    # Headers
-    headers = {
-        "Content-Type": "application/json"
-    }
+    return get_dependency('runpod').call(attempt)
+
+
+def submit_video_with_runpod(
+    image_path: str,
+    audio_path: str,
+    webhook: str | None = None,
+    render: dict | None = None,
+    features_path: str | None = None,
+    outputs: list[dict] | None = None
+) -> tuple[str, str]:
+    """
+    Queue a video-only job on Runpod without waiting for it.
+    Same inputs as generate_video_with_runpod; poll the returned id with
+    RunpodClient.status() (see runpod_poller) or pass a webhook URL to be
+    notified instead (see runpod_webhook).
     
-    if runpod_api_key:
-        headers["Authorization"] = f"Bearer {runpod_api_key}"
+    Returns:
+        (remote Runpod job id, base URL of the endpoint it was queued on)
     
-    try:
-        # Call Runpod Serverless
-        response = requests.post(
-            runpod_endpoint,
-            json=payload,
-            headers=headers,
-            timeout=600  # 10 minutes timeout
-        )
-        
-        response.raise_for_status()
-        result = response.json()
+    Raises:
+        RunpodClientError: If the job could not be queued
+        CircuitOpenError: If Runpod has been failing and calls are paused
+    """
+    def attempt():
+        client = get_runpod_client()
         
-        # Check for errors in response
-        if result.get('error'):
-            raise RunpodClientError(result['error'])
+        input_data = {
+            **client.media_field("image", image_path),
+            **client.media_field("audio", audio_path),
+            "audio_format": audio_format(audio_path)
+        }
+        if features_path:
+            input_data.update(client.media_field("features", features_path))
+        if render:
+            input_data["render"] = render
+        if outputs:
+            input_data["outputs"] = outputs
         
-        return result.get('output', {})
+        return client.submit(input_data, webhook=webhook), client.base_url
     
-    except requests.exceptions.RequestException as e:
-        raise RunpodClientError(f"Runpod API call failed: {str(e)}")
-    except Exception as e:
-        raise RunpodClientError(f"Unexpected error: {str(e)}")
+    return get_dependency('runpod').call(attempt)
 
 
 def save_base64_to_file(base64_data: str, output_path: str) -> str:
-    """Save base64 encoded data to file."""
-    file_data = base64.b64decode(base64_data)
+    """Save base64 encoded data to file, decoding it in chunks."""
     output_path_obj = Path(output_path)
     output_path_obj.parent.mkdir(parents=True, exist_ok=True)
     
     with open(output_path_obj, 'wb') as f:
-        f.write(file_data)
+        decoder = Base64StreamDecoder(f)
+        for start in range(0, len(base64_data), DECODE_CHUNK_SIZE):
+            decoder.write(base64_data[start:start + DECODE_CHUNK_SIZE].encode('ascii'))
+        decoder.close()
     
     return str(output_path_obj.absolute())
-
@@ -0,0 +1,212 @@
+"""
+Background poller for Runpod jobs submitted with /run.
+A single thread tracks every in-flight job and polls /status with adaptive
+backoff, so no request or worker thread waits on a GPU render. Jobs with a
+progress callback are polled on /stream instead while they run, which
+carries the handler's progress events and no media.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+from django.conf import settings
+from django.db import close_old_connections
+from .runpod_client import get_runpod_client, RunpodClientError, PENDING_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failed status calls before a job is given up on
+MAX_POLL_FAILURES = 5
+
+
+@dataclass
+class TrackedJob:
+    """A remote job the poller is waiting on."""
+    key: str
+    remote_job_id: str
+    sinks: dict[str, str]
+    on_done: Callable[[dict], None] | None
+    interval: float
+    endpoint: str | None = None
+    on_progress: Callable[[dict], None] | None = None
+    last_status: str = 'IN_QUEUE'
+    failures: int = 0
+    schedule_token: int = -1
+
+
+class RunpodPoller:
+    """
+    Tracks many in-flight Runpod jobs from one lightweight thread.
+    
+    Each job is polled on its own schedule: the interval starts at
+    RUNPOD_POLL_INITIAL_INTERVAL and grows by RUNPOD_POLL_BACKOFF up to
+    RUNPOD_POLL_MAX_INTERVAL while the job is pending. When a job reaches a
+    final status its on_done callback receives the status document.
+    """
+    
+    def __init__(self):
+        self._jobs: dict[str, TrackedJob] = {}
+        self._schedule: list[tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+    
+    def track(
+        self,
+        key: str,
+        remote_job_id: str,
+        sinks: dict[str, str],
+        on_done: Callable[[dict], None] | None,
+        endpoint: str | None = None,
+        on_progress: Callable[[dict], None] | None = None
+    ) -> None:
+        """
+        Start polling a remote job.
+        
+        Args:
+            key: Local identifier (e.g. ReelJob id); re-tracking a key replaces it
+            remote_job_id: Runpod job id returned by /run
+            sinks: Output field name -> file path for streamed media
+            on_done: Called with the final status document; None to only
+                follow progress (e.g. when a webhook delivers the result)
+            endpoint: Base URL of the endpoint the job was submitted to
+            on_progress: Called with each new progress event of the job
+        """
+        job = TrackedJob(
+            key=key,
+            remote_job_id=remote_job_id,
+            sinks=sinks,
+            on_done=on_done,
+            interval=settings.RUNPOD_POLL_INITIAL_INTERVAL,
+            endpoint=endpoint,
+            on_progress=on_progress,
+        )
+        with self._condition:
+            self._jobs[key] = job
+            self._schedule_locked(job)
+            self._ensure_thread_locked()
+            self._condition.notify()
+    
+    def untrack(self, key: str) -> None:
+        """Stop polling a job (e.g. when a webhook already delivered it)."""
+        with self._condition:
+            self._jobs.pop(key, None)
+    
+    def is_tracking(self, key: str) -> bool:
+        with self._condition:
+            return key in self._jobs
+    
+    def in_flight(self) -> int:
+        """Number of jobs currently being tracked."""
+        with self._condition:
+            return len(self._jobs)
+    
+    def _schedule_locked(self, job: TrackedJob) -> None:
+        job.schedule_token = next(self._sequence)
+        heapq.heappush(self._schedule, (time.monotonic() + job.interval, job.schedule_token, job.key))
+    
+    def _ensure_thread_locked(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='runpod-poller', daemon=True)
+            self._thread.start()
+    
+    def _next_due(self) -> TrackedJob:
+        """Block until a tracked job is due for polling and return it."""
+        with self._condition:
+            while True:
+                if not self._schedule:
+                    self._condition.wait()
+                    continue
+                due, token, key = self._schedule[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                job = self._jobs.get(key)
+                # Skip stale entries left behind by untrack() or re-track()
+                if job is not None and job.schedule_token == token:
+                    return job
+    
+    def _run(self) -> None:
+        while True:
+            job = self._next_due()
+            try:
+                self._poll(job)
+            except Exception:
+                logger.exception("Runpod poller failed on job %s", job.key)
+            finally:
+                close_old_connections()
+    
+    def _poll(self, job: TrackedJob) -> None:
+        try:
+            client = get_runpod_client(job.endpoint)
+            if job.on_progress:
+                streamed = client.stream(job.remote_job_id)
+                if streamed['progress']:
+                    job.on_progress(streamed['progress'])
+                if streamed['status'] in PENDING_STATUSES:
+                    job.failures = 0
+                    self._pending(job, streamed['status'])
+                    return
+                if job.on_done is None:
+                    self._finish(job, None)
+                    return
+            result = client.status(job.remote_job_id, job.sinks)
+        except RunpodClientError as e:
+            job.failures += 1
+            if job.failures >= MAX_POLL_FAILURES:
+                self._finish(job, {'id': job.remote_job_id, 'status': 'FAILED', 'error': str(e)})
+            else:
+                self._reschedule(job)
+            return
+        
+        job.failures = 0
+        status = result.get('status')
+        if status in PENDING_STATUSES:
+            self._pending(job, status)
+        else:
+            self._finish(job, result)
+    
+    def _pending(self, job: TrackedJob, status: str) -> None:
+        """Schedule the next poll of a job that has not finished yet."""
+        if status != job.last_status:
+            # Queue -> running: check back soon, the render length is unknown
+            job.last_status = status
+            job.interval = settings.RUNPOD_POLL_INITIAL_INTERVAL
+        else:
+            job.interval = min(
+                job.interval * settings.RUNPOD_POLL_BACKOFF,
+                settings.RUNPOD_POLL_MAX_INTERVAL
+            )
+        self._reschedule(job)
+    
+    def _reschedule(self, job: TrackedJob) -> None:
+        with self._condition:
+            if self._jobs.get(job.key) is job:
+                self._schedule_locked(job)
+    
+    def _finish(self, job: TrackedJob, result: dict | None) -> None:
+        with self._condition:
+            if self._jobs.get(job.key) is not job:
+                return
+            del self._jobs[job.key]
+        if job.on_done:
+            job.on_done(result)
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_runpod_poller() -> RunpodPoller:
+    """Return the process-wide RunpodPoller."""
+    global _poller
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                _poller = RunpodPoller()
+    return _poller
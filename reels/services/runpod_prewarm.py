@@ -0,0 +1,139 @@
+"""
+Predictive pre-warming of Runpod workers.
+Scripts waiting for approval are renders that are likely to be requested
+soon, so while there are any we keep enough workers warm (with SadTalker
+loaded) by sending cheap warm-up jobs, instead of paying the cold start
+after ApproveScriptView. With no pending scripts nothing is sent and the
+endpoint can scale to zero.
+"""
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from ..models import ReelJob
+from .runpod_client import get_runpod_client, get_runpod_router, RunpodClientError
+from .resilience import get_dependency, OPEN
+
+logger = logging.getLogger(__name__)
+
+
+def expected_renders() -> float:
+    """
+    Renders expected soon, from the scripts awaiting approval.
+    Each counts RUNPOD_PREWARM_APPROVAL_RATE when fresh, fading linearly to
+    zero at RUNPOD_PREWARM_MAX_AGE since it was last touched (abandoned).
+    """
+    now = timezone.now()
+    max_age = settings.RUNPOD_PREWARM_MAX_AGE
+    updated = ReelJob.objects.filter(
+        status='script_pending_approval',
+        updated_at__gte=now - timedelta(seconds=max_age)
+    ).values_list('updated_at', flat=True)
+    
+    return sum(
+        settings.RUNPOD_PREWARM_APPROVAL_RATE * max(0.0, 1 - (now - updated_at).total_seconds() / max_age)
+        for updated_at in updated
+    )
+
+
+class RunpodPrewarmer:
+    """
+    Background thread that keeps warm workers in line with expected demand.
+    
+    Every RUNPOD_PREWARM_INTERVAL seconds (or at once when notified) it
+    computes the workers wanted (expected renders, capped at
+    RUNPOD_PREWARM_MAX_WORKERS, minus jobs already in flight) and sends that
+    many warm-up pings. Pings are repeated every RUNPOD_PREWARM_KEEPALIVE
+    seconds while demand lasts, which should be a bit less than the
+    endpoint's idle timeout.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._thread = None
+        self._wake = False
+        self._last_ping = None
+        self._last_count = 0
+    
+    def notify(self) -> None:
+        """A script is awaiting approval: re-evaluate demand now."""
+        if not settings.RUNPOD_PREWARM:
+            return
+        with self._condition:
+            self._wake = True
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='runpod-prewarm', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+    
+    def wanted_workers(self) -> int:
+        demand = min(math.ceil(expected_renders()), settings.RUNPOD_PREWARM_MAX_WORKERS)
+        busy = sum(client.health.in_flight() for client in get_runpod_router().clients)
+        return max(0, demand - busy)
+    
+    def tick(self) -> int:
+        """
+        Send warm-up pings if needed.
+        
+        Returns:
+            Number of pings sent
+        """
+        if get_dependency('runpod').breaker.state == OPEN:
+            return 0  # Runpod is failing; pings would only add load
+        
+        wanted = self.wanted_workers()
+        if wanted == 0:
+            self._last_count = 0
+            return 0
+        
+        now = time.monotonic()
+        if (
+            self._last_ping is not None
+            and now - self._last_ping < settings.RUNPOD_PREWARM_KEEPALIVE
+            and wanted <= self._last_count
+        ):
+            return 0
+        
+        sent = 0
+        for _ in range(wanted):
+            try:
+                get_runpod_client().warmup(ttl=settings.RUNPOD_PREWARM_KEEPALIVE)
+                sent += 1
+            except RunpodClientError as e:
+                logger.warning("Runpod warm-up ping failed: %s", e)
+                break
+        
+        self._last_ping = now
+        self._last_count = wanted
+        return sent
+    
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._wake:
+                    self._condition.wait(settings.RUNPOD_PREWARM_INTERVAL)
+                self._wake = False
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Runpod pre-warm check failed")
+            finally:
+                close_old_connections()
+
+
+_prewarmer = None
+_prewarmer_lock = threading.Lock()
+
+
+def get_runpod_prewarmer() -> RunpodPrewarmer:
+    """Return the process-wide RunpodPrewarmer."""
+    global _prewarmer
+    if _prewarmer is None:
+        with _prewarmer_lock:
+            if _prewarmer is None:
+                _prewarmer = RunpodPrewarmer()
+    return _prewarmer
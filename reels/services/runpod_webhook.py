@@ -0,0 +1,38 @@
+"""
+Signed completion webhooks for Runpod jobs.
+With RUNPOD_WEBHOOK_BASE_URL set, async jobs are submitted with a callback
+URL that Runpod POSTs the final status document to, so no Django thread
+waits on or polls a GPU render. The URL carries an HMAC of the ReelJob id
+as its only credential.
+"""
+from django.conf import settings
+from django.core.signing import Signer
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+
+_signer = Signer(salt='reels.runpod_webhook')
+
+
+def webhook_signature(reel_job_id) -> str:
+    """HMAC of a ReelJob id, keyed by SECRET_KEY."""
+    return _signer.signature(str(reel_job_id))
+
+
+def verify_webhook_signature(reel_job_id, signature: str) -> bool:
+    return constant_time_compare(signature, webhook_signature(reel_job_id))
+
+
+def runpod_webhook_url(reel_job_id) -> str | None:
+    """
+    Public callback URL for a ReelJob's render.
+    
+    Returns:
+        The signed URL, or None if RUNPOD_WEBHOOK_BASE_URL is not configured
+    """
+    if not settings.RUNPOD_WEBHOOK_BASE_URL:
+        return None
+    path = reverse('runpod_webhook', kwargs={
+        'pk': reel_job_id,
+        'signature': webhook_signature(reel_job_id),
+    })
+    return settings.RUNPOD_WEBHOOK_BASE_URL.rstrip('/') + path
@@ -1,10 +1,15 @@
 """
 SadTalker integration service.
+
+SadTalker's output is streamed to the job's rotating log file while it runs
+and its resource usage is stored as a RenderMetric (see process_runner).
 """
-import subprocess
 import pathlib
 from django.conf import settings
 from ..models import ReelJob
+from .render_presets import render_options, sadtalker_cli_args, RenderPresetError
+from .process_runner import run_logged, open_job_log, close_job_log, record_metrics, ProcessRunError
+from .audio_formats import render_audio_path
 
 
 class SadTalkerError(Exception):
@@ -14,7 +19,8 @@ class SadTalkerError(Exception):
 
 def run_sadtalker_for_reel(reel_job: ReelJob) -> str:
     """
-    Use SadTalker to generate a talking-head video for reel_job.image + reel_job.audio_file.
+    Use SadTalker to generate a talking-head video for reel_job.image + reel_job.audio_file,
+    with the settings of reel_job.render_preset.
     Save the resulting video under MEDIA_ROOT/reels/{job_id}/ and update reel_job.video_file.
     
     Args:
@@ -38,7 +44,7 @@ def run_sadtalker_for_reel(reel_job: ReelJob) -> str:
     
     # Get absolute paths
     image_path = pathlib.Path(reel_job.image.path).absolute()
-    audio_path = pathlib.Path(reel_job.audio_file.path).absolute()
+    audio_path = render_audio_path(reel_job).absolute()
     
     if not image_path.exists():
         raise SadTalkerError(f"Image file not found: {image_path}")
@@ -55,26 +61,36 @@ def run_sadtalker_for_reel(reel_job: ReelJob) -> str:
     if not inference_script.exists():
         raise SadTalkerError(f"SadTalker inference.py not found: {inference_script}")
     
+    try:
+        render_args = sadtalker_cli_args(render_options(reel_job.render_preset))
+    except RenderPresetError as e:
+        raise SadTalkerError(str(e))
+    
     cmd = [
         'python',
         str(inference_script),
         '--driven_audio', str(audio_path),
         '--source_image', str(image_path),
         '--result_dir', str(job_output_dir),
-        '--enhancer', 'gfpgan',
-        '--preprocess', 'full',
+        *render_args,
     ]
     
+    job_log = open_job_log(reel_job.id)
     try:
-        # Run SadTalker
-        result = subprocess.run(
+        # Run SadTalker, logging its output as it runs
+        result = run_logged(
             cmd,
+            'sadtalker',
+            job_log,
             cwd=str(sadtalker_root),
-            capture_output=True,
-            text=True,
-            check=True,
             timeout=600  # 10 minute timeout
         )
+        record_metrics(reel_job, [result.metrics.as_dict()])
+        
+        if result.timed_out:
+            raise SadTalkerError("SadTalker execution timed out")
+        if result.returncode != 0:
+            raise SadTalkerError(f"SadTalker failed: {result.output_tail}")
         
         # Search for the generated video file
         video_files = list(job_output_dir.rglob('*.mp4'))
@@ -98,14 +114,8 @@ def run_sadtalker_for_reel(reel_job: ReelJob) -> str:
         
         return str(final_video_path.absolute())
     
-    except subprocess.TimeoutExpired:
-        reel_job.status = 'error'
-        reel_job.error_message = "SadTalker execution timed out"
-        reel_job.save()
-        raise SadTalkerError("SadTalker execution timed out")
-    
-    except subprocess.CalledProcessError as e:
-        error_msg = f"SadTalker failed: {e.stderr or e.stdout or str(e)}"
+    except (SadTalkerError, ProcessRunError) as e:
+        error_msg = str(e)
         reel_job.status = 'error'
         reel_job.error_message = error_msg
         reel_job.save()
@@ -117,4 +127,6 @@ def run_sadtalker_for_reel(reel_job: ReelJob) -> str:
         reel_job.error_message = error_msg
         reel_job.save()
         raise SadTalkerError(error_msg) from e
-
+    
+    finally:
+        close_job_log(job_log)
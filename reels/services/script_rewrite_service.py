@@ -1,10 +1,16 @@
 """
 Script rewriting service with human-in-the-loop support.
 Handles script rewriting in Django, allows user approval before proceeding.
+
+The rewrite itself is done by the REWRITE_PROVIDER (see providers):
+OpenAIRewriter below, or an offline stand-in.
 """
 from typing import Literal
 from django.conf import settings
-from openai import OpenAI
+from .openai_client import get_openai_client
+from .resilience import get_dependency, CircuitOpenError
+from .rate_limiter import acquire_openai_capacity, settle_openai_tokens
+from .providers import RewriteProvider, get_rewrite_provider
 
 Tone = Literal["neutral", "friendly", "formal", "energetic", "dramatic"]
 
@@ -16,7 +22,7 @@ class ScriptRewriteError(Exception):
 
 def rewrite_script(original_script: str, tone: Tone = "neutral", max_seconds: int | None = None) -> str:
     """
-    Rewrite a script using OpenAI API to match the requested tone.
+    Rewrite a script with the REWRITE_PROVIDER to match the requested tone.
     This is called in Django, user can approve or regenerate.
     
     Args:
@@ -28,53 +34,84 @@ def rewrite_script(original_script: str, tone: Tone = "neutral", max_seconds: in
         The rewritten script as a string
     
     Raises:
-        ScriptRewriteError: If the API call fails
+        ScriptRewriteError: If rewriting fails
+        CircuitOpenError: If OpenAI has been failing and calls are paused
     """
-    api_key = settings.OPENAI_API_KEY
-    if not api_key:
-        raise ScriptRewriteError("OPENAI_API_KEY not configured in settings")
-    
-    client = OpenAI(api_key=api_key)
-    
-    # Build the prompt
-    tone_instructions = {
-        "neutral": "Keep the tone neutral and professional.",
-        "friendly": "Make the tone warm, approachable, and conversational.",
-        "formal": "Use a formal, professional, and authoritative tone.",
-        "energetic": "Make it energetic, enthusiastic, and exciting.",
-        "dramatic": "Use a dramatic, impactful, and emotionally engaging tone.",
-    }
-    
-    prompt = f"""Rewrite the following script to have a {tone} tone. {tone_instructions.get(tone, '')}
-    
-    Original script:
-    {original_script}
-    
-    Rewritten script:"""
-    
-    if max_seconds:
-        prompt += f"\n\nTarget length: approximately {max_seconds} seconds when spoken (roughly {max_seconds * 2.5} words)."
-    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a professional script writer. Rewrite scripts to match the requested tone while preserving the core message."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        rewritten_script = response.choices[0].message.content.strip()
-        return rewritten_script
-    
+        return get_rewrite_provider().rewrite(original_script, tone, max_seconds)
+    except (CircuitOpenError, ScriptRewriteError):
+        raise
     except Exception as e:
         raise ScriptRewriteError(f"Failed to rewrite script: {str(e)}") from e
 
+
+class OpenAIRewriter(RewriteProvider):
+    """Rewrites scripts with an OpenAI chat model."""
+    name = 'openai'
+    
+    def rewrite(self, original_script: str, tone: Tone, max_seconds: int | None) -> str:
+        api_key = settings.OPENAI_API_KEY
+        if not api_key:
+            raise ScriptRewriteError("OPENAI_API_KEY not configured in settings")
+        
+        client = get_openai_client()
+        
+        # Build the prompt
+        tone_instructions = {
+            "neutral": "Keep the tone neutral and professional.",
+            "friendly": "Make the tone warm, approachable, and conversational.",
+            "formal": "Use a formal, professional, and authoritative tone.",
+            "energetic": "Make it energetic, enthusiastic, and exciting.",
+            "dramatic": "Use a dramatic, impactful, and emotionally engaging tone.",
+        }
+        
+        prompt = f"""Rewrite the following script to have a {tone} tone. {tone_instructions.get(tone, '')}
+        
+        Original script:
+        {original_script}
+        
+        Rewritten script:"""
+        
+        if max_seconds:
+            prompt += f"\n\nTarget length: approximately {max_seconds} seconds when spoken (roughly {max_seconds * 2.5} words)."
+        
+        model = "gpt-4o-mini"
+        max_tokens = 1000
+        messages = [
+            {
+                "role": "system",
+                "content": "You are a professional script writer. Rewrite scripts to match the requested tone while preserving the core message."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        # Reserve ~4 characters per prompt token plus the completion cap, settled after the call
+        reserved_tokens = sum(len(message["content"]) for message in messages) / 4 + max_tokens
+        
+        def attempt():
+            acquire_openai_capacity(model, reserved_tokens)
+            try:
+                return client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                )
+            except Exception:
+                settle_openai_tokens(model, reserved_tokens, 0)  # A failed call uses no tokens
+                raise
+        
+        try:
+            response = get_dependency('openai_chat').call(attempt)
+            if response.usage:
+                settle_openai_tokens(model, reserved_tokens, response.usage.total_tokens)
+            
+            rewritten_script = response.choices[0].message.content.strip()
+            return rewritten_script
+        
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            raise ScriptRewriteError(f"Failed to rewrite script: {str(e)}") from e
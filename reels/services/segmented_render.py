@@ -0,0 +1,212 @@
+"""
+Segment-parallel video rendering.
+
+A long reel renders as one serial SadTalker pass. Here the TTS audio is cut
+at natural pauses into up to RENDER_SEGMENTS pieces, each piece is rendered
+against the same source image concurrently (on different Runpod workers, or
+any other renderer), and the videos are joined with ffmpeg's concat demuxer
+using stream copy.
+
+Boundaries stay seamless because:
+- cuts fall inside silences, where the mouth is closed, snapped to video
+  frame boundaries so segment lengths add up exactly
+- the original audio track is muxed over the joined video instead of
+  concatenating per-segment audio (no AAC priming gaps)
+"""
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+from django.conf import settings
+
+# SadTalker renders at 25 fps
+VIDEO_FPS = 25
+
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+_SILENCE_START_RE = re.compile(r'silence_start:\s*(-?\d+(?:\.\d+)?)')
+_SILENCE_END_RE = re.compile(r'silence_end:\s*(-?\d+(?:\.\d+)?)')
+
+
+class SegmentedRenderError(Exception):
+    """Custom exception for segmented rendering errors."""
+    pass
+
+
+def _run_ffmpeg(args: list[str]) -> str:
+    """Run ffmpeg and return its log output (stderr)."""
+    cmd = [settings.FFMPEG_BINARY, '-hide_banner', '-nostdin', *args]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+    except FileNotFoundError:
+        raise SegmentedRenderError(f"ffmpeg not found: {settings.FFMPEG_BINARY}")
+    except subprocess.TimeoutExpired:
+        raise SegmentedRenderError("ffmpeg timed out")
+    if result.returncode != 0:
+        raise SegmentedRenderError(f"ffmpeg failed: {result.stderr[-2000:]}")
+    return result.stderr
+
+
+def detect_silences(audio_path: str, noise_db: float, min_silence: float) -> tuple[float, list[tuple[float, float]]]:
+    """
+    Find silent stretches with ffmpeg's silencedetect filter.
+    
+    Returns:
+        (audio duration in seconds, list of (start, end) silences)
+    """
+    log = _run_ffmpeg([
+        '-i', str(audio_path),
+        '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}',
+        '-f', 'null', '-'
+    ])
+    match = _DURATION_RE.search(log)
+    if not match:
+        raise SegmentedRenderError(f"Could not read the duration of {audio_path}")
+    hours, minutes, seconds = match.groups()
+    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
+    starts = [max(0.0, float(s)) for s in _SILENCE_START_RE.findall(log)]
+    ends = [float(e) for e in _SILENCE_END_RE.findall(log)]
+    ends += [duration] * (len(starts) - len(ends))  # Trailing silence has no end line
+    return duration, list(zip(starts, ends))
+
+
+def choose_split_points(
+    duration: float,
+    silences: list[tuple[float, float]],
+    segments: int,
+    min_segment: float,
+    fps: int = VIDEO_FPS
+) -> list[float]:
+    """
+    Pick up to segments - 1 cut times, each in the middle of the silence
+    closest to an even split and at least min_segment from its neighbours.
+    Where no pause is close enough the cut is skipped rather than made
+    mid-word, so fewer, longer segments come out.
+    
+    Returns:
+        Ascending cut times in seconds, on frame boundaries
+    """
+    points: list[float] = []
+    if segments < 2:
+        return points
+    
+    step = duration / segments
+    midpoints = [(start + end) / 2 for start, end in silences]
+    for k in range(1, segments):
+        previous = points[-1] if points else 0.0
+        candidates = [
+            t for t in midpoints
+            if t - previous >= min_segment
+            and duration - t >= min_segment
+            and abs(t - step * k) <= step / 2
+        ]
+        if candidates:
+            cut = min(candidates, key=lambda t: abs(t - step * k))
+            points.append(round(cut * fps) / fps)
+    return points
+
+
+def split_audio(audio_path: str, points: list[float], output_dir: Path) -> list[str]:
+    """Cut audio at points into 16 kHz mono WAV segments (what SadTalker uses)."""
+    bounds = [0.0, *points, None]
+    paths = []
+    for index, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        segment_path = output_dir / f'segment_{index:03d}.wav'
+        args = ['-y', '-i', str(audio_path), '-ss', f'{start:.3f}']
+        if end is not None:
+            args += ['-to', f'{end:.3f}']
+        _run_ffmpeg([*args, '-ac', '1', '-ar', '16000', str(segment_path)])
+        paths.append(str(segment_path))
+    return paths
+
+
+def concat_videos(video_paths: list[str], audio_path: str, output_path: str) -> None:
+    """Join segment videos by stream copy and mux the full original audio over them."""
+    list_path = Path(output_path).with_suffix('.concat.txt')
+    with open(list_path, 'w') as f:
+        for path in video_paths:
+            f.write(f"file '{Path(path).absolute().as_posix()}'\n")
+    try:
+        _run_ffmpeg([
+            '-y',
+            '-f', 'concat', '-safe', '0', '-i', str(list_path),
+            '-i', str(audio_path),
+            '-map', '0:v', '-map', '1:a',
+            '-c:v', 'copy', '-c:a', 'aac',
+            '-shortest',
+            str(output_path)
+        ])
+    finally:
+        list_path.unlink(missing_ok=True)
+
+
+def render_segmented(
+    image_path: str,
+    audio_path: str,
+    output_path: str,
+    render_segment: Callable[[str, str, str], None],
+    segments: int | None = None,
+    max_workers: int | None = None,
+    on_progress: Callable[[int, int], None] | None = None
+) -> int:
+    """
+    Render a talking-head video as concurrently rendered segments.
+    
+    Args:
+        image_path: Source face image
+        audio_path: Full driving audio
+        output_path: Where to write the joined video
+        render_segment: Renders (image_path, segment_audio_path, video_path)
+        segments: Maximum number of segments, default RENDER_SEGMENTS
+        max_workers: Segments rendered at once, default RENDER_SEGMENT_WORKERS
+        on_progress: Called with (segments done, total) as segments finish
+    
+    Returns:
+        Number of segments rendered (1 if the audio had no usable pauses)
+    
+    Raises:
+        SegmentedRenderError: If ffmpeg fails
+        Exception: Whatever render_segment raises for a failed segment
+    """
+    segments = segments or settings.RENDER_SEGMENTS
+    max_workers = max_workers or settings.RENDER_SEGMENT_WORKERS or segments
+    
+    duration, silences = detect_silences(
+        audio_path,
+        settings.RENDER_SILENCE_DB,
+        settings.RENDER_SILENCE_MIN_SECONDS
+    )
+    segments = min(segments, int(duration // settings.RENDER_SEGMENT_MIN_SECONDS) or 1)
+    points = choose_split_points(duration, silences, segments, settings.RENDER_SEGMENT_MIN_SECONDS)
+    if not points:
+        render_segment(image_path, audio_path, output_path)
+        return 1
+    
+    work_dir = Path(tempfile.mkdtemp(prefix='segments-', dir=Path(output_path).parent))
+    try:
+        audio_segments = split_audio(audio_path, points, work_dir)
+        video_segments = [str(Path(path).with_suffix('.mp4')) for path in audio_segments]
+        
+        done = 0
+        done_lock = threading.Lock()
+        
+        def render(index: int) -> None:
+            nonlocal done
+            render_segment(image_path, audio_segments[index], video_segments[index])
+            if on_progress:
+                with done_lock:
+                    done += 1
+                    on_progress(done, len(video_segments))
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(audio_segments))) as executor:
+            # list() re-raises the first failed segment
+            list(executor.map(render, range(len(audio_segments))))
+        
+        concat_videos(video_segments, audio_path, output_path)
+        return len(video_segments)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
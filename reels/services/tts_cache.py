@@ -0,0 +1,152 @@
+"""
+Content-addressed cache of TTS audio.
+
+The same script is voiced again and again: templated scripts, retries after
+a failed render, cloned reels. Audio is cached under a SHA-256 of the
+normalized text, model, voice and format (TTS_CACHE_DIR/<ab>/<key>.<format>).
+A hit is hard-linked into the job directory (copied if the cache is on
+another filesystem), so it costs neither an API call nor disk space.
+
+Entries not used for TTS_CACHE_MAX_AGE_DAYS are evicted, then the least
+recently used ones until the cache fits in TTS_CACHE_MAX_MB. Eviction scans
+the whole cache, so it runs at most every EVICT_INTERVAL seconds and in one
+thread at a time (evict_if_due, once per voiced script); until then the
+cache can exceed its size by what was stored meanwhile. Eviction only
+removes the cache's link: job files that share the audio keep it.
+Cache failures are logged and never fail TTS generation.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+import uuid
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bumped to invalidate every entry (e.g. if normalization changes)
+CACHE_VERSION = 1
+
+# Minimum seconds between eviction scans
+EVICT_INTERVAL = 60
+
+_evict_lock = threading.Lock()
+_last_evict = float('-inf')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC with runs of whitespace collapsed; both do not change the speech."""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def cache_key(text: str, model: str, voice: str, response_format: str) -> str:
+    payload = json.dumps([CACHE_VERSION, normalize_text(text), model, voice, response_format])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_path(key: str, response_format: str) -> Path:
+    return Path(settings.TTS_CACHE_DIR) / key[:2] / f'{key}.{response_format}'
+
+
+def _link(source: Path, target: Path) -> None:
+    """Hard-link source to target (replacing it), falling back to a copy."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = target.with_name(f'.{target.name}.{uuid.uuid4().hex}')
+    try:
+        try:
+            os.link(source, temp)
+        except OSError:
+            shutil.copyfile(source, temp)
+        os.replace(temp, target)
+    finally:
+        temp.unlink(missing_ok=True)
+
+
+def fetch(key: str, response_format: str, output_path: Path) -> bool:
+    """
+    Link cached audio to output_path.
+    
+    Returns:
+        True on a hit, False if the audio is not cached (or caching is off)
+    """
+    if not settings.TTS_CACHE_ENABLED:
+        return False
+    cached = cache_path(key, response_format)
+    try:
+        if time.time() - cached.stat().st_mtime > settings.TTS_CACHE_MAX_AGE_DAYS * 86400:
+            cached.unlink(missing_ok=True)
+            return False
+        os.utime(cached)  # Mark as recently used
+        _link(cached, output_path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning("TTS cache lookup failed: %s", e)
+        return False
+
+
+def store(key: str, response_format: str, audio_path: Path) -> None:
+    """Add freshly generated audio to the cache (see evict_if_due for trimming it)."""
+    if not settings.TTS_CACHE_ENABLED:
+        return
+    try:
+        _link(audio_path, cache_path(key, response_format))
+    except OSError as e:
+        logger.warning("TTS cache store failed: %s", e)
+
+
+def evict_if_due() -> None:
+    """
+    Run evict() unless it ran in the last EVICT_INTERVAL seconds or another
+    thread is running it now.
+    """
+    global _last_evict
+    if not settings.TTS_CACHE_ENABLED or time.monotonic() - _last_evict < EVICT_INTERVAL:
+        return
+    if not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() - _last_evict < EVICT_INTERVAL:
+            return
+        _last_evict = time.monotonic()
+        evict()
+    except OSError as e:
+        logger.warning("TTS cache eviction failed: %s", e)
+    finally:
+        _evict_lock.release()
+
+
+def evict() -> None:
+    """Drop entries unused for TTS_CACHE_MAX_AGE_DAYS, then the LRU ones beyond TTS_CACHE_MAX_MB."""
+    root = Path(settings.TTS_CACHE_DIR)
+    if not root.exists():
+        return
+    oldest = time.time() - settings.TTS_CACHE_MAX_AGE_DAYS * 86400
+    entries = []
+    for path in root.glob('??/*'):
+        if path.name.startswith('.'):
+            continue  # Being written
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime < oldest:
+            path.unlink(missing_ok=True)
+        else:
+            entries.append((stat.st_mtime, stat.st_size, path))
+    
+    entries.sort(reverse=True)
+    total = 0
+    for _, size, path in entries:
+        total += size
+        if total > settings.TTS_CACHE_MAX_MB * 1024 * 1024:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,189 @@
+"""
+Sentence chunking of long TTS scripts.
+
+A long script is split at sentence boundaries into chunks that are voiced
+concurrently (see openai_tts) and joined back in order without re-encoding.
+
+Chunk boundaries are content-defined: a chunk ends after a sentence whose
+hash falls on 1 in TTS_CHUNK_SENTENCES, or before it would grow beyond
+TTS_CHUNK_MAX_CHARS. Whether a boundary follows a sentence therefore
+depends on that sentence alone, so editing one sentence changes only its
+own chunk and every other chunk is still found in the TTS cache.
+"""
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+import wave
+from pathlib import Path
+from django.conf import settings
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?…])["\'”’)\]]*\s+')
+_CLAUSE_END_RE = re.compile(r'(?<=[,;:])\s+')
+
+
+class TTSChunkError(Exception):
+    """Custom exception for joining TTS chunks."""
+    pass
+
+
+def split_sentences(text: str) -> list[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END_RE.split(text.strip()) if sentence.strip()]
+
+
+def _split_long(sentence: str, max_chars: int) -> list[str]:
+    """Break a sentence longer than max_chars at clauses, then at words."""
+    pieces, current = [], ''
+    for part in _CLAUSE_END_RE.split(sentence):
+        for word in part.split(' ') if len(part) > max_chars else [part]:
+            if current and len(current) + 1 + len(word) > max_chars:
+                pieces.append(current)
+                current = word
+            else:
+                current = f'{current} {word}' if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _ends_chunk(sentence: str, sentences_per_chunk: int) -> bool:
+    digest = hashlib.sha1(' '.join(sentence.split()).encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % sentences_per_chunk == 0
+
+
+def split_script(
+    script: str,
+    max_chars: int | None = None,
+    sentences_per_chunk: int | None = None
+) -> list[str]:
+    """
+    Split a script into TTS chunks at sentence boundaries. Scripts of at
+    most TTS_CHUNK_MIN_CHARS are returned whole.
+    
+    Args:
+        script: Script text
+        max_chars: Longest chunk, default TTS_CHUNK_MAX_CHARS
+        sentences_per_chunk: Average sentences per chunk, default TTS_CHUNK_SENTENCES
+    
+    Returns:
+        Chunks in order; joined with spaces they hold every sentence of the script
+    """
+    max_chars = max_chars or settings.TTS_CHUNK_MAX_CHARS
+    sentences_per_chunk = max(1, sentences_per_chunk or settings.TTS_CHUNK_SENTENCES)
+    script = script.strip()
+    if len(script) <= min(settings.TTS_CHUNK_MIN_CHARS, max_chars):
+        return [script] if script else []
+    
+    chunks, current = [], ''
+    for sentence in split_sentences(script):
+        for piece in _split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence]:
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = ''
+            current = f'{current} {piece}' if current else piece
+            if _ends_chunk(piece, sentences_per_chunk):
+                chunks.append(current)
+                current = ''
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def join_audio(chunk_paths: list[str], output_path: Path, raw_pcm: bool = False) -> None:
+    """
+    Concatenate audio chunks in order into output_path without re-encoding
+    (ffmpeg concat demuxer, stream copy), which also rewrites the container
+    headers so the duration is right. Headerless raw PCM chunks, and MP3
+    chunks when ffmpeg is missing (a sequence of frames stays valid), are
+    concatenated directly; WAV chunks are joined under one new header. For
+    these the joined sample count is checked against the chunks' total.
+    output_path is replaced, never written in place.
+    
+    Raises:
+        TTSChunkError: If ffmpeg fails, or is missing for a format that
+            cannot be joined by concatenation
+    """
+    output_path = Path(output_path)
+    temp_path = output_path.with_name(f'.{output_path.name}.part{output_path.suffix}')
+    if raw_pcm or output_path.suffix.lower() == '.wav':
+        try:
+            if raw_pcm:
+                _concatenate(chunk_paths, temp_path)
+                expected = sum(os.path.getsize(path) for path in chunk_paths) // 2
+                joined = temp_path.stat().st_size // 2
+            else:
+                expected, joined = _join_wav(chunk_paths, temp_path)
+            if joined != expected:
+                raise TTSChunkError(f"Joined TTS audio has {joined} samples, the chunks {expected}")
+            os.replace(temp_path, output_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        return
+    
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', dir=output_path.parent, delete=False) as listing:
+        for path in chunk_paths:
+            escaped = str(Path(path).absolute()).replace("'", "'\\''")
+            listing.write(f"file '{escaped}'\n")
+    try:
+        cmd = [
+            settings.FFMPEG_BINARY, '-hide_banner', '-nostdin', '-y',
+            '-f', 'concat', '-safe', '0', '-i', listing.name,
+            '-c', 'copy',
+            str(temp_path)
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        except FileNotFoundError:
+            if output_path.suffix.lower() != '.mp3':
+                raise TTSChunkError(
+                    f"ffmpeg ({settings.FFMPEG_BINARY}) is needed to join {output_path.suffix} TTS chunks"
+                )
+            _concatenate(chunk_paths, temp_path)
+        except subprocess.TimeoutExpired:
+            raise TTSChunkError("Joining TTS audio timed out")
+        else:
+            if result.returncode != 0:
+                raise TTSChunkError(f"Joining TTS audio failed: {result.stderr[-1000:]}")
+        os.replace(temp_path, output_path)
+    finally:
+        Path(listing.name).unlink(missing_ok=True)
+        temp_path.unlink(missing_ok=True)
+
+
+def _concatenate(chunk_paths: list[str], output_path: Path) -> None:
+    with open(output_path, 'wb') as out:
+        for path in chunk_paths:
+            with open(path, 'rb') as f:
+                while block := f.read(1024 * 1024):
+                    out.write(block)
+
+
+def _join_wav(chunk_paths: list[str], output_path: Path) -> tuple[int, int]:
+    """
+    Join WAV chunks of one sample format. Chunk frames are counted as read,
+    since a streamed WAV header may not state its real length.
+    
+    Returns:
+        (frames read from the chunks, frames in the joined file's header)
+    """
+    expected = 0
+    try:
+        with wave.open(str(chunk_paths[0]), 'rb') as first:
+            channels, sample_width, frame_rate = params = first.getparams()[:3]
+        with wave.open(str(output_path), 'wb') as out:
+            out.setnchannels(channels)
+            out.setsampwidth(sample_width)
+            out.setframerate(frame_rate)
+            for path in chunk_paths:
+                with wave.open(str(path), 'rb') as chunk:
+                    if chunk.getparams()[:3] != params:
+                        raise TTSChunkError(f"TTS chunk {path} has a different sample format: {chunk.getparams()[:3]}")
+                    frame_size = chunk.getsampwidth() * chunk.getnchannels()
+                    while block := chunk.readframes(256 * 1024):
+                        expected += len(block) // frame_size
+                        out.writeframes(block)
+        with wave.open(str(output_path), 'rb') as joined:
+            return expected, joined.getnframes()
+    except (wave.Error, EOFError) as e:
+        raise TTSChunkError(f"Could not join WAV TTS chunks: {e or 'unexpected end of file'}")
@@ -1,16 +1,67 @@
 """
 Video generation service using Runpod Serverless.
 TTS audio is generated in Django, Runpod only handles video generation (SadTalker).
+
+With RUNPOD_MODE=async the job is submitted to /run and the ReelJob is
+finished by a Runpod webhook (RUNPOD_WEBHOOK_BASE_URL) or, without one, by
+the shared RunpodPoller when the render completes.
+
+While a job renders, the handler's progress events are written to
+ReelJob.progress_percent / progress_stage (see record_video_progress).
+
+With TWO_PASS_RENDERING a quick draft is rendered and published before the
+full-quality render (see render_preview / reject_video_job).
+
+With RENDER_SEGMENTS > 1 (sync mode only) long audio is split at pauses and
+rendered as several concurrent Runpod jobs (see segmented_render).
+
+The job's output_formats are encoded by the worker after the final render
+(in Django from the joined video for segmented renders) and stored as
+ReelArtifacts (see output_formats).
+
+The resource usage the worker reports per stage is stored as RenderMetric
+rows (see process_runner.record_metrics).
+
+The worker renders from the reel's TTS_RENDER_FORMAT audio (see
+audio_formats.render_audio_path), not necessarily the audio_url one.
 """
+import logging
+import os
+import random
+import threading
+import uuid
+from functools import partial
 from ..models import ReelJob
-from .runpod_client import generate_video_with_runpod, save_base64_to_file, RunpodClientError
+from .runpod_client import (
+    generate_video_with_runpod,
+    submit_video_with_runpod,
+    get_runpod_client,
+    RunpodClientError
+)
+from .runpod_poller import get_runpod_poller
+from .runpod_webhook import runpod_webhook_url
+from .resilience import CircuitOpenError
+from .render_presets import render_options
+from .segmented_render import render_segmented
+from .render_features import prepare_image_input, prepare_audio_input
+from .output_formats import resolve_outputs, output_sinks, record_artifacts, encode_outputs
+from .process_runner import record_metrics
 from .openai_tts import generate_tts_audio, OpenAITTSError
+from .audio_formats import render_audio_path
 from django.conf import settings
+from django.db import close_old_connections
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+_resume_lock = threading.Lock()
+_resumed = False
+
 
 def generate_video_with_runpod_service(
-    reel_job: ReelJob
+    reel_job: ReelJob,
+    requeues: int = 0,
+    two_pass: bool | None = None
 ) -> ReelJob:
     """
     Generate video using Runpod Serverless.
@@ -20,8 +71,19 @@ def generate_video_with_runpod_service(
     3. Runpod runs SadTalker to generate video
     4. Save video file
     
+    In async mode this returns after step 2 with status 'processing'.
+    In two-pass mode an unenhanced draft (PREVIEW_RENDER_PRESET) is rendered
+    and published as preview_video_file first, then the final render
+    replaces it as video_file; a reel rejected in between (reject_video_job)
+    never gets the final pass.
+    If OpenAI TTS or Runpod has an open circuit breaker (or Runpod is still
+    unreachable after retries), the job goes back to 'script_approved' and
+    is retried in the background later (up to RESILIENCE_MAX_REQUEUES times).
+    
     Args:
         reel_job: The ReelJob instance with approved final_script
+        requeues: How many times this job has already been re-queued
+        two_pass: Render a preview first, default TWO_PASS_RENDERING
     
     Returns:
         The updated ReelJob instance
@@ -29,6 +91,8 @@ def generate_video_with_runpod_service(
     try:
         # Set status to processing
         reel_job.status = 'processing'
+        reel_job.progress_percent = 0
+        reel_job.progress_stage = 'queued'
         reel_job.save()
         
         # Check script is approved
@@ -55,40 +119,465 @@ def generate_video_with_runpod_service(
         if not reel_job.audio_file:
             raise Exception("Audio file not generated")
         
-        audio_path = Path(reel_job.audio_file.path)
+        audio_path = render_audio_path(reel_job)
         if not audio_path.exists():
             raise Exception(f"Audio file not found: {audio_path}")
         
         # Step 2: Call Runpod Serverless for video generation only
         # SadTalker needs: image + audio file
-        result = generate_video_with_runpod(
-            image_path=str(image_path),
-            audio_path=str(audio_path)
-        )
+        job_dir = settings.MEDIA_ROOT / 'reels' / str(reel_job.id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+        video_path = job_dir / 'video.mp4'
+        
+        render = render_options(reel_job.render_preset)
+        outputs = resolve_outputs(reel_job.output_formats)
+        
+        # CPU-only preprocessing happens here rather than on the GPU worker
+        inputs_dir = job_dir / 'render_inputs'
+        image_path = prepare_image_input(str(image_path), inputs_dir)
+        features_path = prepare_audio_input(str(audio_path), inputs_dir)
+        
+        if two_pass is None:
+            two_pass = settings.TWO_PASS_RENDERING
+        # A reel rendered with the preview preset needs no separate preview
+        two_pass = two_pass and reel_job.render_preset != settings.PREVIEW_RENDER_PRESET
+        
+        if settings.RUNPOD_MODE == 'async':
+            # Queue the render; the webhook (or the poller) finishes the job.
+            # In two-pass mode this is the preview, the final render is
+            # queued when it completes (see complete_runpod_video_job)
+            resume_runpod_video_jobs()
+            reel_job.preview_pending = two_pass
+            submit_runpod_video_job(reel_job, image_path, str(audio_path), features_path)
+            return reel_job
+        
+        if two_pass:
+            # Publish a quick draft first; reviewers can reject the reel
+            # before the expensive final pass starts
+            render_preview(reel_job, image_path, str(audio_path), features_path)
+            if is_rejected(reel_job.id):
+                reel_job.refresh_from_db()
+                return reel_job
+        
+        # Step 3: The returned video is decoded straight into the job directory
+        if settings.RENDER_SEGMENTS > 1:
+            # Long audio: render pieces on several workers at once and join
+            # them; the output formats are then encoded from the joined video
+            segment_metrics = []
+            try:
+                render_segmented(
+                    str(image_path),
+                    str(audio_path),
+                    str(video_path),
+                    partial(_render_runpod_segment, render, segment_metrics),
+                    on_progress=partial(_record_segment_progress, reel_job.id)
+                )
+            finally:
+                record_metrics(reel_job, segment_metrics, 'segment_')
+            result = {'video_path': str(video_path)}
+            if outputs and not is_rejected(reel_job.id):
+                result.update(encode_outputs(reel_job, str(video_path), outputs))
+        else:
+            result = generate_video_with_runpod(
+                image_path=str(image_path),
+                audio_path=str(audio_path),
+                video_output_path=str(video_path),
+                render=render,
+                on_progress=partial(record_video_progress, reel_job.id),
+                features_path=features_path,
+                outputs=outputs
+            )
+            record_metrics(reel_job, result.get('metrics'))
+        
+        if is_rejected(reel_job.id):
+            for path in [video_path, *output_sinks(outputs, str(video_path)).values()]:
+                Path(path).unlink(missing_ok=True)
+            reel_job.refresh_from_db()
+            return reel_job
         
         # Check for errors
         if result.get('error'):
             raise RunpodClientError(result['error'])
         
-        # Step 3: Save video file
-        if result.get('video_base64'):
-            job_dir = settings.MEDIA_ROOT / 'reels' / str(reel_job.id)
-            job_dir.mkdir(parents=True, exist_ok=True)
-            
-            video_path = job_dir / 'video.mp4'
-            save_base64_to_file(result['video_base64'], str(video_path))
+        if result.get('video_path'):
             reel_job.video_file.name = f'reels/{reel_job.id}/video.mp4'
+        record_artifacts(reel_job, outputs, result)
         
         # Mark as done
         reel_job.status = 'done'
+        reel_job.progress_percent = 100
+        reel_job.progress_stage = 'done'
         reel_job.save()
         
         return reel_job
     
     except Exception as e:
+        if is_rejected(reel_job.id):
+            reel_job.refresh_from_db()
+            return reel_job  # Nobody is waiting for this render any more
+        
+        outage = isinstance(e, CircuitOpenError) or getattr(e, 'dependency_failed', False)
+        if outage and requeues < settings.RESILIENCE_MAX_REQUEUES:
+            # A dependency is down: wait for it instead of failing the job
+            reel_job.status = 'script_approved'
+            reel_job.error_message = str(e)
+            reel_job.save()
+            requeue_video_job(reel_job.id, getattr(e, 'retry_after', 0.0), requeues + 1)
+            return reel_job
+        
         # Set error status
         reel_job.status = 'error'
         reel_job.error_message = str(e)
         reel_job.save()
         raise
 
+
+def requeue_video_job(reel_job_id, delay: float, requeues: int) -> None:
+    """
+    Retry video generation for a job in a background thread after delay
+    seconds. Requeued jobs are spread out so they do not all hit a
+    half-open breaker at once.
+    """
+    delay = max(delay, settings.RESILIENCE_REQUEUE_MIN_DELAY) * random.uniform(1.0, 1.5)
+    timer = threading.Timer(delay, _run_requeued_video_job, args=(reel_job_id, requeues))
+    timer.daemon = True
+    timer.start()
+
+
+def _run_requeued_video_job(reel_job_id, requeues: int) -> None:
+    try:
+        reel_job = ReelJob.objects.filter(pk=reel_job_id, status='script_approved').first()
+        if reel_job is None:
+            return  # Deleted or already picked up again
+        generate_video_with_runpod_service(reel_job, requeues=requeues)
+    except Exception:
+        pass  # Error already saved in reel_job by the service
+    finally:
+        close_old_connections()
+
+
+def _video_path(reel_job_id, preview: bool = False) -> Path:
+    name = 'preview.mp4' if preview else 'video.mp4'
+    return settings.MEDIA_ROOT / 'reels' / str(reel_job_id) / name
+
+
+def _progress_callback(reel_job: ReelJob):
+    if reel_job.preview_pending:
+        return partial(_record_preview_progress, reel_job.id)
+    return partial(record_video_progress, reel_job.id)
+
+
+def submit_runpod_video_job(
+    reel_job: ReelJob,
+    image_path: str,
+    audio_path: str,
+    features_path: str | None = None
+) -> None:
+    """
+    Queue the next render of a ReelJob on Runpod (async mode) and follow it:
+    the preview pass while reel_job.preview_pending is set, otherwise the
+    final render (with the job's output formats).
+    """
+    if reel_job.preview_pending:
+        preset, outputs = settings.PREVIEW_RENDER_PRESET, []
+    else:
+        preset, outputs = reel_job.render_preset, resolve_outputs(reel_job.output_formats)
+    webhook = runpod_webhook_url(reel_job.id)
+    reel_job.runpod_job_id, reel_job.runpod_endpoint = submit_video_with_runpod(
+        image_path=image_path,
+        audio_path=audio_path,
+        webhook=webhook,
+        render=render_options(preset),
+        features_path=features_path,
+        outputs=outputs
+    )
+    reel_job.save()
+    if webhook:
+        track_runpod_video_progress(reel_job)
+    else:
+        track_runpod_video_job(reel_job)
+
+
+def _video_sinks(reel_job: ReelJob, video_path: Path) -> dict[str, str]:
+    """Sinks for the video of the current pass and, for the final one, its output formats."""
+    sinks = {'video_base64': str(video_path)}
+    if not reel_job.preview_pending:
+        sinks.update(output_sinks(resolve_outputs(reel_job.output_formats), str(video_path)))
+    return sinks
+
+
+def track_runpod_video_job(reel_job: ReelJob) -> None:
+    """Hand a submitted ReelJob to the shared poller."""
+    get_runpod_poller().track(
+        key=str(reel_job.id),
+        remote_job_id=reel_job.runpod_job_id,
+        sinks=_video_sinks(reel_job, _video_path(reel_job.id, reel_job.preview_pending)),
+        on_done=partial(complete_runpod_video_job, reel_job.id, reel_job.runpod_job_id),
+        endpoint=reel_job.runpod_endpoint,
+        on_progress=_progress_callback(reel_job)
+    )
+
+
+def track_runpod_video_progress(reel_job: ReelJob) -> None:
+    """Follow the progress of a job whose result arrives by webhook."""
+    get_runpod_poller().track(
+        key=str(reel_job.id),
+        remote_job_id=reel_job.runpod_job_id,
+        sinks={},
+        on_done=None,
+        endpoint=reel_job.runpod_endpoint,
+        on_progress=_progress_callback(reel_job)
+    )
+
+
+def render_preview(reel_job: ReelJob, image_path: str, audio_path: str, features_path: str | None = None) -> None:
+    """
+    Render the quick draft of a reel (sync mode) and publish it as
+    preview_video_file. A failed preview is logged and the final render
+    goes ahead regardless.
+    """
+    result = generate_video_with_runpod(
+        image_path=image_path,
+        audio_path=audio_path,
+        video_output_path=str(_video_path(reel_job.id, preview=True)),
+        render=render_options(settings.PREVIEW_RENDER_PRESET),
+        on_progress=partial(_record_preview_progress, reel_job.id),
+        features_path=features_path
+    )
+    record_metrics(reel_job, result.get('metrics'), 'preview_')
+    if result.get('error') or not result.get('video_path'):
+        logger.warning("Preview render of reel %s failed: %s", reel_job.id, result.get('error'))
+        return
+    _publish_preview(reel_job)
+
+
+def _publish_preview(reel_job: ReelJob) -> bool:
+    """Attach the rendered preview; False if the reel is no longer processing."""
+    reel_job.preview_video_file.name = f'reels/{reel_job.id}/preview.mp4'
+    reel_job.progress_stage = 'preview_ready'
+    return bool(ReelJob.objects.filter(pk=reel_job.id, status='processing').update(
+        preview_video_file=reel_job.preview_video_file.name,
+        progress_stage=reel_job.progress_stage
+    ))
+
+
+def is_rejected(reel_job_id) -> bool:
+    return ReelJob.objects.filter(pk=reel_job_id, status='rejected').exists()
+
+
+def reject_video_job(reel_job_id) -> bool:
+    """
+    Reject a reel that is still rendering, typically after reviewing its
+    preview. The running Runpod job is cancelled (best effort) and no
+    further pass is started; a sync render in flight is discarded when it
+    returns.
+    
+    Returns:
+        False if the reel is not processing
+    """
+    rejected = ReelJob.objects.filter(pk=reel_job_id, status='processing').update(
+        status='rejected',
+        progress_stage='rejected',
+        preview_pending=False
+    )
+    if not rejected:
+        return False
+    
+    get_runpod_poller().untrack(str(reel_job_id))
+    remote = ReelJob.objects.filter(pk=reel_job_id).values('runpod_job_id', 'runpod_endpoint').first()
+    if remote and remote['runpod_job_id']:
+        try:
+            get_runpod_client(remote['runpod_endpoint']).cancel(remote['runpod_job_id'])
+        except RunpodClientError as e:
+            logger.warning("Could not cancel Runpod job %s: %s", remote['runpod_job_id'], e)
+    return True
+
+
+def record_video_progress(reel_job_id, event: dict) -> None:
+    """
+    Store a progress event from runpod_handler ({"stage", "percent"}).
+    A single UPDATE, and only while the job is still processing, so a late
+    event cannot overwrite a finished job.
+    """
+    try:
+        percent = min(max(int(event.get('percent') or 0), 0), 100)
+    except (TypeError, ValueError):
+        return
+    ReelJob.objects.filter(pk=reel_job_id, status='processing').update(
+        progress_percent=percent,
+        progress_stage=str(event.get('stage') or '')[:50]
+    )
+
+
+def _render_runpod_segment(render: dict, metrics: list, image_path: str, audio_path: str, video_path: str) -> None:
+    """Render one audio segment on Runpod (renderer for render_segmented), collecting its metrics."""
+    result = generate_video_with_runpod(
+        image_path=image_path,
+        audio_path=audio_path,
+        video_output_path=video_path,
+        render=render,
+        features_path=prepare_audio_input(audio_path, Path(audio_path).parent)
+    )
+    metrics.extend(result.get('metrics') or [])
+    if result.get('error'):
+        raise RunpodClientError(result['error'])
+    if not result.get('video_path'):
+        raise RunpodClientError("Runpod returned no video for a segment")
+
+
+def _record_preview_progress(reel_job_id, event: dict) -> None:
+    record_video_progress(reel_job_id, {**event, 'stage': f"preview_{event.get('stage') or ''}"})
+
+
+def _record_segment_progress(reel_job_id, done: int, total: int) -> None:
+    record_video_progress(reel_job_id, {
+        'stage': f'segments {done}/{total}',
+        'percent': 95 * done // total
+    })
+
+
+def resume_runpod_video_jobs() -> None:
+    """
+    Re-attach the poller to jobs submitted before this process started.
+    Webhook jobs are included in case a delivery was missed while the
+    server was down. Runs once per process; later calls return immediately.
+    """
+    global _resumed
+    if _resumed:
+        return
+    with _resume_lock:
+        if _resumed:
+            return
+        _resumed = True
+        pending = ReelJob.objects.filter(status='processing', runpod_job_id__isnull=False)
+        poller = get_runpod_poller()
+        for reel_job in pending:
+            if not poller.is_tracking(str(reel_job.id)):
+                track_runpod_video_job(reel_job)
+
+
+def complete_runpod_video_job(reel_job_id, remote_job_id: str, result: dict) -> None:
+    """
+    Apply the final Runpod status document to a ReelJob.
+    Called by the poller; ignored if the job was deleted, resubmitted or
+    rejected. A finished preview pass queues the final render from a
+    background thread, so the poller is not held up by the upload.
+    """
+    try:
+        reel_job = ReelJob.objects.get(pk=reel_job_id)
+    except ReelJob.DoesNotExist:
+        return
+    
+    if reel_job.runpod_job_id != remote_job_id or reel_job.status == 'rejected':
+        return
+    
+    output = result.get('output')
+    output = output if isinstance(output, dict) else {}
+    error = result.get('error') or output.get('error')
+    succeeded = result.get('status') == 'COMPLETED' and not error and output.get('video_path')
+    record_metrics(reel_job, output.get('metrics'), 'preview_' if reel_job.preview_pending else '')
+    
+    if reel_job.preview_pending:
+        thread = threading.Thread(
+            target=_run_preview_completion,
+            args=(reel_job, succeeded, error),
+            name=f'preview-{reel_job.id}',
+            daemon=True
+        )
+        thread.start()
+        return
+    
+    if succeeded:
+        reel_job.video_file.name = f'reels/{reel_job.id}/video.mp4'
+        record_artifacts(reel_job, resolve_outputs(reel_job.output_formats), output)
+        reel_job.status = 'done'
+        reel_job.progress_percent = 100
+        reel_job.progress_stage = 'done'
+        reel_job.error_message = None
+    else:
+        if not error:
+            if result.get('status') == 'COMPLETED':
+                error = f"Runpod job {remote_job_id} returned no video"
+            else:
+                error = f"Runpod job {remote_job_id} ended with status {result.get('status')}"
+        reel_job.status = 'error'
+        reel_job.error_message = str(error)
+    
+    reel_job.save()
+
+
+def _run_preview_completion(reel_job: ReelJob, succeeded: bool, error) -> None:
+    try:
+        _complete_runpod_preview(reel_job, succeeded, error)
+    except Exception:
+        logger.exception("Could not complete the preview of reel %s", reel_job.id)
+    finally:
+        close_old_connections()
+
+
+def _complete_runpod_preview(reel_job: ReelJob, succeeded: bool, error) -> None:
+    """Publish a finished preview pass and queue the final render."""
+    reel_job.preview_pending = False
+    if not succeeded:
+        logger.warning("Preview render of reel %s failed: %s", reel_job.id, error)
+    elif not _publish_preview(reel_job):
+        return  # Rejected meanwhile
+    
+    try:
+        inputs_dir = settings.MEDIA_ROOT / 'reels' / str(reel_job.id) / 'render_inputs'
+        audio_path = str(render_audio_path(reel_job))
+        submit_runpod_video_job(
+            reel_job,
+            prepare_image_input(reel_job.image.path, inputs_dir),
+            audio_path,
+            prepare_audio_input(audio_path, inputs_dir)
+        )
+    except Exception as e:
+        reel_job.status = 'error'
+        reel_job.error_message = f"Final render could not be queued: {str(e)}"
+        reel_job.save()
+
+
+def receive_runpod_video_webhook(reel_job_id, chunks) -> dict:
+    """
+    Finish a ReelJob from a Runpod webhook delivery.
+    The video is streamed to a temporary file and only moved into place if
+    the delivery is for the job's current Runpod job, so a late callback for
+    a superseded render cannot overwrite the new video.
+    
+    Args:
+        reel_job_id: The ReelJob the webhook URL was signed for
+        chunks: Iterable of raw request body chunks
+    
+    Returns:
+        The parsed status document
+    
+    Raises:
+        RunpodClientError: If the body is not a valid status document
+    """
+    reel_job = ReelJob.objects.filter(pk=reel_job_id).first() or ReelJob(pk=reel_job_id)
+    video_path = _video_path(reel_job_id, reel_job.preview_pending)
+    video_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = video_path.with_name(f'video.webhook-{uuid.uuid4().hex}.mp4')
+    sinks = _video_sinks(reel_job, temp_path)
+    final_paths = _video_sinks(reel_job, video_path)
+    
+    try:
+        result = get_runpod_client(reel_job.runpod_endpoint).ingest(chunks, sinks)
+        remote_job_id = result.get('id')
+        if not ReelJob.objects.filter(pk=reel_job_id, runpod_job_id=remote_job_id).exists():
+            return result
+        
+        get_runpod_poller().untrack(str(reel_job_id))
+        output = result.get('output')
+        if isinstance(output, dict):
+            for field, path in sinks.items():
+                key = field.removesuffix('_base64') + '_path'
+                if output.get(key):
+                    os.replace(path, final_paths[field])
+                    output[key] = final_paths[field]
+        complete_runpod_video_job(reel_job_id, remote_job_id, result)
+        return result
+    finally:
+        for path in sinks.values():
+            Path(path).unlink(missing_ok=True)
@@ -11,9 +11,21 @@ from .serializers import (
     ReelJobCreateSerializer
 )
 from .services.script_rewrite_service import rewrite_script, ScriptRewriteError
-from .services.video_generation_runpod import generate_video_with_runpod_service
+from .services.video_generation_runpod import (
+    generate_video_with_runpod_service,
+    resume_runpod_video_jobs,
+    receive_runpod_video_webhook,
+    reject_video_job
+)
+from .services.runpod_client import RunpodClientError, get_runpod_router
+from .services.resilience import CircuitOpenError, dependency_snapshot
+from .services.runpod_webhook import verify_webhook_signature
+from .services.runpod_prewarm import get_runpod_prewarmer
+from .services.render_presets import RENDER_PRESETS
+from .services.output_formats import OUTPUT_FORMATS
 from .services.async_processor import process_video_async
 from .services.audio_generation import generate_audio_for_approved_script
+from .services.media_stream import DECODE_CHUNK_SIZE
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -23,6 +35,16 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+def circuit_open_response(error: CircuitOpenError) -> Response:
+    """503 telling the client when the unavailable dependency may be back."""
+    response = Response(
+        {'error': str(error), 'retry_after': round(error.retry_after)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(max(1, round(error.retry_after)))
+    return response
+
+
 class APIInfoView(APIView):
     """API information endpoint."""
     
@@ -37,9 +59,12 @@ class APIInfoView(APIView):
                 'regenerate_script': 'POST /api/reels/<id>/regenerate-script/',
                 'generate_audio': 'POST /api/reels/<id>/generate-audio/',
                 'generate_video': 'POST /api/reels/<id>/generate-video/',
+                'reject_reel': 'POST /api/reels/<id>/reject/',
                 'list_reels': 'GET /api/reels/',
                 'get_reel': 'GET /api/reels/<id>/',
+                'get_progress': 'GET /api/reels/<id>/progress/',
                 'delete_reel': 'DELETE /api/reels/<id>/',
+                'health': 'GET /api/health/',
             },
             'workflow': {
                 'step1': 'POST /api/reels/ - Create reel with image and script',
@@ -51,6 +76,26 @@ class APIInfoView(APIView):
         })
 
 
+class HealthView(APIView):
+    """Circuit breaker state, retry counters and Runpod endpoint routing."""
+    
+    def get(self, request):
+        dependencies = dependency_snapshot()
+        try:
+            endpoints = get_runpod_router().snapshot()
+        except RunpodClientError:
+            endpoints = []  # Runpod not configured
+        
+        degraded = any(d['state'] != 'closed' for d in dependencies.values()) or any(
+            e['ejected'] for e in endpoints
+        )
+        return Response({
+            'status': 'degraded' if degraded else 'ok',
+            'dependencies': dependencies,
+            'runpod_endpoints': endpoints,
+        })
+
+
 class ReelListView(APIView):
     """List and create reels."""
     
@@ -61,7 +106,7 @@ class ReelListView(APIView):
         List all reels with pagination and optional filtering.
         
         Query parameters:
-        - status: Filter by status (pending, script_pending_approval, processing, done, error)
+        - status: Filter by status (pending, script_pending_approval, processing, done, error, rejected)
         - page: Page number (default: 1)
         - page_size: Items per page (default: 20)
         """
@@ -95,6 +140,8 @@ class ReelListView(APIView):
         
         Optional fields:
         - tone: neutral|friendly|formal|energetic|dramatic (default: neutral)
+        - render_preset: draft|standard|high (default: DEFAULT_RENDER_PRESET)
+        - output_formats: list of reel|reel_720|feed|landscape (default: DEFAULT_OUTPUT_FORMATS)
         - use_rewrite: true|false (default: true)
         - max_seconds: integer (optional)
         """
@@ -112,6 +159,8 @@ class ReelListView(APIView):
         reel_job = ReelJob.objects.create(
             original_script=validated_data['script'],
             tone=validated_data.get('tone', 'neutral'),
+            render_preset=validated_data.get('render_preset', settings.DEFAULT_RENDER_PRESET),
+            output_formats=validated_data.get('output_formats', settings.DEFAULT_OUTPUT_FORMATS),
             image=validated_data['image'],
         )
         
@@ -127,10 +176,15 @@ class ReelListView(APIView):
                 reel_job.final_script = rewritten_script
                 reel_job.status = 'script_pending_approval'
                 reel_job.save()
+                get_runpod_prewarmer().notify()
             except ScriptRewriteError as e:
                 reel_job.status = 'error'
                 reel_job.error_message = str(e)
                 reel_job.save()
+            except CircuitOpenError as e:
+                # Stays pending; call rewrite-script again later
+                reel_job.error_message = str(e)
+                reel_job.save()
         else:
             # No rewrite needed, use original script
             reel_job.final_script = reel_job.original_script
@@ -160,6 +214,9 @@ class ReelDetailView(APIView):
         Get detailed information about a specific reel.
         """
         reel_job = get_object_or_404(ReelJob, pk=pk)
+        if reel_job.status == 'processing' and reel_job.runpod_job_id:
+            # Pick up jobs submitted before a restart
+            resume_runpod_video_jobs()
         serializer = ReelJobSerializer(reel_job)
         return Response(serializer.data)
     
@@ -175,6 +232,24 @@ class ReelDetailView(APIView):
         )
 
 
+class ReelProgressView(APIView):
+    """Lightweight status and render progress of a reel, for frequent polling."""
+    
+    def get(self, request, pk):
+        """
+        Get status, progress_percent and progress_stage of a reel.
+        Reads only those columns and builds no URLs.
+        """
+        progress = get_object_or_404(
+            ReelJob.objects.values('id', 'status', 'progress_percent', 'progress_stage', 'runpod_job_id'),
+            pk=pk
+        )
+        if progress.pop('runpod_job_id') and progress['status'] == 'processing':
+            # Pick up jobs submitted before a restart
+            resume_runpod_video_jobs()
+        return Response(progress)
+
+
 class RewriteScriptView(APIView):
     """Rewrite script for a reel."""
     
@@ -204,6 +279,7 @@ class RewriteScriptView(APIView):
             reel_job.status = 'script_pending_approval'
             reel_job.script_approved = False
             reel_job.save()
+            get_runpod_prewarmer().notify()  # A render is likely soon
             
             serializer = ReelJobSerializer(reel_job)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -213,6 +289,8 @@ class RewriteScriptView(APIView):
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        except CircuitOpenError as e:
+            return circuit_open_response(e)
 
 
 class ApproveScriptView(APIView):
@@ -268,6 +346,18 @@ class ApproveScriptView(APIView):
             try:
                 generate_video_with_runpod_service(reel_job)
                 serializer = ReelJobSerializer(reel_job)
+                if reel_job.status == 'processing':
+                    # RUNPOD_MODE=async: submitted, the poller will finish it
+                    return Response({
+                        **serializer.data,
+                        'message': 'Video generation submitted. Poll /api/reels/<id>/ for status.'
+                    }, status=status.HTTP_202_ACCEPTED)
+                if reel_job.status == 'script_approved':
+                    # A dependency's circuit is open: the job was re-queued
+                    return Response({
+                        **serializer.data,
+                        'message': f'Video generation re-queued: {reel_job.error_message}'
+                    }, status=status.HTTP_202_ACCEPTED)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             except Exception as e:
                 reel_job.refresh_from_db()
@@ -310,6 +400,7 @@ class RegenerateScriptView(APIView):
             reel_job.status = 'script_pending_approval'
             reel_job.script_approved = False
             reel_job.save()
+            get_runpod_prewarmer().notify()  # A render is likely soon
             
             serializer = ReelJobSerializer(reel_job)
             return Response({
@@ -322,6 +413,8 @@ class RegenerateScriptView(APIView):
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        except CircuitOpenError as e:
+            return circuit_open_response(e)
 
 
 class GenerateAudioView(APIView):
@@ -351,6 +444,8 @@ class GenerateAudioView(APIView):
                 **serializer.data,
                 'message': 'Audio generated successfully. You can preview it before generating video.'
             }, status=status.HTTP_200_OK)
+        except CircuitOpenError as e:
+            return circuit_open_response(e)
         except Exception as e:
             reel_job.refresh_from_db()
             serializer = ReelJobSerializer(reel_job)
@@ -373,6 +468,8 @@ class GenerateVideoView(APIView):
         
         Optional body parameters:
         - async: true|false (default: false)
+        - render_preset: draft|standard|high (default: the reel's preset)
+        - output_formats: list of reel|reel_720|feed|landscape (default: the reel's formats)
         """
         reel_job = get_object_or_404(ReelJob, pk=pk)
         
@@ -382,6 +479,28 @@ class GenerateVideoView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        render_preset = request.data.get('render_preset')
+        if render_preset:
+            if render_preset not in RENDER_PRESETS:
+                return Response(
+                    {'error': f"render_preset must be one of: {', '.join(RENDER_PRESETS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            reel_job.render_preset = render_preset
+            reel_job.save()
+        
+        output_formats = request.data.get('output_formats')
+        if output_formats is not None:
+            if isinstance(output_formats, str):
+                output_formats = [name.strip() for name in output_formats.split(',') if name.strip()]
+            if not isinstance(output_formats, list) or any(name not in OUTPUT_FORMATS for name in output_formats):
+                return Response(
+                    {'error': f"output_formats must be a list of: {', '.join(OUTPUT_FORMATS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            reel_job.output_formats = output_formats
+            reel_job.save()
+        
         # Generate audio if not already generated
         if not reel_job.audio_file:
             try:
@@ -409,6 +528,18 @@ class GenerateVideoView(APIView):
             try:
                 generate_video_with_runpod_service(reel_job)
                 serializer = ReelJobSerializer(reel_job)
+                if reel_job.status == 'processing':
+                    # RUNPOD_MODE=async: submitted, the poller will finish it
+                    return Response({
+                        **serializer.data,
+                        'message': 'Video generation submitted. Poll /api/reels/<id>/ for status.'
+                    }, status=status.HTTP_202_ACCEPTED)
+                if reel_job.status == 'script_approved':
+                    # A dependency's circuit is open: the job was re-queued
+                    return Response({
+                        **serializer.data,
+                        'message': f'Video generation re-queued: {reel_job.error_message}'
+                    }, status=status.HTTP_202_ACCEPTED)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             except Exception as e:
                 reel_job.refresh_from_db()
@@ -420,3 +551,59 @@ class GenerateVideoView(APIView):
                     },
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
+
+
+class RejectReelView(APIView):
+    """Reject a reel while it renders, e.g. after reviewing its preview."""
+    
+    def post(self, request, pk):
+        """
+        Stop a processing reel: the running render is cancelled and no
+        full-quality pass is started.
+        """
+        reel_job = get_object_or_404(ReelJob, pk=pk)
+        if not reject_video_job(reel_job.id):
+            return Response(
+                {'error': f'Only processing reels can be rejected (status: {reel_job.status})'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        reel_job.refresh_from_db()
+        serializer = ReelJobSerializer(reel_job)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class RunpodWebhookView(APIView):
+    """Completion callback for Runpod video jobs."""
+    
+    # The signed URL is the credential
+    authentication_classes = []
+    permission_classes = []
+    
+    def post(self, request, pk, signature):
+        """
+        Receive the final status document of a Runpod job.
+        The body is stream-parsed so the video never sits in memory.
+        """
+        if not verify_webhook_signature(pk, signature):
+            return Response(
+                {'error': 'Invalid webhook signature'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        get_object_or_404(ReelJob, pk=pk)
+        
+        stream = request.stream
+        if stream is None:
+            return Response(
+                {'error': 'Empty webhook body'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            receive_runpod_video_webhook(pk, iter(lambda: stream.read(DECODE_CHUNK_SIZE), b''))
+        except RunpodClientError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({'received': True}, status=status.HTTP_200_OK)
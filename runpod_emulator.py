@@ -0,0 +1,442 @@
+"""
+Local emulator of a Runpod Serverless endpoint.
+Serves /run, /runsync, /status/<id>, /stream/<id>, /cancel/<id> and /health
+with the same response shape as Runpod (id, status, delayTime, executionTime,
+output); like a generator handler started with return_aggregate_stream, a
+job's output is the list of items it yielded (progress events, then the
+result), and /stream/<id> hands out the items not fetched yet. It also
+POSTs the final status to a job's "webhook" URL if one was given, and
+models max workers, queueing delay, cold starts, execution time
+distributions and worker failures. Jobs run through either a fake renderer
+or the real runpod_handler.handler.
+
+NO Django - run it next to the app and point RUNPOD_ENDPOINT_URL at it:
+    python runpod_emulator.py --port 8001 --max-workers 3 --cold-start 10 \
+        --execution lognormal:2.0,0.4 --failure-rate 0.02
+    RUNPOD_ENDPOINT_URL=http://127.0.0.1:8001/runsync
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+# Statuses as reported by Runpod
+IN_QUEUE = 'IN_QUEUE'
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+CANCELLED = 'CANCELLED'
+FINAL_STATUSES = {COMPLETED, FAILED, CANCELLED}
+
+# Progress events the fake renderer yields per job
+FAKE_PROGRESS_STEPS = 10
+
+# Webhook deliveries are retried on failure (non-2xx or unreachable)
+WEBHOOK_ATTEMPTS = 3
+WEBHOOK_RETRY_DELAY = 1.0
+
+
+@dataclass
+class EmulatorConfig:
+    """Behaviour of the emulated endpoint. Times are in seconds."""
+    max_workers: int = 1
+    cold_start: float = 0.0  # Added to the first job a cold worker picks up
+    idle_timeout: float = 60.0  # Idle time after which a worker is cold again
+    queue_delay: float = 0.0  # Scheduler overhead before a job can start
+    execution: str = 'fixed:1'  # See parse_distribution()
+    failure_rate: float = 0.0  # Probability that a job fails
+    sync_wait: float = 90.0  # /runsync returns IN_PROGRESS after this long
+    handler: str = 'fake'  # fake | runpod_handler
+    video_kb: int = 512  # Size of the fake renderer's video
+    seed: int | None = None
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse an execution time distribution:
+    fixed:S, uniform:LOW,HIGH, normal:MEAN,SD or lognormal:MEDIAN,SIGMA.
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal' and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal' and len(values) == 2:
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0.0, sigma)
+    raise ValueError(f"Invalid execution time distribution: {spec}")
+
+
+@dataclass
+class EmulatedJob:
+    id: str
+    input: dict
+    webhook: str | None = None
+    status: str = IN_QUEUE
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+    finished_at: float | None = None
+    output: object = None
+    error: str | None = None
+    stream: list = field(default_factory=list)  # Items yielded so far
+    streamed: int = 0  # Items already returned by /stream
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+class RunpodEmulator:
+    """Queue plus a fixed set of worker threads that may be warm or cold."""
+    
+    def __init__(self, config: EmulatorConfig):
+        self.config = config
+        self._sample_execution = parse_distribution(config.execution)
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self._queue: queue.Queue[EmulatedJob] = queue.Queue()
+        self._jobs: dict[str, EmulatedJob] = {}
+        self._lock = threading.Lock()
+        self._workers_busy = 0
+        self._cold_starts = 0
+        self._fake_video = None
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f'emulated-worker-{i}', daemon=True)
+            for i in range(config.max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(self, input_data: dict, webhook: str | None = None) -> EmulatedJob:
+        job = EmulatedJob(id=str(uuid.uuid4()), input=input_data, webhook=webhook)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+    
+    def get(self, job_id: str) -> EmulatedJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def jobs(self) -> list[EmulatedJob]:
+        """Snapshot of every job submitted so far."""
+        with self._lock:
+            return list(self._jobs.values())
+    
+    def cancel(self, job_id: str) -> EmulatedJob | None:
+        job = self.get(job_id)
+        if job and job.status == IN_QUEUE:
+            self._finish(job, CANCELLED)
+        return job
+    
+    def status_document(self, job: EmulatedJob) -> dict:
+        """Job status in Runpod's response format."""
+        document = {"id": job.id, "status": job.status}
+        if job.started_at is not None:
+            document["delayTime"] = int((job.started_at - job.submitted_at) * 1000)
+        if job.finished_at is not None and job.started_at is not None:
+            document["executionTime"] = int((job.finished_at - job.started_at) * 1000)
+        if job.status == COMPLETED:
+            document["output"] = job.output
+        if job.error:
+            document["error"] = job.error
+        return document
+    
+    def stream_document(self, job: EmulatedJob) -> dict:
+        """Items yielded since the last call, in Runpod's /stream format."""
+        with self._lock:
+            items = job.stream[job.streamed:]
+            job.streamed += len(items)
+        return {"status": job.status, "stream": [{"output": item} for item in items]}
+    
+    def health(self) -> dict:
+        """Counts in the shape of Runpod's /health endpoint."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            busy = self._workers_busy
+            cold_starts = self._cold_starts
+        counts = {status: 0 for status in (COMPLETED, FAILED, IN_PROGRESS, IN_QUEUE)}
+        for job in jobs:
+            if job.status in counts:
+                counts[job.status] += 1
+        return {
+            "jobs": {
+                "completed": counts[COMPLETED],
+                "failed": counts[FAILED],
+                "inProgress": counts[IN_PROGRESS],
+                "inQueue": counts[IN_QUEUE],
+                "retried": 0,
+            },
+            "workers": {
+                "idle": self.config.max_workers - busy,
+                "running": busy,
+                "coldStarts": cold_starts,
+            },
+        }
+    
+    def _worker_loop(self) -> None:
+        last_active = None
+        while True:
+            job = self._queue.get()
+            if job.status != IN_QUEUE:
+                continue
+            
+            wait = job.submitted_at + self.config.queue_delay - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            
+            with self._lock:
+                self._workers_busy += 1
+            try:
+                cold = last_active is None or time.monotonic() - last_active > self.config.idle_timeout
+                if cold and self.config.cold_start > 0:
+                    with self._lock:
+                        self._cold_starts += 1
+                    time.sleep(self.config.cold_start)
+                if job.status != IN_QUEUE:  # Cancelled while waiting
+                    continue
+                
+                # Runpod counts cold start as delay, not execution
+                job.started_at = time.monotonic()
+                job.status = IN_PROGRESS
+                self._execute(job)
+            finally:
+                last_active = time.monotonic()
+                with self._lock:
+                    self._workers_busy -= 1
+    
+    def _execute(self, job: EmulatedJob) -> None:
+        with self._rng_lock:
+            duration = self._sample_execution(self._rng)
+            failed = self._rng.random() < self.config.failure_rate
+        
+        if job.input.get('warmup'):
+            # Warm-up pings only pay the cold start
+            self._finish(job, COMPLETED, output=[{"warm": True, "error": None}])
+            return
+        
+        try:
+            if self.config.handler == 'runpod_handler':
+                import runpod_handler
+                items = runpod_handler.handler({"id": job.id, "input": job.input})
+            else:
+                items = self._fake_handler(duration, job.input.get('outputs') or [])
+            for item in items:
+                with self._lock:
+                    job.stream.append(item)
+        except Exception as e:
+            self._finish(job, FAILED, error=str(e))
+            return
+        
+        result = job.stream[-1] if job.stream else None
+        if failed:
+            self._finish(job, FAILED, error="Emulated worker failure")
+        elif isinstance(result, dict) and result.get('error'):
+            # Runpod marks jobs whose handler returned an error as failed
+            self._finish(job, FAILED, error=str(result['error']))
+        else:
+            self._finish(job, COMPLETED, output=list(job.stream))
+    
+    def _fake_handler(self, duration: float, outputs: list):
+        """Yield progress like runpod_handler over duration, then a random video (and one per output)."""
+        steps = FAKE_PROGRESS_STEPS
+        for step in range(steps):
+            yield {"progress": {"stage": "face_render", "percent": 95 * step // steps}}
+            time.sleep(duration / steps)
+        if self._fake_video is None:
+            self._fake_video = base64.b64encode(os.urandom(self.config.video_kb * 1024)).decode('ascii')
+        result = {"video_base64": self._fake_video, "error": None}
+        for output in outputs:
+            result[f"{output['name']}_video_base64"] = self._fake_video
+        yield result
+    
+    def _finish(self, job: EmulatedJob, status: str, output=None, error: str | None = None) -> None:
+        job.output = output
+        job.error = error
+        job.finished_at = time.monotonic()
+        job.status = status
+        job.done.set()
+        if job.webhook:
+            threading.Thread(target=self._deliver_webhook, args=(job,), daemon=True).start()
+    
+    def _deliver_webhook(self, job: EmulatedJob) -> None:
+        """POST the final status document to the job's webhook, retrying like Runpod."""
+        body = json.dumps(self.status_document(job)).encode('utf-8')
+        for attempt in range(WEBHOOK_ATTEMPTS):
+            request = urllib.request.Request(
+                job.webhook,
+                data=body,
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=30):
+                    return
+            except OSError:
+                time.sleep(WEBHOOK_RETRY_DELAY)
+
+
+class EmulatorRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front-end. Routes on the path suffix, so both /runsync and
+    /v2/<endpoint-id>/runsync work. Advertises gzip for request bodies
+    (Accept-Encoding response header, RFC 7694) and gzips responses for
+    clients that accept it.
+    """
+    
+    protocol_version = 'HTTP/1.1'
+    
+    @property
+    def emulator(self) -> RunpodEmulator:
+        return self.server.emulator
+    
+    def do_GET(self):
+        parts = self.path.split('?')[0].rstrip('/').split('/')
+        if len(parts) >= 2 and parts[-2] == 'status':
+            job = self.emulator.get(parts[-1])
+            if job is None:
+                self._reply(404, {"error": "job not found"})
+            else:
+                self._reply(200, self.emulator.status_document(job))
+        elif len(parts) >= 2 and parts[-2] == 'stream':
+            job = self.emulator.get(parts[-1])
+            if job is None:
+                self._reply(404, {"error": "job not found"})
+            else:
+                self._reply(200, self.emulator.stream_document(job))
+        elif parts[-1] == 'health':
+            self._reply(200, self.emulator.health())
+        else:
+            self._reply(404, {"error": "not found"})
+    
+    def do_POST(self):
+        parts = self.path.split('?')[0].rstrip('/').split('/')
+        body = self._read_body()
+        if len(parts) >= 2 and parts[-2] == 'cancel':
+            job = self.emulator.cancel(parts[-1])
+            if job is None:
+                self._reply(404, {"error": "job not found"})
+            else:
+                self._reply(200, {"id": job.id, "status": job.status})
+            return
+        if parts[-1] not in ('run', 'runsync'):
+            self._reply(404, {"error": "not found"})
+            return
+        
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            self._reply(400, {"error": "invalid JSON body"})
+            return
+        
+        job = self.emulator.submit(payload.get('input') or {}, webhook=payload.get('webhook'))
+        if parts[-1] == 'run':
+            self._reply(200, {"id": job.id, "status": job.status})
+        else:
+            job.done.wait(self.emulator.config.sync_wait)
+            self._reply(200, self.emulator.status_document(job))
+    
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+            body = bytes(body)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        return body
+    
+    def _reply(self, code: int, document: dict) -> None:
+        body = json.dumps(document).encode('utf-8')
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) > 1024
+        if gzipped:
+            body = gzip.compress(body, compresslevel=1)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Accept-Encoding', 'gzip')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_emulator(config: EmulatorConfig, host: str = '127.0.0.1', port: int = 0, verbose: bool = False):
+    """
+    Start an emulator in background threads.
+    
+    Returns:
+        The running ThreadingHTTPServer; its base URL is
+        f"http://{host}:{server.server_address[1]}" and server.emulator
+        exposes the RunpodEmulator. Stop it with server.shutdown().
+    """
+    server = ThreadingHTTPServer((host, port), EmulatorRequestHandler)
+    server.daemon_threads = True
+    server.emulator = RunpodEmulator(config)
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, name='runpod-emulator', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Emulate a Runpod Serverless endpoint locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--max-workers', type=int, default=1)
+    parser.add_argument('--cold-start', type=float, default=0.0)
+    parser.add_argument('--idle-timeout', type=float, default=60.0)
+    parser.add_argument('--queue-delay', type=float, default=0.0)
+    parser.add_argument('--execution', default='fixed:1',
+                        help='fixed:S | uniform:LOW,HIGH | normal:MEAN,SD | lognormal:MEDIAN,SIGMA')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--sync-wait', type=float, default=90.0)
+    parser.add_argument('--handler', choices=['fake', 'runpod_handler'], default='fake')
+    parser.add_argument('--video-kb', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    
+    config = EmulatorConfig(
+        max_workers=args.max_workers,
+        cold_start=args.cold_start,
+        idle_timeout=args.idle_timeout,
+        queue_delay=args.queue_delay,
+        execution=args.execution,
+        failure_rate=args.failure_rate,
+        sync_wait=args.sync_wait,
+        handler=args.handler,
+        video_kb=args.video_kb,
+        seed=args.seed,
+    )
+    server = start_emulator(config, args.host, args.port, args.verbose)
+    print(f"Runpod emulator on http://{args.host}:{args.port} ({args.max_workers} workers)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
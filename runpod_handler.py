@@ -5,17 +5,740 @@ TTS audio is generated in Django, script rewriting is done in Django.
 NO Django - just pure GPU processing
 """
 import os
+import io
+import asyncio
+import logging
+import logging.handlers
+import re
+import time
+import codecs
+import queue
+import threading
 import base64
+import gzip
+import hashlib
+import shutil
 import tempfile
 import subprocess
+from collections import deque
+from contextlib import nullcontext, redirect_stderr
 from pathlib import Path
+from urllib.parse import urlparse
+import requests
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+try:
+    import resource
+except ImportError:  # Not on Windows; in-process stages then report no CPU/RSS
+    resource = None
+
+logger = logging.getLogger(__name__)
 
 # SadTalker path
 SADTALKER_ROOT = os.getenv('SADTALKER_ROOT', '/workspace/SadTalker')
 
+# "inprocess" keeps the models loaded between jobs, "subprocess" runs
+# inference.py per job (also used if the in-process engine fails to load)
+SADTALKER_ENGINE = os.getenv('SADTALKER_ENGINE', 'inprocess')
+# Start loading the in-process engine as soon as the worker starts
+SADTALKER_PRELOAD = os.getenv('SADTALKER_PRELOAD', 'true').lower() == 'true'
+
+# Micro-batching (in-process engine only): up to RENDER_BATCH_MAX concurrent
+# jobs on this worker that arrive within RENDER_BATCH_WINDOW_MS of each other
+# share one face-render pass. 1 renders every job on its own.
+RENDER_BATCH_MAX = int(os.getenv('RENDER_BATCH_MAX', '1'))
+RENDER_BATCH_WINDOW = int(os.getenv('RENDER_BATCH_WINDOW_MS', '250')) / 1000
+
+# Render settings used when a job has no "render" input (the "standard"
+# preset in reels/services/render_presets.py) and the values accepted in it
+RENDER_DEFAULTS = {'preprocess': 'full', 'size': 256, 'enhancer': 'gfpgan', 'still': False}
+PREPROCESS_MODES = ('crop', 'extcrop', 'resize', 'full', 'extfull')
+RENDER_SIZES = (256, 512)
+ENHANCERS = (None, 'gfpgan', 'RestoreFormer')
+
+# SadTalker progress bar description -> (stage, rough share of render time)
+RENDER_STAGES = [
+    ('landmark Det', 'preprocess', 4),
+    ('3DMM Extraction In Video', 'preprocess', 4),
+    ('mel', 'audio', 1),
+    ('audio2exp', 'audio', 3),
+    ('Face Renderer', 'face_render', 50),
+    ('seamlessClone', 'paste_back', 10),
+    ('Face Enhancer', 'enhance', 28),
+]
+# Rendering ends at this percentage; the rest is encoding and upload
+RENDER_PERCENT = 95
+# Progress events are yielded at most every this many percent (or on a new stage)
+PROGRESS_MIN_STEP = 2
+PROGRESS_TAIL_LINES = 40
+RENDER_TIMEOUT = 600
+
+_TQDM_RE = re.compile(r'(?P<desc>[^:|]+?):*\s*\d+%\|[^|]*\|\s*(?P<n>\d+)/(?P<total>\d+)')
+
+# Per-job render logs (<job id>.log), rotated at JOB_LOG_MAX_BYTES
+JOB_LOG_DIR = Path(os.getenv('JOB_LOG_DIR', '/tmp/render-logs'))
+JOB_LOG_MAX_BYTES = int(os.getenv('JOB_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+JOB_LOG_BACKUPS = int(os.getenv('JOB_LOG_BACKUPS', '2'))
+
+# Post-render variants ("outputs" input), all encoded by one ffmpeg process
+MAX_OUTPUTS = 6
+OUTPUT_FITS = ('crop', 'pad')
+OUTPUT_X264_PRESET = os.getenv('OUTPUT_X264_PRESET', 'veryfast')
+_OUTPUT_NAME_RE = re.compile(r'^[a-z0-9_]{1,20}$')
+_BITRATE_RE = re.compile(r'^\d+(\.\d+)?[kM]?$')
+
+# Container of the "audio" input ("audio_format"; see reels/services/audio_formats.py)
+AUDIO_FORMATS = ('mp3', 'aac', 'ogg', 'opus', 'flac', 'wav')
+
+# Content codings this worker accepts and can produce for media fields
+SUPPORTED_ENCODINGS = ['zstd', 'gzip'] if zstandard else ['gzip']
+
+# Only compress returned media when it saves at least this fraction
+MIN_COMPRESSION_SAVING = 0.05
+
+# Content-addressed artifact store (overrides the "artifact_store" input field)
+ARTIFACT_STORE_URL = os.getenv('ARTIFACT_STORE_URL', '')
+# Worker-local cache of fetched artifacts, keyed by SHA-256
+ARTIFACT_CACHE_DIR = Path(os.getenv('ARTIFACT_CACHE_DIR', '/tmp/artifact-cache'))
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv('ARTIFACT_CACHE_MAX_MB', '2048')) * 1024 * 1024
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+_http = requests.Session()
+
+# Set once this worker process has handled a warm-up request
+_warm = False
+
+# In-process SadTalker engine, loaded once per worker
+_engine = None
+_engine_failed = False
+_engine_lock = threading.Lock()
+_batcher = None
+
+
+def decode_media(data_base64: str, encoding: str | None) -> bytes:
+    """Decode a base64 media field, decompressing it if it was sent compressed."""
+    data = base64.b64decode(data_base64)
+    if not encoding:
+        return data
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'zstd' and zstandard:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise Exception(f"Unsupported media encoding: {encoding}")
+
+
+def encode_media(data: bytes, accept_encoding) -> tuple[str, str | None]:
+    """
+    Base64-encode returned media, compressing it with the first codec the
+    client accepts when that actually makes it smaller.
+    """
+    for encoding in accept_encoding or []:
+        if encoding not in SUPPORTED_ENCODINGS:
+            continue
+        if encoding == 'gzip':
+            compressed = gzip.compress(data, compresslevel=6)
+        else:
+            compressed = zstandard.ZstdCompressor(level=3).compress(data)
+        if len(compressed) <= len(data) * (1 - MIN_COMPRESSION_SAVING):
+            return base64.b64encode(compressed).decode('utf-8'), encoding
+        break
+    return base64.b64encode(data).decode('utf-8'), None
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _store_location(store_url: str, digest: str) -> str:
+    """URL or local path of a blob (layout matches reels.services.artifact_store)."""
+    if not _DIGEST_RE.match(digest or ''):
+        raise Exception(f"Invalid artifact digest: {digest!r}")
+    parsed = urlparse(store_url)
+    if parsed.scheme in ('http', 'https'):
+        return f"{store_url.rstrip('/')}/{digest}"
+    root = parsed.path if parsed.scheme == 'file' else store_url
+    return str(Path(root) / digest[:2] / digest)
+
+
+def _evict_artifact_cache() -> None:
+    """Drop least recently used cached artifacts beyond ARTIFACT_CACHE_MAX_BYTES."""
+    entries = [p for p in ARTIFACT_CACHE_DIR.iterdir() if _DIGEST_RE.match(p.name)]
+    entries.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    total = 0
+    for entry in entries:
+        total += entry.stat().st_size
+        if total > ARTIFACT_CACHE_MAX_BYTES:
+            entry.unlink(missing_ok=True)
+
+
+def fetch_artifact(store_url: str, ref: dict, output_path: Path) -> None:
+    """
+    Materialize a stored artifact at output_path.
+    Artifacts already in the worker cache cost no transfer at all.
+    """
+    digest = (ref or {}).get('sha256', '')
+    location = _store_location(store_url, digest)
+    cached = ARTIFACT_CACHE_DIR / digest
+    
+    if cached.exists():
+        os.utime(cached)  # Mark as recently used
+    else:
+        ARTIFACT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Unique per download: concurrent jobs may fetch the same artifact
+        fd, partial = tempfile.mkstemp(dir=ARTIFACT_CACHE_DIR, prefix=f'.{digest}.', suffix='.part')
+        partial = Path(partial)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if location.startswith(('http://', 'https://')):
+                    with _http.get(location, stream=True, timeout=300) as response:
+                        response.raise_for_status()
+                        for chunk in response.iter_content(chunk_size=1024 * 1024):
+                            f.write(chunk)
+                else:
+                    with open(location, 'rb') as src:
+                        shutil.copyfileobj(src, f, 1024 * 1024)
+            if _sha256_file(partial) != digest:
+                raise Exception(f"Artifact {digest} failed hash verification")
+            os.replace(partial, cached)
+        finally:
+            partial.unlink(missing_ok=True)
+        _evict_artifact_cache()
+    
+    try:
+        os.link(cached, output_path)
+    except OSError:
+        shutil.copyfile(cached, output_path)
+
+
+def put_artifact(store_url: str, path: Path) -> dict:
+    """Upload a file to the artifact store unless it is already there."""
+    digest = _sha256_file(path)
+    location = _store_location(store_url, digest)
+    
+    if location.startswith(('http://', 'https://')):
+        head = _http.head(location, timeout=60)
+        if head.status_code == 404:
+            with open(path, 'rb') as f:
+                _http.put(location, data=f, timeout=300).raise_for_status()
+        else:
+            head.raise_for_status()  # Present only on a 2xx
+    elif not Path(location).exists():
+        Path(location).parent.mkdir(parents=True, exist_ok=True)
+        fd, partial = tempfile.mkstemp(dir=Path(location).parent, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as dst, open(path, 'rb') as src:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(partial, location)
+        except Exception:
+            Path(partial).unlink(missing_ok=True)
+            raise
+    
+    return {"sha256": digest, "size": path.stat().st_size}
+
+
+def load_media_input(input_data: dict, name: str, store_url: str, output_path: Path) -> bool:
+    """
+    Write the "<name>" input to output_path, from either a store reference
+    ("<name>_ref") or inline base64 ("<name>"). Returns False if missing.
+    """
+    ref = input_data.get(f'{name}_ref')
+    if ref:
+        if not store_url:
+            raise Exception(f"{name}_ref given but no artifact store is configured")
+        fetch_artifact(store_url, ref, output_path)
+        return True
+    
+    data_base64 = input_data.get(name, '')
+    if not data_base64:
+        return False
+    with open(output_path, 'wb') as f:
+        f.write(decode_media(data_base64, input_data.get(f'{name}_encoding')))
+    return True
+
+
+def parse_render_options(render: dict | None) -> dict:
+    """Validate the "render" input and fill in defaults for missing settings."""
+    options = {**RENDER_DEFAULTS, **{k: v for k, v in (render or {}).items() if k in RENDER_DEFAULTS}}
+    if options['preprocess'] not in PREPROCESS_MODES:
+        raise Exception(f"Unsupported preprocess mode: {options['preprocess']}")
+    if options['size'] not in RENDER_SIZES:
+        raise Exception(f"Unsupported render size: {options['size']}")
+    if options['enhancer'] not in ENHANCERS:
+        raise Exception(f"Unsupported enhancer: {options['enhancer']}")
+    options['still'] = bool(options['still'])
+    return options
+
+
+def parse_outputs(outputs: list | None) -> list[dict]:
+    """Validate the "outputs" input (see reels/services/output_formats.py)."""
+    outputs = outputs or []
+    if len(outputs) > MAX_OUTPUTS:
+        raise Exception(f"At most {MAX_OUTPUTS} outputs per job")
+    parsed = []
+    for output in outputs:
+        name = str(output.get('name', ''))
+        if not _OUTPUT_NAME_RE.match(name) or name in ('video', 'audio'):
+            raise Exception(f"Invalid output name: {name!r}")
+        width, height = int(output.get('width', 0)), int(output.get('height', 0))
+        if not (16 <= width <= 3840 and 16 <= height <= 3840) or width % 2 or height % 2:
+            raise Exception(f"Invalid size for output {name}: {width}x{height}")
+        bitrate = str(output.get('video_bitrate', '4M'))
+        if not _BITRATE_RE.match(bitrate):
+            raise Exception(f"Invalid bitrate for output {name}: {bitrate}")
+        fit = output.get('fit', 'crop')
+        if fit not in OUTPUT_FITS:
+            raise Exception(f"Unsupported fit for output {name}: {fit}")
+        parsed.append({'name': name, 'width': width, 'height': height, 'video_bitrate': bitrate, 'fit': fit})
+    return parsed
+
+
+def parse_audio_format(audio_format: str | None) -> str:
+    """Validate the "audio_format" input; it names the audio file SadTalker decodes."""
+    audio_format = str(audio_format or 'mp3').lower()
+    if audio_format not in AUDIO_FORMATS:
+        raise Exception(f"Unsupported audio format: {audio_format}")
+    return audio_format
+
+
+def encode_outputs(
+    video_path: str,
+    outputs: list[dict],
+    output_dir: str,
+    job_log: logging.Logger | None = None,
+    metrics: list | None = None
+) -> dict[str, str]:
+    """
+    Encode every output variant of a rendered video in one ffmpeg run: the
+    video is decoded once and split into one scale/crop (or pad) chain per
+    output; the audio is copied. ffmpeg's output goes to job_log and its
+    usage to metrics.
+    
+    Returns:
+        Output name -> encoded file path
+    """
+    graph = [f"[0:v]split={len(outputs)}" + ''.join(f'[s{i}]' for i in range(len(outputs)))]
+    encodes = []
+    paths = {}
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    for i, output in enumerate(outputs):
+        width, height = output['width'], output['height']
+        if output['fit'] == 'pad':
+            chain = (
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"
+            )
+        else:
+            chain = f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}"
+        graph.append(f"[s{i}]{chain},setsar=1[v{i}]")
+        
+        bitrate = output['video_bitrate']
+        paths[output['name']] = str(Path(output_dir) / f"video_{output['name']}.mp4")
+        encodes += [
+            '-map', f'[v{i}]', '-map', '0:a?',
+            '-c:v', 'libx264', '-preset', OUTPUT_X264_PRESET, '-pix_fmt', 'yuv420p',
+            '-b:v', bitrate, '-maxrate', bitrate, '-bufsize', bitrate,
+            '-c:a', 'copy',
+            '-movflags', '+faststart',
+            paths[output['name']]
+        ]
+    
+    cmd = [
+        'ffmpeg', '-y', '-hide_banner', '-nostdin',
+        '-i', str(video_path),
+        '-filter_complex', ';'.join(graph),
+        *encodes
+    ]
+    returncode, timed_out, output_tail = run_logged(
+        cmd,
+        'encode_outputs',
+        job_log,
+        metrics if metrics is not None else []
+    )
+    if timed_out:
+        raise Exception("Encoding outputs timed out")
+    if returncode != 0:
+        raise Exception(f"Encoding outputs failed: {output_tail}")
+    return paths
+
+
+def attach_video(output: dict, name: str, path: str, input_data: dict, store_url: str) -> None:
+    """
+    Add a video to the handler output as "<name>_ref" when a store is in
+    use, otherwise as "<name>_base64" (compressed if the client accepts it).
+    """
+    if store_url:
+        output[f"{name}_ref"] = put_artifact(store_url, Path(path))
+        return
+    with open(path, 'rb') as f:
+        data_base64, encoding = encode_media(f.read(), input_data.get('accept_encoding'))
+    if encoding:
+        output[f"{name}_encoding"] = encoding
+    output[f"{name}_base64"] = data_base64
+
+
+def get_engine():
+    """
+    Return the in-process SadTalker engine, loading it on first use.
+    Returns None when the subprocess path is configured or the engine could
+    not be loaded (the failure is logged once and not retried).
+    """
+    global _engine, _engine_failed
+    if SADTALKER_ENGINE != 'inprocess':
+        return None
+    with _engine_lock:
+        if _engine is None and not _engine_failed:
+            try:
+                from sadtalker_engine import SadTalkerEngine, PreprocessCache
+                engine = SadTalkerEngine(SADTALKER_ROOT, preprocess_cache=PreprocessCache())
+                engine.load()
+                _engine = engine
+            except Exception:
+                _engine_failed = True
+                logger.exception("In-process SadTalker engine unavailable, using subprocess")
+        return _engine
+
+
+def get_batcher():
+    """Return the RenderBatcher for this worker, or None when batching is off."""
+    global _batcher
+    if RENDER_BATCH_MAX <= 1:
+        return None
+    engine = get_engine()
+    if engine is None:
+        return None
+    with _engine_lock:
+        if _batcher is None:
+            from sadtalker_engine import RenderBatcher
+            _batcher = RenderBatcher(engine.render_batch, RENDER_BATCH_WINDOW, RENDER_BATCH_MAX)
+        return _batcher
+
+
+def warmup() -> dict:
+    """
+    Prepare this worker for renders without producing a video.
+    Loads the in-process engine, or with the subprocess path reads the
+    SadTalker and GFPGAN checkpoints once, so the first real job on a fresh
+    worker does not wait for them to come off network storage.
+    """
+    global _warm
+    if not _warm:
+        sadtalker_root = Path(SADTALKER_ROOT)
+        if not (sadtalker_root / 'inference.py').exists():
+            raise Exception(f"SadTalker not found at {SADTALKER_ROOT}")
+        if get_engine() is None:
+            for weights_dir in (sadtalker_root / 'checkpoints', sadtalker_root / 'gfpgan' / 'weights'):
+                weight_files = [p for p in weights_dir.rglob('*') if p.is_file()] if weights_dir.exists() else []
+                for path in weight_files:
+                    with open(path, 'rb') as f:
+                        while f.read(8 * 1024 * 1024):
+                            pass
+        _warm = True
+    return {"warm": True, "error": None}
+
+
+def open_job_log(job_id: str) -> logging.Logger:
+    """
+    Logger writing to the job's rotating log file in JOB_LOG_DIR. Not
+    registered with logging.getLogger; close it with close_job_log.
+    """
+    JOB_LOG_DIR.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        JOB_LOG_DIR / f'{job_id}.log',
+        maxBytes=JOB_LOG_MAX_BYTES,
+        backupCount=JOB_LOG_BACKUPS,
+        encoding='utf-8'
+    )
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    job_log = logging.Logger(f'render.{job_id}')
+    job_log.addHandler(handler)
+    job_log.propagate = False
+    return job_log
+
+
+def close_job_log(job_log: logging.Logger) -> None:
+    for handler in list(job_log.handlers):
+        job_log.removeHandler(handler)
+        handler.close()
+
 
-def generate_video(image_path: str, audio_path: str, output_dir: str) -> str:
-    """Generate video using SadTalker."""
+class LineLog:
+    """
+    Writes raw process output to a job log line by line as it arrives.
+    Progress bars redraw themselves with carriage returns; only their last
+    state before a newline is logged. The last lines are kept in tail.
+    """
+    
+    def __init__(self, job_log: logging.Logger | None, stage: str):
+        self.job_log = job_log
+        self.stage = stage
+        self.tail = deque(maxlen=PROGRESS_TAIL_LINES)
+        self._buffer = ''
+    
+    def feed(self, text: str) -> None:
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self._write(line)
+    
+    def close(self) -> None:
+        if self._buffer:
+            self._write(self._buffer)
+            self._buffer = ''
+    
+    def _write(self, line: str) -> None:
+        line = line.rstrip('\r').rsplit('\r', 1)[-1].rstrip()
+        if line:
+            self.tail.append(line)
+            if self.job_log:
+                self.job_log.info('[%s] %s', self.stage, line)
+
+
+def stage_metrics(stage: str, started: float, exit_status: int | None = None, usage: dict | None = None) -> dict:
+    """One "metrics" entry: wall time since started (time.monotonic) plus CPU/RSS usage if known."""
+    return {
+        "stage": stage,
+        "wall_seconds": round(time.monotonic() - started, 3),
+        "user_cpu_seconds": None,
+        "system_cpu_seconds": None,
+        "max_rss_kb": None,
+        "exit_status": exit_status,
+        **(usage or {})
+    }
+
+
+def _usage(rusage, before=None) -> dict:
+    """CPU seconds (since before, if given) and peak RSS in kB (ru_maxrss on Linux)."""
+    return {
+        "user_cpu_seconds": round(rusage.ru_utime - (before.ru_utime if before else 0), 3),
+        "system_cpu_seconds": round(rusage.ru_stime - (before.ru_stime if before else 0), 3),
+        "max_rss_kb": rusage.ru_maxrss,
+    }
+
+
+def run_logged(
+    cmd: list[str],
+    stage: str,
+    job_log: logging.Logger | None,
+    metrics: list[dict],
+    cwd: str | None = None,
+    on_output=None
+) -> tuple[int, bool, str]:
+    """
+    Run a command, streaming its combined output to job_log (and on_output)
+    as it is produced; killed after RENDER_TIMEOUT. The process is reaped
+    with wait4 so its own CPU time and peak RSS are appended to metrics
+    along with its wall time and exit status.
+    
+    Returns:
+        (exit status, whether it timed out, last lines of output)
+    """
+    log = LineLog(job_log, stage)
+    if job_log:
+        job_log.info('[%s] $ %s', stage, ' '.join(cmd))
+    started = time.monotonic()
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    timed_out = threading.Event()
+    
+    def kill():
+        timed_out.set()
+        process.kill()
+    
+    timer = threading.Timer(RENDER_TIMEOUT, kill)
+    timer.start()
+    try:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while chunk := os.read(process.stdout.fileno(), 65536):
+            text = decoder.decode(chunk)
+            log.feed(text)
+            if on_output:
+                on_output(text)
+        text = decoder.decode(b'', final=True) + '\n'
+        log.feed(text)
+        log.close()
+        if on_output:
+            on_output(text)
+        if hasattr(os, 'wait4'):
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            usage = _usage(rusage)
+        else:
+            process.wait()
+            usage = None
+    finally:
+        timer.cancel()
+        process.stdout.close()
+    
+    metrics.append(stage_metrics(stage, started, process.returncode, usage))
+    if job_log:
+        job_log.info('[%s] %s', stage, metrics[-1])
+    return process.returncode, timed_out.is_set(), '\n'.join(log.tail)
+
+
+class RenderProgress:
+    """
+    Turns SadTalker's tqdm output into overall progress events.
+    
+    Every stage bar ("Face Renderer:  40%|...| 20/50") is mapped to a share
+    of the render (RENDER_STAGES) that applies to these render settings.
+    Events are queued when the stage changes or the overall percentage
+    moves by PROGRESS_MIN_STEP; None on the queue marks the end.
+    
+    It also carries the job's log (SadTalker's output is written to it
+    line by line) and collects the render's stage metrics.
+    """
+    
+    def __init__(self, render: dict, job_log: logging.Logger | None = None, metrics: list | None = None):
+        full = render['preprocess'] in ('full', 'extfull')
+        self.stages = [
+            (desc, stage, weight) for desc, stage, weight in RENDER_STAGES
+            if (stage != 'paste_back' or full) and (stage != 'enhance' or render['enhancer'])
+        ]
+        self.total_weight = sum(weight for _, _, weight in self.stages)
+        self.events: queue.Queue = queue.Queue()
+        self.stage = None
+        self.percent = 0
+        self.tail = deque(maxlen=PROGRESS_TAIL_LINES)  # Last output lines for error messages
+        self._buffer = ''
+        self._sent = (None, -PROGRESS_MIN_STEP)
+        self.job_log = job_log
+        self.metrics = metrics if metrics is not None else []
+    
+    def feed(self, text: str) -> None:
+        """Consume raw output; tqdm redraws its bar with carriage returns."""
+        self._buffer += text
+        *lines, self._buffer = re.split(r'[\r\n]', self._buffer)
+        for line in lines:
+            if line.strip():
+                self.tail.append(line)
+                self._parse(line)
+    
+    def report(self, stage: str, percent: int) -> None:
+        """Record progress outside SadTalker's own bars (e.g. uploading)."""
+        self.stage = stage
+        self.percent = max(self.percent, percent)
+        self._emit()
+    
+    def _parse(self, line: str) -> None:
+        match = _TQDM_RE.search(line)
+        if not match:
+            return
+        done = 0
+        for desc, stage, weight in self.stages:
+            if desc == match.group('desc').strip():
+                fraction = int(match.group('n')) / max(int(match.group('total')), 1)
+                percent = int(RENDER_PERCENT * (done + weight * fraction) / self.total_weight)
+                self.report(stage, percent)
+                return
+            done += weight
+    
+    def _emit(self) -> None:
+        last_stage, last_percent = self._sent
+        if self.stage != last_stage or self.percent - last_percent >= PROGRESS_MIN_STEP:
+            self._sent = (self.stage, self.percent)
+            self.events.put({"stage": self.stage, "percent": self.percent})
+    
+    def output_tail(self) -> str:
+        return '\n'.join(self.tail)
+
+
+class _ProgressStream(io.TextIOBase):
+    """File-like target for tqdm that feeds a RenderProgress and the job log."""
+    
+    def __init__(self, progress: RenderProgress):
+        self.progress = progress
+        self.log = LineLog(progress.job_log, 'render')
+    
+    def write(self, text: str) -> int:
+        self.progress.feed(text)
+        self.log.feed(text)
+        return len(text)
+
+
+def generate_video(
+    image_path: str,
+    audio_path: str,
+    output_dir: str,
+    render: dict | None = None,
+    progress: RenderProgress | None = None,
+    features_path: str | None = None
+) -> str:
+    """
+    Generate video using SadTalker, in-process when the engine is available.
+    render holds validated settings (see parse_render_options), None for
+    defaults; progress, if given, receives SadTalker's progress output.
+    features_path holds precomputed audio features; only the in-process
+    engine uses them, inference.py computes its own.
+    """
+    render = render or RENDER_DEFAULTS
+    engine = get_engine()
+    if engine is None:
+        return generate_video_subprocess(image_path, audio_path, output_dir, render, progress)
+    
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    batcher = get_batcher()
+    # Process-wide figures: with batching they include the jobs rendered alongside
+    started = time.monotonic()
+    rusage = resource.getrusage(resource.RUSAGE_SELF) if resource else None
+    stage = 'render_batched' if batcher else 'render'
+    try:
+        if batcher:
+            # Several jobs render at once, so per-job tqdm output is not available
+            from sadtalker_engine import RenderRequest
+            if progress:
+                progress.report('batched', 0)
+            future = batcher.submit(RenderRequest(
+                image_path, audio_path, output_dir,
+                preprocess=render['preprocess'],
+                enhancer=render['enhancer'],
+                size=render['size'],
+                still=render['still'],
+                features_path=features_path
+            ))
+            return future.result(timeout=RENDER_TIMEOUT)
+        
+        # tqdm writes to sys.stderr; without batching a worker renders one job at a time
+        stream = _ProgressStream(progress) if progress else None
+        with redirect_stderr(stream) if stream else nullcontext():
+            video_path = engine.render(
+                image_path, audio_path, output_dir,
+                preprocess=render['preprocess'],
+                enhancer=render['enhancer'],
+                size=render['size'],
+                still=render['still'],
+                features_path=features_path
+            )
+        if stream:
+            stream.log.close()
+        return video_path
+    except Exception as e:
+        raise Exception(f"SadTalker failed: {e}")
+    finally:
+        if progress:
+            usage = _usage(resource.getrusage(resource.RUSAGE_SELF), rusage) if rusage else None
+            progress.metrics.append(stage_metrics(stage, started, usage=usage))
+
+
+def generate_video_subprocess(
+    image_path: str,
+    audio_path: str,
+    output_dir: str,
+    render: dict | None = None,
+    progress: RenderProgress | None = None
+) -> str:
+    """
+    Generate video by running SadTalker's inference.py in a new process,
+    reading its output as it runs so progress can be reported.
+    """
+    render = render or RENDER_DEFAULTS
+    progress = progress or RenderProgress(render)
     sadtalker_root = Path(SADTALKER_ROOT)
     if not sadtalker_root.exists():
         raise Exception(f"SadTalker not found at {SADTALKER_ROOT}")
@@ -26,35 +749,76 @@ def generate_video(image_path: str, audio_path: str, output_dir: str) -> str:
     
     cmd = [
         'python',
+        '-u',  # Unbuffered, so progress arrives as it happens
         str(inference_script),
         '--driven_audio', str(audio_path),
         '--source_image', str(image_path),
         '--result_dir', str(output_dir),
-        '--enhancer', 'gfpgan',
-        '--preprocess', 'full',
+        '--preprocess', render['preprocess'],
+        '--size', str(render['size']),
     ]
+    if render['enhancer']:
+        cmd += ['--enhancer', render['enhancer']]
+    if render['still']:
+        cmd.append('--still')
     
-    try:
-        result = subprocess.run(
-            cmd,
-            cwd=str(sadtalker_root),
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=600
-        )
-        
-        # Find generated video
-        video_files = list(Path(output_dir).rglob('*.mp4'))
-        if not video_files:
-            raise Exception("No video file generated")
-        
-        video_file = max(video_files, key=lambda p: p.stat().st_mtime)
-        return str(video_file)
-    except subprocess.TimeoutExpired:
+    returncode, timed_out, _ = run_logged(
+        cmd,
+        'render',
+        progress.job_log,
+        progress.metrics,
+        cwd=str(sadtalker_root),
+        on_output=progress.feed
+    )
+    
+    if timed_out:
         raise Exception("Video generation timed out")
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"SadTalker failed: {e.stderr or e.stdout}")
+    if returncode != 0:
+        raise Exception(f"SadTalker failed: {progress.output_tail()}")
+    
+    # Find generated video
+    video_files = list(Path(output_dir).rglob('*.mp4'))
+    if not video_files:
+        raise Exception("No video file generated")
+    
+    video_file = max(video_files, key=lambda p: p.stat().st_mtime)
+    return str(video_file)
+
+
+def render_with_progress(
+    image_path: str,
+    audio_path: str,
+    output_dir: str,
+    render: dict,
+    features_path: str | None = None,
+    job_log: logging.Logger | None = None,
+    metrics: list | None = None
+):
+    """
+    Run generate_video in a thread, yielding {"progress": {...}} events
+    while it renders. The generator's return value is the video path.
+    SadTalker's output goes to job_log, the render's usage to metrics.
+    """
+    progress = RenderProgress(render, job_log, metrics)
+    outcome = {}
+    
+    def run():
+        try:
+            outcome['video_path'] = generate_video(image_path, audio_path, output_dir, render, progress, features_path)
+        except Exception as e:
+            outcome['error'] = e
+        finally:
+            progress.events.put(None)
+    
+    progress.report('starting', 0)
+    threading.Thread(target=run, name='render', daemon=True).start()
+    while (event := progress.events.get()) is not None:
+        yield {"progress": event}
+    
+    if 'error' in outcome:
+        raise outcome['error']
+    yield {"progress": {"stage": "uploading", "percent": RENDER_PERCENT}}
+    return outcome['video_path']
 
 
 def handler(event):
@@ -62,6 +826,11 @@ def handler(event):
     Runpod Serverless handler - Video Generation Only (SadTalker).
     TTS audio is generated in Django, this only handles video generation.
     
+    A generator: while rendering it yields progress events parsed from
+    SadTalker's stage progress bars, then yields the result last. Started
+    with return_aggregate_stream, so /status returns every yielded item as
+    a list and /stream/<id> returns the events as they happen.
+    
     SadTalker inputs:
     - image: Face image (base64)
     - audio: Audio file (base64) - already generated in Django
@@ -69,64 +838,154 @@ def handler(event):
     Expected input:
     {
         "image": "base64_encoded_image",
-        "audio": "base64_encoded_audio"  # Already generated in Django
+        "audio": "base64_encoded_audio",  # Already generated in Django
+        "image_encoding": "gzip",  # Optional, if image was compressed
+        "audio_encoding": "gzip",  # Optional, if audio was compressed
+        "audio_format": "mp3",  # Optional: mp3|aac|ogg|opus|flac|wav
+        "accept_encoding": ["gzip"],  # Optional, codings the client can decode
+        "artifact_store": "http://store",  # Optional, enables *_ref fields
+        "image_ref": {"sha256": "..."},  # Instead of "image", with a store
+        "audio_ref": {"sha256": "..."},  # Instead of "audio", with a store
+        "features": "base64_encoded_npz",  # Optional precomputed audio features
+        "features_ref": {"sha256": "..."},  # Instead of "features", with a store
+        "render": {  # Optional render preset settings (defaults: "standard")
+            "preset": "draft",
+            "preprocess": "crop",  # crop|extcrop|resize|full|extfull
+            "size": 256,  # 256|512
+            "enhancer": null,  # gfpgan|RestoreFormer|null
+            "still": true
+        },
+        "outputs": [  # Optional variants encoded after rendering
+            {"name": "feed", "width": 1080, "height": 1080, "video_bitrate": "3M", "fit": "crop"}
+        ]
     }
     
-    Returns:
+    Or {"warmup": true} to only load models (yields {"warm": true}).
+    
+    Yields:
+    {"progress": {"stage": "face_render", "percent": 42}}  # Zero or more
     {
-        "video_base64": "base64_encoded_video",
+        "accept_encoding": ["zstd", "gzip"],  # Codings this worker accepts
+        "video_encoding": "gzip",  # Only present if video_base64 is compressed
+        "video_base64": "base64_encoded_video",  # Or "video_ref" with a store
+        "feed_video_base64": "...",  # Per output, like video_base64
+        "metrics": [  # Per stage (render, encode_outputs), also on errors
+            {"stage": "render", "wall_seconds": 41.2, "user_cpu_seconds": 38.0,
+             "system_cpu_seconds": 3.1, "max_rss_kb": 5123456, "exit_status": 0}
+        ],
         "error": null
     }
+    
+    SadTalker's and ffmpeg's output is written to JOB_LOG_DIR/<job id>.log
+    as it is produced.
     """
+    job_log = None
+    metrics = []
     try:
         input_data = event.get('input', {})
+        if input_data.get('warmup'):
+            yield warmup()
+            return
         
-        # Parse inputs
-        image_base64 = input_data.get('image', '')
-        audio_base64 = input_data.get('audio', '')
-        
-        if not image_base64 or not audio_base64:
-            return {
-                "error": "Missing required fields: image and audio"
-            }
+        store_url = ARTIFACT_STORE_URL or input_data.get('artifact_store', '')
+        render = parse_render_options(input_data.get('render'))
+        outputs = parse_outputs(input_data.get('outputs'))
+        audio_format = parse_audio_format(input_data.get('audio_format'))
+        job_log = open_job_log(event.get('id') or 'local')
         
         # Create temp directory
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
             
-            # Decode image
-            image_data = base64.b64decode(image_base64)
+            # Image and audio (already generated in Django), inline or by reference
             image_path = temp_path / 'input_image.jpg'
-            with open(image_path, 'wb') as f:
-                f.write(image_data)
+            audio_path = temp_path / f'audio.{audio_format}'
+            has_image = load_media_input(input_data, 'image', store_url, image_path)
+            has_audio = load_media_input(input_data, 'audio', store_url, audio_path)
+            features_path = temp_path / 'features.npz'
+            has_features = load_media_input(input_data, 'features', store_url, features_path)
             
-            # Decode audio (already generated in Django)
-            audio_data = base64.b64decode(audio_base64)
-            audio_path = temp_path / 'audio.mp3'
-            with open(audio_path, 'wb') as f:
-                f.write(audio_data)
+            if not has_image or not has_audio:
+                yield {
+                    "error": "Missing required fields: image and audio"
+                }
+                return
             
             # Generate video using SadTalker (only GPU-intensive task)
-            video_path = generate_video(
+            video_path = yield from render_with_progress(
                 str(image_path),
                 str(audio_path),
-                str(temp_path / 'output')
+                str(temp_path / 'output'),
+                render,
+                str(features_path) if has_features else None,
+                job_log,
+                metrics
             )
             
-            # Read and encode video
-            with open(video_path, 'rb') as f:
-                video_base64 = base64.b64encode(f.read()).decode('utf-8')
+            output = {"accept_encoding": SUPPORTED_ENCODINGS}
             
-            return {
-                "video_base64": video_base64,
-                "error": None
-            }
+            # Aspect ratio / bitrate variants, decoded once and encoded together
+            variants = {}
+            if outputs:
+                yield {"progress": {"stage": "encoding", "percent": RENDER_PERCENT}}
+                variants = encode_outputs(video_path, outputs, str(temp_path / 'variants'), job_log, metrics)
+            
+            # Hand the videos back through the store when one is in use,
+            # otherwise inline (compressed only if the client accepts it)
+            attach_video(output, 'video', video_path, input_data, store_url)
+            for name, path in variants.items():
+                attach_video(output, f'{name}_video', path, input_data, store_url)
+            output["metrics"] = metrics
+            output["error"] = None
+            yield output
     
     except Exception as e:
         import traceback
-        return {
+        if job_log:
+            job_log.info('Failed: %s', traceback.format_exc())
+        yield {
+            "accept_encoding": SUPPORTED_ENCODINGS,
             "video_base64": "",
+            "metrics": metrics,
             "error": str(e),
             "traceback": traceback.format_exc()
         }
+    finally:
+        if job_log:
+            close_job_log(job_log)
+
+
+async def async_handler(event):
+    """
+    handler as an async generator, so Runpod can hand this worker
+    RENDER_BATCH_MAX jobs at once (sync handlers run one job at a time).
+    """
+    items = handler(event)
+    while (item := await asyncio.to_thread(next, items, None)) is not None:
+        yield item
+
+
+def render_concurrency(current: int) -> int:
+    """
+    Jobs this worker takes at once: RENDER_BATCH_MAX while renders are
+    batched, otherwise one, since unbatched jobs are full SadTalker renders
+    each (subprocess path or a failed engine) and would share the GPU.
+    """
+    return RENDER_BATCH_MAX if get_batcher() is not None else 1
+
+
+# Load the models while the worker waits for its first job
+if SADTALKER_ENGINE == 'inprocess' and SADTALKER_PRELOAD and Path(SADTALKER_ROOT).exists():
+    threading.Thread(target=get_engine, daemon=True).start()
+
 
+if __name__ == '__main__':
+    import runpod
+    if RENDER_BATCH_MAX > 1:
+        runpod.serverless.start({
+            "handler": async_handler,
+            "concurrency_modifier": render_concurrency,
+            "return_aggregate_stream": True
+        })
+    else:
+        runpod.serverless.start({"handler": handler, "return_aggregate_stream": True})
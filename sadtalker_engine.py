@@ -0,0 +1,498 @@
+"""
+In-process SadTalker engine for the Runpod worker.
+
+Running inference.py as a subprocess pays Python startup plus loading every
+SadTalker checkpoint on each job. SadTalkerEngine loads the preprocess,
+audio-to-coefficient and face-render models once and keeps them on the GPU;
+render() then runs the same pipeline as SadTalker's inference.py as plain
+function calls on the preloaded weights.
+
+Face preprocessing (detection, cropping and 3DMM coefficient extraction of
+the source image) is cached by image content, so jobs that reuse a
+presenter image go straight to audio-driven generation.
+
+Audio features (the mel spectrogram) can be computed by the caller and
+passed in, so the worker does not decode and analyse the audio itself.
+
+Jobs that arrive at the same time can be rendered together: RenderBatcher
+collects requests for a short window and SadTalkerEngine.render_batch() runs
+the face renderer once over all of them.
+
+Needs the SadTalker repository at SADTALKER_ROOT (it is imported from there).
+"""
+import contextlib
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+
+# Worker-local cache of source-image preprocessing results
+PREPROCESS_CACHE_DIR = Path(os.getenv('SADTALKER_PREPROCESS_CACHE_DIR', '/tmp/sadtalker-preprocess'))
+PREPROCESS_CACHE_MAX_BYTES = int(os.getenv('SADTALKER_PREPROCESS_CACHE_MB', '1024')) * 1024 * 1024
+
+# Layout of precomputed audio features (reels/services/render_features.py)
+FEATURES_VERSION = 1
+
+
+class SadTalkerEngineError(Exception):
+    """Raised when the engine cannot be loaded or a render fails."""
+    pass
+
+
+class PreprocessCache:
+    """
+    Preprocessing results keyed by image SHA-256, preprocess mode and size,
+    evicted least recently used first once they exceed max_bytes.
+    
+    Each entry is a directory holding the first-frame coefficients
+    (source.mat), the cropped face (source.png) and the pickled crop info.
+    Entries are written to a temporary directory and renamed into place, so
+    a crash never leaves a partial entry behind.
+    """
+    
+    def __init__(self, root: Path = PREPROCESS_CACHE_DIR, max_bytes: int = PREPROCESS_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+    
+    @staticmethod
+    def key(image_path: str, preprocess: str, size: int) -> str:
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return f'{digest.hexdigest()}-{preprocess}-{size}'
+    
+    def get(self, key: str):
+        """Return (coeff_path, crop_pic_path, crop_info) or None on a miss."""
+        entry = self.root / key
+        try:
+            with open(entry / 'crop_info.pkl', 'rb') as f:
+                crop_info = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(entry)  # Mark as recently used
+        return str(entry / 'source.mat'), str(entry / 'source.png'), crop_info
+    
+    def put(self, key: str, coeff_path: str, crop_pic_path: str, crop_info):
+        """Store a preprocessing result and return it as read from the cache."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        partial = Path(tempfile.mkdtemp(prefix=f'.{key}.', dir=self.root))
+        try:
+            shutil.copyfile(coeff_path, partial / 'source.mat')
+            shutil.copyfile(crop_pic_path, partial / 'source.png')
+            with open(partial / 'crop_info.pkl', 'wb') as f:
+                pickle.dump(crop_info, f)
+            try:
+                os.rename(partial, self.root / key)
+            except OSError:
+                pass  # Stored by someone else in the meantime
+        finally:
+            shutil.rmtree(partial, ignore_errors=True)
+        self.evict(keep=key)
+        return self.get(key) or (coeff_path, crop_pic_path, crop_info)
+    
+    def evict(self, keep: str | None = None) -> None:
+        """Drop least recently used entries beyond max_bytes (never keep)."""
+        entries = []
+        for entry in self.root.iterdir():
+            if entry.is_dir() and not entry.name.startswith('.'):
+                size = sum(p.stat().st_size for p in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+        entries.sort(reverse=True)
+        total = 0
+        for _, size, entry in entries:
+            total += size
+            if total > self.max_bytes and entry.name != keep:
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+@dataclass
+class RenderRequest:
+    """One render job; the options default to inference.py's."""
+    image_path: str
+    audio_path: str
+    output_dir: str
+    preprocess: str = 'full'
+    enhancer: str | None = 'gfpgan'
+    size: int = 256
+    pose_style: int = 0
+    batch_size: int = 2
+    expression_scale: float = 1.0
+    still: bool = False
+    features_path: str | None = None
+    
+    @property
+    def batch_key(self) -> tuple:
+        """Requests with equal keys use the same models and can share a batch."""
+        return (self.size, self.preprocess)
+
+
+class SadTalkerEngine:
+    """
+    Preloaded SadTalker models, reused across renders.
+    
+    Models depend on the output size and preprocess mode (they select the
+    face-render config), so one set is kept per (size, preprocess) pair.
+    Renders are serialized, the models are not safe to share between
+    concurrent calls; concurrent jobs are instead combined by RenderBatcher
+    into one render_batch() call.
+    
+    Args:
+        sadtalker_root: Path of the SadTalker checkout
+        device: Torch device, defaults to cuda when available
+        preprocess_cache: Cache of source-image preprocessing, None to disable
+    """
+    
+    def __init__(self, sadtalker_root: str, device: str | None = None, preprocess_cache: PreprocessCache | None = None):
+        self.root = Path(sadtalker_root)
+        self.preprocess_cache = preprocess_cache
+        if not (self.root / 'inference.py').exists():
+            raise SadTalkerEngineError(f"SadTalker not found at {sadtalker_root}")
+        
+        # SadTalker imports its modules as "src.*" and resolves some weights
+        # (e.g. gfpgan/weights) relative to the working directory
+        if str(self.root) not in sys.path:
+            sys.path.insert(0, str(self.root))
+        
+        try:
+            import torch
+            from src.utils.preprocess import CropAndExtract
+            from src.test_audio2coeff import Audio2Coeff
+            import src.facerender.animate as animate_module
+            from src.facerender.animate import AnimateFromCoeff
+            from src.facerender.modules.make_animation import make_animation
+            import src.utils.audio as audio_module
+            from src.generate_batch import get_data
+            from src.generate_facerender_batch import get_facerender_data
+            from src.utils.init_path import init_path
+        except ImportError as e:
+            raise SadTalkerEngineError(f"Cannot import SadTalker: {e}")
+        os.chdir(self.root)
+        
+        self._torch = torch
+        self._classes = (CropAndExtract, Audio2Coeff, AnimateFromCoeff)
+        self._get_data = get_data
+        self._get_facerender_data = get_facerender_data
+        self._init_path = init_path
+        self._animate_module = animate_module
+        self._audio_module = audio_module
+        self._make_animation = make_animation
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self._models = {}
+        self._lock = threading.Lock()
+    
+    def load(self, size: int = 256, preprocess: str = 'full'):
+        """Load (or return the already loaded) models for size and preprocess."""
+        key = (size, preprocess)
+        if key not in self._models:
+            crop_and_extract, audio2coeff, animate_from_coeff = self._classes
+            paths = self._init_path(
+                str(self.root / 'checkpoints'),
+                str(self.root / 'src' / 'config'),
+                size,
+                False,  # old_version
+                preprocess
+            )
+            self._models[key] = (
+                crop_and_extract(paths, self.device),
+                audio2coeff(paths, self.device),
+                animate_from_coeff(paths, self.device),
+            )
+        return self._models[key]
+    
+    def render(
+        self,
+        image_path: str,
+        audio_path: str,
+        output_dir: str,
+        preprocess: str = 'full',
+        enhancer: str | None = 'gfpgan',
+        size: int = 256,
+        pose_style: int = 0,
+        batch_size: int = 2,
+        expression_scale: float = 1.0,
+        still: bool = False,
+        features_path: str | None = None
+    ) -> str:
+        """
+        Render a talking-head video; defaults match inference.py's.
+        
+        Args:
+            image_path: Source face image
+            audio_path: Driving audio
+            output_dir: Directory for intermediate files and the result
+            features_path: Audio features computed by the caller
+                (reels/services/render_features.py), None to compute them
+        
+        Returns:
+            Path of the generated .mp4
+        
+        Raises:
+            SadTalkerEngineError: If no face is found or no video is produced
+        """
+        request = RenderRequest(
+            image_path, audio_path, output_dir,
+            preprocess=preprocess,
+            enhancer=enhancer,
+            size=size,
+            pose_style=pose_style,
+            batch_size=batch_size,
+            expression_scale=expression_scale,
+            still=still,
+            features_path=features_path
+        )
+        with self._lock:
+            models = self.load(size, preprocess)
+            with self._torch.no_grad():
+                data, crop_info = self._prepare(models, request)
+                return self._write_video(models[2], request, data, crop_info)
+    
+    def render_batch(self, requests: list[RenderRequest]) -> list:
+        """
+        Render several jobs with one face-render pass.
+        
+        Preprocessing and audio-to-coefficient run per job (they are cheap);
+        the face renderer, where nearly all GPU time goes, runs once over the
+        jobs stacked along the batch dimension, shorter jobs padded with
+        their last pose. Each job's frames are then cut back out and written
+        to its own video.
+        
+        Args:
+            requests: Jobs with the same size and preprocess mode
+        
+        Returns:
+            Per request, the path of the generated .mp4 or the exception
+            that failed it
+        """
+        if len({request.batch_key for request in requests}) > 1:
+            raise SadTalkerEngineError("A batch must share size and preprocess mode")
+        results: list = [None] * len(requests)
+        with self._lock:
+            models = self.load(requests[0].size, requests[0].preprocess)
+            animate_from_coeff = models[2]
+            with self._torch.no_grad():
+                prepared = []
+                for index, request in enumerate(requests):
+                    try:
+                        prepared.append((index, request, *self._prepare(models, request)))
+                    except Exception as e:
+                        results[index] = e
+                if not prepared:
+                    return results
+                
+                try:
+                    animations = self._animate_together(animate_from_coeff, [data for _, _, data, _ in prepared])
+                except Exception as e:
+                    for index, *_ in prepared:
+                        results[index] = e
+                    return results
+                
+                for (index, request, data, crop_info), animation in zip(prepared, animations):
+                    try:
+                        with self._precomputed_animation(animation):
+                            results[index] = self._write_video(animate_from_coeff, request, data, crop_info)
+                    except Exception as e:
+                        results[index] = e
+        return results
+    
+    def _prepare(self, models, request: RenderRequest):
+        """Run every stage before the face renderer; returns (facerender data, crop_info)."""
+        preprocess_model, audio_to_coeff, _ = models
+        save_dir = Path(request.output_dir) / 'render'
+        first_frame_dir = save_dir / 'first_frame_dir'
+        first_frame_dir.mkdir(parents=True, exist_ok=True)
+        
+        first_coeff_path, crop_pic_path, crop_info = self._preprocess(
+            preprocess_model, request.image_path, first_frame_dir, request.preprocess, request.size
+        )
+        
+        with self._precomputed_audio(request.features_path):
+            batch = self._get_data(first_coeff_path, request.audio_path, self.device, None, still=request.still)
+        coeff_path = audio_to_coeff.generate(batch, str(save_dir), request.pose_style, None)
+        
+        data = self._get_facerender_data(
+            coeff_path, crop_pic_path, first_coeff_path, request.audio_path, request.batch_size,
+            None, None, None,  # No yaw/pitch/roll overrides
+            expression_scale=request.expression_scale,
+            still_mode=request.still,
+            preprocess=request.preprocess,
+            size=request.size
+        )
+        return data, crop_info
+    
+    def _animate_together(self, animate_from_coeff, datas: list[dict]) -> list:
+        """Run make_animation once for several jobs and split the frames per job."""
+        torch = self._torch
+        lengths = [data['target_semantics_list'].shape[1] for data in datas]
+        frames = max(lengths)
+        
+        def pad(semantics):
+            missing = frames - semantics.shape[1]
+            if not missing:
+                return semantics
+            return torch.cat([semantics, semantics[:, -1:].expand(-1, missing, *semantics.shape[2:])], dim=1)
+        
+        source_image = torch.cat([data['source_image'] for data in datas]).type(torch.FloatTensor).to(self.device)
+        source_semantics = torch.cat([data['source_semantics'] for data in datas]).type(torch.FloatTensor).to(self.device)
+        target_semantics = torch.cat([pad(data['target_semantics_list']) for data in datas]).type(torch.FloatTensor).to(self.device)
+        
+        predictions = self._make_animation(
+            source_image, source_semantics, target_semantics,
+            animate_from_coeff.generator, animate_from_coeff.kp_extractor,
+            animate_from_coeff.he_estimator, animate_from_coeff.mapping,
+            None, None, None,  # No yaw/pitch/roll overrides
+            use_exp=True
+        )
+        
+        animations, offset = [], 0
+        for data, length in zip(datas, lengths):
+            rows = data['source_image'].shape[0]
+            animations.append(predictions[offset:offset + rows, :length])
+            offset += rows
+        return animations
+    
+    @contextlib.contextmanager
+    def _precomputed_audio(self, features_path: str | None):
+        """
+        Make get_data use precomputed audio features: load_wav returns
+        silence of the right length (get_data only uses its length) and
+        melspectrogram the sent spectrogram.
+        """
+        if not features_path:
+            yield
+            return
+        import numpy as np
+        with np.load(features_path) as features:
+            if int(features['version']) != FEATURES_VERSION:
+                raise SadTalkerEngineError(f"Unsupported features version {int(features['version'])}")
+            samples = int(features['samples'])
+            mel = features['mel'].astype(np.float32)
+        if mel.ndim != 2 or mel.shape[0] != 80:
+            raise SadTalkerEngineError(f"Invalid mel spectrogram shape {mel.shape}")
+        
+        load_wav, melspectrogram = self._audio_module.load_wav, self._audio_module.melspectrogram
+        self._audio_module.load_wav = lambda *args, **kwargs: np.zeros(samples, dtype=np.float32)
+        self._audio_module.melspectrogram = lambda *args, **kwargs: mel
+        try:
+            yield
+        finally:
+            self._audio_module.load_wav = load_wav
+            self._audio_module.melspectrogram = melspectrogram
+    
+    @contextlib.contextmanager
+    def _precomputed_animation(self, animation):
+        """Make AnimateFromCoeff.generate use already rendered frames."""
+        self._animate_module.make_animation = lambda *args, **kwargs: animation
+        try:
+            yield
+        finally:
+            self._animate_module.make_animation = self._make_animation
+    
+    def _write_video(self, animate_from_coeff, request: RenderRequest, data: dict, crop_info) -> str:
+        """Run the face renderer's output stages and move the video into output_dir."""
+        save_dir = Path(request.output_dir) / 'render'
+        result = animate_from_coeff.generate(
+            data, str(save_dir), request.image_path, crop_info,
+            enhancer=request.enhancer,
+            background_enhancer=None,
+            preprocess=request.preprocess,
+            img_size=request.size
+        )
+        
+        if self.device == 'cuda':
+            self._torch.cuda.empty_cache()
+        
+        if not result or not Path(result).exists():
+            raise SadTalkerEngineError("No video file generated")
+        video_path = Path(request.output_dir) / 'result.mp4'
+        shutil.move(result, video_path)
+        return str(video_path)
+    
+    def _preprocess(self, preprocess_model, image_path: str, first_frame_dir: Path, preprocess: str, size: int):
+        """Crop the face and extract its coefficients, or reuse a cached result."""
+        key = None
+        if self.preprocess_cache:
+            key = self.preprocess_cache.key(image_path, preprocess, size)
+            cached = self.preprocess_cache.get(key)
+            if cached:
+                return cached
+        
+        first_coeff_path, crop_pic_path, crop_info = preprocess_model.generate(
+            image_path, str(first_frame_dir), preprocess,
+            source_image_flag=True, pic_size=size
+        )
+        if first_coeff_path is None:
+            raise SadTalkerEngineError("Can't get the coeffs of the input image")
+        
+        if key:
+            return self.preprocess_cache.put(key, first_coeff_path, crop_pic_path, crop_info)
+        return first_coeff_path, crop_pic_path, crop_info
+
+
+class RenderBatcher:
+    """
+    Collects concurrent render requests into batches.
+    
+    The first request starts a window of window seconds; requests arriving
+    within it join the batch, up to max_batch. Requests that cannot share
+    models (different size or preprocess) are rendered as separate batches.
+    
+    Args:
+        render_batch: Renders a list of requests, returning a path or an
+            exception per request (e.g. SadTalkerEngine.render_batch)
+        window: Seconds to wait for more requests after the first one
+        max_batch: Most requests rendered together
+    """
+    
+    def __init__(self, render_batch, window: float, max_batch: int):
+        self.render_batch = render_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: list[tuple[RenderRequest, Future]] = []
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, name='render-batcher', daemon=True).start()
+    
+    def submit(self, request: RenderRequest) -> Future:
+        """Queue a request; the future resolves to the video path."""
+        future = Future()
+        with self._condition:
+            self._pending.append((request, future))
+            self._condition.notify()
+        return future
+    
+    def _next_batch(self) -> list[tuple[RenderRequest, Future]]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+    
+    def _run(self) -> None:
+        while True:
+            groups: dict[tuple, list[tuple[RenderRequest, Future]]] = {}
+            for request, future in self._next_batch():
+                groups.setdefault(request.batch_key, []).append((request, future))
+            for group in groups.values():
+                try:
+                    results = self.render_batch([request for request, _ in group])
+                except Exception as e:
+                    results = [e] * len(group)
+                for (_, future), result in zip(group, results):
+                    if isinstance(result, BaseException):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)